@@ -1,6 +1,57 @@
+"""
+Each command imports what it needs when it runs, so starting the CLI
+doesn't load the geospatial stack, duckdb or data_common.
+"""
+
+from contextlib import contextmanager
+from pathlib import Path
+
 import rich_click as click
-from .create_overlap_information import run_conversion
-from .convert_specific_polling import convert_all
+
+
+def profile_options(func):
+    """
+    Add the --profile options to a command
+    """
+    func = click.option(
+        "--profiler",
+        type=click.Choice(["cprofile", "pyinstrument"]),
+        default="cprofile",
+        show_default=True,
+        help="Profiler for --profile-stage",
+    )(func)
+    func = click.option(
+        "--profile-stage",
+        default=None,
+        help="Run one stage (e.g. area/intersect) under a profiler",
+    )(func)
+    func = click.option(
+        "--profile",
+        type=click.Path(dir_okay=False, path_type=Path),
+        default=None,
+        help="Write the time, rows, memory and IO of each stage to this JSON lines file",
+    )(func)
+    return func
+
+
+@contextmanager
+def profiling(profile: Path | None, profile_stage: str | None, profiler: str):
+    """
+    Record stages while the command runs, then print a summary
+    """
+    if profile is None:
+        if profile_stage:
+            raise click.UsageError("--profile-stage needs --profile")
+        yield
+        return
+
+    from .instrumentation import enable_profiling, read_records, summary
+
+    enable_profiling(profile, profile_stage, profiler)  # type: ignore
+    try:
+        yield
+    finally:
+        print(summary(read_records(profile)))
 
 
 @click.group()
@@ -13,13 +64,167 @@ def main():
 
 
 @cli.command()
-def create_area_intersection():
-    run_conversion()
+@click.option(
+    "--processes",
+    "-p",
+    default=1,
+    show_default=True,
+    help="Number of processes to spread the area intersections across",
+)
+@click.option("--force", is_flag=True, help="Rerun all stages, even if up to date")
+@click.option(
+    "--dry-run", is_flag=True, help="List the stages that would rerun, then stop"
+)
+@profile_options
+def create_area_intersection(
+    processes: int,
+    force: bool,
+    dry_run: bool,
+    profile: Path | None,
+    profile_stage: str | None,
+    profiler: str,
+):
+    from .create_overlap_information import run_conversion
+
+    with profiling(profile, profile_stage, profiler):
+        run_conversion(processes=processes, force=force, dry_run=dry_run)
+
+
+@cli.command()
+@click.option(
+    "--pair",
+    "pairs",
+    multiple=True,
+    required=True,
+    help="INPUT:OUTPUT geographies from the ONSPD, e.g. pcon:lad",
+)
+@click.option(
+    "--label",
+    "labels",
+    multiple=True,
+    help="GEOGRAPHY=LABEL column name to use in the output, e.g. pcon=PARL10",
+)
+@click.option(
+    "--cache", is_flag=True, help="Use the results in place of downloaded overlaps"
+)
+def create_pop_overlaps(pairs: list[str], labels: list[str], cache: bool):
+    from .create_overlap_information import create_onspd_overlaps
+
+    create_onspd_overlaps(
+        [tuple(p.split(":", 1)) for p in pairs],  # type: ignore
+        labels=dict(label.split("=", 1) for label in labels),
+        add_to_cache=cache,
+    )
+
+
+@cli.command()
+@click.option(
+    "--jobs",
+    "-j",
+    default=1,
+    show_default=True,
+    help="Number of conversion tasks to run in parallel",
+)
+@click.option(
+    "--overlap-measure",
+    "overlap_measures",
+    type=click.Choice(["population", "area"]),
+    multiple=True,
+    default=["population"],
+    show_default=True,
+    help="Overlap measure to weight the results by, repeat for several in one pass",
+)
+@click.option(
+    "--refresh-overlaps",
+    is_flag=True,
+    help="Download the overlap files again, even if cached",
+)
+@profile_options
+def convert_polling(
+    jobs: int,
+    overlap_measures: tuple[str, ...],
+    refresh_overlaps: bool,
+    profile: Path | None,
+    profile_stage: str | None,
+    profiler: str,
+):
+    import os
+    import time
+
+    from .convert_specific_polling import convert_all
+    from .overlap_cache import REFRESH_BEFORE_ENV
+
+    if refresh_overlaps:
+        # anything downloaded before now, in this process or the workers
+        os.environ[REFRESH_BEFORE_ENV] = str(time.time())
+
+    with profiling(profile, profile_stage, profiler):
+        convert_all(jobs=jobs, overlap_measures=overlap_measures)  # type: ignore
+
+
+@cli.command()
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=8000, show_default=True)
+def serve(host: str, port: int):
+    """
+    Serve the polling results as a local JSON API
+    """
+    from .server import serve as serve_polling
+
+    serve_polling(host=host, port=port)
 
 
 @cli.command()
-def convert_polling():
-    convert_all()
+@click.option(
+    "--filter",
+    "filters",
+    multiple=True,
+    help="Only run benchmarks whose name contains this, e.g. convert/PARL10",
+)
+@click.option("--repeat", default=5, show_default=True, help="Runs to take the best of")
+@click.option(
+    "--tolerance",
+    default=0.25,
+    show_default=True,
+    help="Fraction slower (or more memory) than the baseline that counts as a regression",
+)
+@click.option(
+    "--min-seconds",
+    default=0.05,
+    show_default=True,
+    help="Slowdowns smaller than this are treated as noise",
+)
+@click.option("--save-baseline", is_flag=True, help="Store the results as the baseline")
+def bench(
+    filters: list[str],
+    repeat: int,
+    tolerance: float,
+    min_seconds: float,
+    save_baseline: bool,
+):
+    """
+    Run the benchmarks and compare them to the stored baseline
+    """
+    from . import benchmarks
+
+    selected = [
+        b
+        for b in benchmarks.all_benchmarks()
+        if not filters or any(f in b.name for f in filters)
+    ]
+    results = benchmarks.run_benchmarks(selected, repeat=repeat)
+    if save_baseline:
+        benchmarks.write_baseline(results)
+        print(f"Saved baseline to {benchmarks.BASELINE_PATH}")
+        return
+    regressions = benchmarks.compare(
+        results, benchmarks.read_baseline(), tolerance, min_seconds=min_seconds
+    )
+    if regressions:
+        raise click.ClickException(
+            "Slower than the baseline:\n" + "\n".join(regressions)
+        )
+    print("No regressions against the baseline")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,452 @@
+"""
+Benchmarks for the conversion and overlap pipelines, on synthetic data.
+
+Each benchmark builds its inputs at a realistic scale, then is timed
+(best of several runs) and its peak Python memory measured with tracemalloc.
+Memory allocated inside DuckDB isn't seen by tracemalloc, so the
+population overlap figure only covers the Python side.
+
+project bench compares a run to the stored baseline and fails on regressions.
+A change has to pass both the tolerance and an absolute floor to count,
+so millisecond benchmarks don't fail on timer noise.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, ContextManager, Iterator
+
+import numpy as np
+import pandas as pd
+
+BASELINE_PATH = Path("benchmarks", "baseline.json")
+
+# differences below these are noise rather than regressions
+MIN_SECONDS = 0.05
+MIN_BYTES = 2**20
+
+# roughly how many areas each geography has
+GEOGRAPHY_SIZES = {
+    "PARL10": 650,
+    "PARL25": 650,
+    "LSOA11": 34753,
+    "LAD23": 361,
+}
+
+QUESTION_COUNTS = [10, 100, 1000]
+
+CONVERSIONS = [
+    ("PARL10", "LAD23"),
+    ("PARL25", "LAD23"),
+    ("LSOA11", "LAD23"),
+    ("LSOA11", "PARL25"),
+]
+
+TimedFunction = Callable[[], object]
+
+
+@dataclass
+class Benchmark:
+    """
+    setup is given a temporary directory, and is a context manager
+    giving the function to time
+    """
+
+    name: str
+    setup: Callable[[Path], ContextManager[TimedFunction]]
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    seconds: float
+    peak_bytes: int
+
+
+def codes(geography: str, n: int) -> np.ndarray:
+    return np.array([f"{geography}{i:06d}" for i in range(n)])
+
+
+def synthetic_overlap(
+    input_geography: str,
+    output_geography: str,
+    sizes: dict[str, int] = GEOGRAPHY_SIZES,
+    max_parts: int = 3,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    An overlap table in the layout get_overlap_df returns,
+    with each input area split across up to max_parts nearby output areas
+    """
+    rng = np.random.default_rng(seed)
+    n_input, n_output = sizes[input_geography], sizes[output_geography]
+
+    parts = rng.integers(1, max_parts + 1, n_input)
+    input_index = np.repeat(np.arange(n_input), parts)
+    offset = np.arange(len(input_index)) - np.repeat(np.cumsum(parts) - parts, parts)
+    output_index = (input_index * n_output // n_input + offset) % n_output
+
+    df = pd.DataFrame(
+        {
+            input_geography: codes(input_geography, n_input)[input_index],
+            output_geography: codes(output_geography, n_output)[output_index],
+            "overlap_pop": rng.uniform(10, 1000, len(input_index)),
+            "overlap_area": rng.uniform(1, 100, len(input_index)),
+        }
+    ).drop_duplicates([input_geography, output_geography])
+    df["original_pop"] = df.groupby(input_geography)["overlap_pop"].transform("sum")
+    return df.reset_index(drop=True)
+
+
+def synthetic_polling(
+    geography: str,
+    n_questions: int,
+    sizes: dict[str, int] = GEOGRAPHY_SIZES,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    A polling df with a code column then n_questions columns of 0-1 results
+    """
+    rng = np.random.default_rng(seed)
+    n = sizes[geography]
+    df = pd.DataFrame(
+        rng.uniform(0, 1, (n, n_questions)),
+        columns=[f"Q{i}" for i in range(n_questions)],
+    )
+    df.insert(0, geography, codes(geography, n))
+    return df
+
+
+@contextmanager
+def _offline_overlaps(cache_dir: Path, overlaps: list[pd.DataFrame]):
+    """
+    Serve the overlap tables from an offline cache while in the context
+    """
+    from .convert_polling import get_converter
+    from .overlap_cache import CACHE_DIR_ENV, OFFLINE_ENV, OverlapCache
+
+    previous = {key: os.environ.get(key) for key in [CACHE_DIR_ENV, OFFLINE_ENV]}
+    os.environ[CACHE_DIR_ENV] = str(cache_dir)
+    os.environ[OFFLINE_ENV] = "1"
+    cache = OverlapCache.from_env()
+    for df in overlaps:
+        path = cache_dir / "source.parquet"
+        df.to_parquet(path)
+        cache.add_file(
+            path, input_geography=df.columns[0], output_geography=df.columns[1]
+        )
+    get_converter.cache_clear()
+    try:
+        yield cache
+    finally:
+        get_converter.cache_clear()
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def conversion_benchmark(
+    input_geography: str,
+    output_geography: str,
+    n_questions: int,
+    engine: str = "sparse",
+    sizes: dict[str, int] = GEOGRAPHY_SIZES,
+) -> Benchmark:
+    """
+    convert_data_geographies from a cold start, including building the weights
+    """
+
+    @contextmanager
+    def setup(tmp: Path) -> Iterator[TimedFunction]:
+        from .convert_polling import convert_data_geographies, get_converter
+
+        overlap = synthetic_overlap(input_geography, output_geography, sizes)
+        df = synthetic_polling(input_geography, n_questions, sizes)
+
+        def run():
+            get_converter.cache_clear()
+            # compiled again each run, rather than memory mapped from the last
+            shutil.rmtree(cache.cache_dir / "compiled", ignore_errors=True)
+            return convert_data_geographies(
+                df,
+                input_geography=input_geography,  # type: ignore
+                output_geography=output_geography,  # type: ignore
+                engine=engine,  # type: ignore
+            )
+
+        with _offline_overlaps(tmp, [overlap]) as cache:
+            yield run
+
+    name = f"convert/{input_geography}-{output_geography}/q{n_questions}"
+    if engine != "sparse":
+        name += f"/{engine}"
+    return Benchmark(name, setup)
+
+
+def synthetic_councils(
+    n_lower: int = 330, n_counties: int = 21, n_combined: int = 11, seed: int = 0
+) -> pd.DataFrame:
+    """
+    Lower tier councils with their county and combined authority, if any
+    """
+    rng = np.random.default_rng(seed)
+    lower = codes("L", n_lower)
+    county = np.where(
+        rng.uniform(size=n_lower) < 0.5,
+        codes("C", n_counties)[rng.integers(0, n_counties, n_lower)],
+        None,
+    )
+    combined = np.where(
+        rng.uniform(size=n_lower) < 0.3,
+        codes("CA", n_combined)[rng.integers(0, n_combined, n_lower)],
+        None,
+    )
+    return pd.DataFrame(
+        {
+            "local-authority-code": lower,
+            "county-la": county,
+            "combined-authority": combined,
+        }
+    )
+
+
+def council_overlap(seed: int = 0) -> pd.DataFrame:
+    """
+    A constituency/council overlap, as the 2022 overlap files have
+    """
+    overlap = synthetic_overlap(
+        "PARL10", "LAD23", {"PARL10": 650, "LAD23": 330}, seed=seed
+    )
+    overlap["percentage_overlap"] = overlap["overlap_pop"] / overlap["original_pop"]
+    overlap = overlap.rename(
+        columns={"PARL10": "PCON21CD", "LAD23": "local-authority-code"}
+    )
+    overlap["local-authority-code"] = overlap["local-authority-code"].str.replace(
+        "LAD23", "L"
+    )
+    return overlap[["PCON21CD", "local-authority-code", "percentage_overlap"]]
+
+
+def update_to_2023_benchmark() -> Benchmark:
+    """
+    Council replacements and the roll up to higher tiers (without the
+    GovLayers code lookup, which needs the council register)
+    """
+
+    @contextmanager
+    def setup(tmp: Path) -> Iterator[TimedFunction]:
+        from .create_overlap_information import roll_up_to_2023
+        from .tiers import TierMembership
+
+        councils = synthetic_councils()
+        membership = TierMembership.from_council_info(councils)
+        df = council_overlap()
+        replaced = df["local-authority-code"].isin(
+            councils["local-authority-code"][:20]
+        )
+        df["replaced-by"] = np.where(replaced, "L000000", None)
+
+        yield lambda: roll_up_to_2023(df.copy(), membership)
+
+    return Benchmark("update_to_2023", setup)
+
+
+def merge_data_benchmark() -> Benchmark:
+    @contextmanager
+    def setup(tmp: Path) -> Iterator[TimedFunction]:
+        from .create_overlap_information import merge_overlaps
+
+        area_df = council_overlap(seed=1)
+        pop_df = council_overlap(seed=2)
+
+        yield lambda: merge_overlaps(area_df, pop_df)
+
+    return Benchmark("merge_data", setup)
+
+
+def grid(prefix: str, n_x: int, n_y: int, segment: float):
+    """
+    A grid of squares covering the unit square,
+    with extra vertices so they cost something like real boundaries
+    """
+    import geopandas
+    import shapely
+
+    x, y = np.meshgrid(np.arange(n_x) / n_x, np.arange(n_y) / n_y)
+    boxes = shapely.box(x.ravel(), y.ravel(), x.ravel() + 1 / n_x, y.ravel() + 1 / n_y)
+    return geopandas.GeoDataFrame(
+        {
+            "code": codes(prefix, len(boxes)),
+            "geometry": shapely.segmentize(boxes, segment),
+        }
+    )
+
+
+def area_overlap_benchmark(processes: int = 1) -> Benchmark:
+    @contextmanager
+    def setup(tmp: Path) -> Iterator[TimedFunction]:
+        from .spatial import area_overlap
+
+        constituencies = grid("P", 26, 25, segment=0.0005)
+        councils = grid("L", 19, 19, segment=0.0005).rename(columns={"code": "LAD"})
+
+        yield lambda: area_overlap(
+            constituencies,
+            councils,
+            from_code="code",
+            to_code="LAD",
+            processes=processes,
+        )
+
+    return Benchmark(f"area_overlap/p{processes}", setup)
+
+
+def pop_overlap_benchmark(n_postcodes: int = 500_000) -> Benchmark:
+    @contextmanager
+    def setup(tmp: Path) -> Iterator[TimedFunction]:
+        import pyarrow as pa
+
+        from .population_overlap import create_pop_overlaps
+
+        rng = np.random.default_rng(0)
+        n_lsoa = GEOGRAPHY_SIZES["LSOA11"]
+        lsoa = rng.integers(0, n_lsoa, n_postcodes)
+        # lsoas nest in constituencies and mostly in councils
+        pcon = lsoa * 650 // n_lsoa
+        lad = (lsoa * 361 // n_lsoa + rng.binomial(1, 0.05, n_postcodes)) % 361
+        onspd = tmp / "onspd.parquet"
+        pd.DataFrame(
+            {
+                "pcd": codes("PC", n_postcodes),
+                "lsoa11": codes("LSOA11", n_lsoa)[lsoa],
+                "pcon": codes("PARL10", 650)[pcon],
+                "oslaua": codes("LAD23", 361)[lad],
+            }
+        ).to_parquet(onspd)
+        lsoa_pop = pa.table(
+            {
+                "lsoa": codes("LSOA11", n_lsoa),
+                "pop": rng.integers(1000, 3000, n_lsoa),
+            }
+        )
+
+        yield lambda: create_pop_overlaps(
+            onspd, lsoa_pop, [("pcon", "lad"), ("lsoa", "lad")], tmp / "overlaps"
+        )
+
+    return Benchmark("pop_overlap", setup)
+
+
+def all_benchmarks() -> list[Benchmark]:
+    benchmarks = [
+        conversion_benchmark(input_geography, output_geography, n_questions)
+        for input_geography, output_geography in CONVERSIONS
+        for n_questions in QUESTION_COUNTS
+    ]
+    benchmarks += [
+        conversion_benchmark("PARL10", "LAD23", 100, engine="pandas"),
+        update_to_2023_benchmark(),
+        merge_data_benchmark(),
+        area_overlap_benchmark(),
+        pop_overlap_benchmark(),
+    ]
+    return benchmarks
+
+
+def run_benchmark(benchmark: Benchmark, repeat: int = 5) -> BenchmarkResult:
+    """
+    Best time of several runs, then peak memory from a separate run,
+    as tracing allocations slows the code down
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        with benchmark.setup(Path(tmp)) as func:
+            times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                func()
+                times.append(time.perf_counter() - start)
+
+            tracemalloc.start()
+            try:
+                func()
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+    return BenchmarkResult(benchmark.name, min(times), peak)
+
+
+def run_benchmarks(
+    benchmarks: list[Benchmark], repeat: int = 5
+) -> dict[str, BenchmarkResult]:
+    results = {}
+    for benchmark in benchmarks:
+        result = run_benchmark(benchmark, repeat=repeat)
+        print(
+            f"{result.name:<40} {result.seconds * 1000:>10.1f} ms "
+            f"{result.peak_bytes / 2**20:>10.1f} MiB"
+        )
+        results[result.name] = result
+    return results
+
+
+def read_baseline(path: Path = BASELINE_PATH) -> dict[str, BenchmarkResult]:
+    if not path.exists():
+        return {}
+    return {
+        name: BenchmarkResult(name=name, **values)
+        for name, values in json.loads(path.read_text()).items()
+    }
+
+
+def write_baseline(results: dict[str, BenchmarkResult], path: Path = BASELINE_PATH):
+    """
+    Store results as the baseline, keeping any benchmarks that weren't run
+    """
+    baseline = read_baseline(path) | results
+    content = {
+        name: {k: v for k, v in asdict(result).items() if k != "name"}
+        for name, result in sorted(baseline.items())
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(content, indent=2) + "\n")
+
+
+def compare(
+    results: dict[str, BenchmarkResult],
+    baseline: dict[str, BenchmarkResult],
+    tolerance: float = 0.25,
+    min_seconds: float = MIN_SECONDS,
+    min_bytes: int = MIN_BYTES,
+) -> list[str]:
+    """
+    Describe each result that is slower or uses more memory than its
+    baseline by more than the tolerance, and by more than the floor
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        if result.seconds > max(
+            base.seconds * (1 + tolerance), base.seconds + min_seconds
+        ):
+            regressions.append(
+                f"{name}: {result.seconds:.3f}s, baseline {base.seconds:.3f}s"
+            )
+        if result.peak_bytes > max(
+            base.peak_bytes * (1 + tolerance), base.peak_bytes + min_bytes
+        ):
+            regressions.append(
+                f"{name}: peak {result.peak_bytes / 2**20:.1f} MiB, "
+                f"baseline {base.peak_bytes / 2**20:.1f} MiB"
+            )
+    return regressions
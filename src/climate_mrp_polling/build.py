@@ -0,0 +1,127 @@
+"""
+Incremental rebuilds for the pipelines.
+
+Each stage declares the files it reads and writes. The content hash of
+each input is stored in a manifest after the stage runs, and the stage is
+skipped next time if none of its inputs have changed and its outputs exist.
+Inputs that aren't files (e.g. the date council boundaries are taken at)
+can be given as a name and a value.
+"""
+
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+from . import instrumentation
+from .fingerprint import file_hash
+
+DEFAULT_MANIFEST = Path("data", "interim", "build_manifest.json")
+
+
+@dataclass
+class Stage:
+    name: str
+    func: Callable[[], object]
+    inputs: list[Path] = field(default_factory=list)
+    outputs: list[Path] = field(default_factory=list)
+    values: dict[str, str] = field(default_factory=dict)
+
+
+class BuildManifest:
+    """
+    Stored fingerprints for stage inputs.
+    File hashes are reused while a file's size and modification time are
+    unchanged, so unchanged large inputs aren't read again.
+    """
+
+    def __init__(self, path: Path = DEFAULT_MANIFEST):
+        self.path = Path(path)
+        if self.path.exists():
+            data = json.loads(self.path.read_text())
+        else:
+            data = {}
+        self.stages: dict[str, dict[str, str]] = data.get("stages", {})
+        self.files: dict[str, dict] = data.get("files", {})
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(
+            json.dumps({"stages": self.stages, "files": self.files}, indent=2)
+        )
+
+    def fingerprint(self, path: Path) -> str:
+        if not path.exists():
+            return "missing"
+        stat = path.stat()
+        known = self.files.get(str(path))
+        if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime:
+            return known["hash"]
+        digest = file_hash(path)
+        self.files[str(path)] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "hash": digest,
+        }
+        return digest
+
+    def stage_fingerprints(self, stage: Stage) -> dict[str, str]:
+        fingerprints = {str(p): self.fingerprint(Path(p)) for p in stage.inputs}
+        fingerprints.update({f"value:{k}": v for k, v in stage.values.items()})
+        return fingerprints
+
+    def reason_to_run(self, stage: Stage) -> str | None:
+        """
+        Why the stage needs to run, or None if it is up to date
+        """
+        if stage.name not in self.stages:
+            return "never run"
+        if missing := [str(p) for p in stage.outputs if not Path(p).exists()]:
+            return f"missing outputs: {', '.join(missing)}"
+        previous = self.stages[stage.name]
+        current = self.stage_fingerprints(stage)
+        if changed := [k for k in current if previous.get(k) != current[k]]:
+            return f"changed inputs: {', '.join(changed)}"
+        return None
+
+
+def run_stages(
+    stages: list[Stage],
+    *,
+    force: bool = False,
+    dry_run: bool = False,
+    manifest_path: Path = DEFAULT_MANIFEST,
+) -> list[str]:
+    """
+    Run stages in order, skipping any that are up to date.
+    Returns the names of the stages that ran (or would run for a dry run).
+    """
+    manifest = BuildManifest(manifest_path)
+    produced: set[str] = set()
+    ran = []
+
+    for stage in stages:
+        reason = "forced" if force else manifest.reason_to_run(stage)
+        if reason is None and dry_run:
+            # an earlier stage would rewrite one of the inputs
+            if upstream := [str(p) for p in stage.inputs if str(p) in produced]:
+                reason = f"inputs rebuilt: {', '.join(upstream)}"
+
+        if reason is None:
+            print(f"{stage.name}: up to date")
+            continue
+
+        ran.append(stage.name)
+        if dry_run:
+            print(f"{stage.name}: would run ({reason})")
+            produced.update(str(p) for p in stage.outputs)
+            continue
+
+        print(f"{stage.name}: running ({reason})")
+        fingerprints = manifest.stage_fingerprints(stage)
+        with instrumentation.stage(stage.name):
+            stage.func()
+        manifest.stages[stage.name] = fingerprints
+        manifest.save()
+
+    return ran
@@ -1,8 +1,10 @@
 """
-This file is a standlone library to convert polling data from one geography to another.
-It has minimal dependencies beyond pandas.
-Ideally it uses parquet and pyarrow - but if this is an obstacle,
-adjust the parquet references to csv.
+This file is a library to convert polling data from one geography to another.
+It depends on pandas, numpy, scipy (for the sparse weights) and pyarrow
+(for the parquet overlap files).
+Downloaded overlap files are kept in a local cache (overlap_cache.py),
+which is only imported when an overlap is fetched. To use this outside
+the package, copy overlap_cache.py next to it.
 
 Note, when converting to LAD23, this is the lower level geography.
 
@@ -14,13 +16,36 @@ This could in principle be bundled into a quick command-line tool if useful.
 """
 
 
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from functools import lru_cache, reduce
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Iterator, Literal, get_args
+
+import numpy as np
 import pandas as pd
-from typing import Literal, get_args
+import pyarrow.parquet as pq
+from scipy import sparse
+
+if TYPE_CHECKING:
+    from .overlap_cache import OverlapCache
 
 
 ValidGeographies = Literal["LSOA11", "PARL10", "PARL25", "LAD23"]
 DataValues = Literal["percentage", "absolute"]
 OverlapTypes = Literal["area", "population"]
+ConversionEngines = Literal["pandas", "sparse"]
+UncertaintyTypes = Literal["standard_error", "bounds"]
+
+# the columns that give each value column's uncertainty, for each type
+UNCERTAINTY_SUFFIXES = {
+    "standard_error": ["_se"],
+    "bounds": ["_lower", "_upper"],
+}
+# the columns added for each value column in converted uncertainty output
+INTERVAL_SUFFIXES = ["_se", "_lower", "_upper"]
 
 
 def get_dataset_url(
@@ -32,21 +57,775 @@ def get_dataset_url(
     return f"https://pages.mysociety.org/{repo_name}/data/{package_name}/{version_name}/{file_name}"
 
 
-def get_overlap_df(
-    input_geography: ValidGeographies, output_geography: ValidGeographies
-) -> pd.DataFrame:
+def default_cache() -> "OverlapCache":
+    """
+    The overlap cache configured by environment variables
+    """
+    try:
+        from .overlap_cache import OverlapCache
+    except ImportError:
+        # copied out of the package next to overlap_cache.py
+        from overlap_cache import OverlapCache  # type: ignore
+
+    return OverlapCache.from_env()
+
+
+def get_overlap_path(
+    input_geography: ValidGeographies,
+    output_geography: ValidGeographies,
+    *,
+    version_name: str = "latest",
+    cache: "OverlapCache | None" = None,
+    refresh: bool = False,
+) -> Path:
     """
-    Get a df from the mySociety repo with the percentage overlap between geographies
+    Get the local path to the overlap file from the mySociety repo,
+    downloading it into the cache if needed (see overlap_cache.py).
+    'refresh' downloads it again even if cached.
     """
 
+    if cache is None:
+        cache = default_cache()
+
+    file_name = f"{input_geography}_{output_geography}_combo_overlap.parquet"
+
     url = get_dataset_url(
         repo_name="2025-constituencies",
         package_name="geographic_overlaps",
-        version_name="latest",
-        file_name=f"{input_geography}_{output_geography}_combo_overlap.parquet",
+        version_name=version_name,
+        file_name=file_name,
+    )
+
+    return cache.fetch(
+        url,
+        input_geography=input_geography,
+        output_geography=output_geography,
+        version_name=version_name,
+        refresh=refresh,
+    )
+
+
+def get_overlap_df(
+    input_geography: ValidGeographies,
+    output_geography: ValidGeographies,
+    *,
+    version_name: str = "latest",
+    cache: "OverlapCache | None" = None,
+    refresh: bool = False,
+) -> pd.DataFrame:
+    """
+    Get a df from the mySociety repo with the percentage overlap between geographies.
+    Downloads are kept in a local cache (see overlap_cache.py).
+    """
+    return pd.read_parquet(
+        get_overlap_path(
+            input_geography,
+            output_geography,
+            version_name=version_name,
+            cache=cache,
+            refresh=refresh,
+        )
+    )
+
+
+def validate_geography(geography: str, label: str = "input"):
+    if geography not in (o := get_args(ValidGeographies)):
+        raise ValueError(
+            f"{label} geography {geography} not valid. Expected one of {o}"
+        )
+
+
+def get_overlap_column(overlap_measure: OverlapTypes) -> str:
+    """
+    Get the column in the overlap df that holds the absolute overlap for a measure
+    """
+    if overlap_measure == "population":
+        return "overlap_pop"
+    elif overlap_measure == "area":
+        return "overlap_area"
+    else:
+        raise ValueError("overlap_measure must be either 'population' or 'area'")
+
+
+def uncertainty_value_columns(
+    columns: list[str], uncertainty: UncertaintyTypes
+) -> list[str]:
+    """
+    The value columns among columns, checking each has its uncertainty columns
+    """
+    if uncertainty not in UNCERTAINTY_SUFFIXES:
+        raise ValueError("uncertainty must be either 'standard_error' or 'bounds'")
+    suffixes = UNCERTAINTY_SUFFIXES[uncertainty]
+    value_cols = [c for c in columns if not any(c.endswith(s) for s in suffixes)]
+    if missing := [c + s for c in value_cols for s in suffixes if c + s not in columns]:
+        raise ValueError(f"missing uncertainty columns: {missing}")
+    return value_cols
+
+
+def z_score(level: float) -> float:
+    """
+    Standard normal quantile for a two sided interval at this level
+    """
+    from scipy.stats import norm
+
+    return float(norm.ppf(0.5 + level / 2))
+
+
+def standard_errors(
+    df: pd.DataFrame,
+    value_cols: list[str],
+    uncertainty: UncertaintyTypes,
+    level: float = 0.95,
+) -> np.ndarray:
+    """
+    Standard errors for the value columns, reading bounds
+    as a normal interval at this level
+    """
+    if uncertainty == "standard_error":
+        return df[[c + "_se" for c in value_cols]].to_numpy(dtype=float)
+    lower = df[[c + "_lower" for c in value_cols]].to_numpy(dtype=float)
+    upper = df[[c + "_upper" for c in value_cols]].to_numpy(dtype=float)
+    return (upper - lower) / (2 * z_score(level))
+
+
+@dataclass
+class WeightMatrix:
+    """
+    An overlap table compiled into a sparse matrix.
+    Rows are input geography codes, columns are output geography codes
+    and each value is the absolute overlap (pop or area) of that fragment.
+    """
+
+    input_codes: pd.Index
+    output_codes: pd.Index
+    weights: sparse.csr_matrix
+    input_totals: np.ndarray
+
+    @classmethod
+    def from_overlap_df(
+        cls,
+        overlap_df: pd.DataFrame,
+        *,
+        input_geography: ValidGeographies,
+        output_geography: ValidGeographies,
+        overlap_column: str,
+    ) -> "WeightMatrix":
+        """
+        Build the matrix from a df as returned by get_overlap_df
+        """
+        if overlap_column not in overlap_df.columns:
+            raise ValueError(
+                f"the {input_geography} to {output_geography} overlap has no "
+                f"{overlap_column} column (generated population overlaps "
+                "can only be used for population conversions)"
+            )
+        overlap_df = overlap_df[
+            overlap_df[input_geography].notna() & overlap_df[output_geography].notna()
+        ]
+
+        # sorting the output codes keeps the same order as a groupby
+        input_index, input_codes = pd.factorize(overlap_df[input_geography])
+        output_index, output_codes = pd.factorize(
+            overlap_df[output_geography], sort=True
+        )
+
+        # missing overlaps drop out of a pandas sum, but the fragment is kept
+        # so the output geography still appears in the results
+        weights = overlap_df[overlap_column].astype(float).fillna(0).to_numpy()
+
+        matrix = sparse.coo_matrix(
+            (weights, (input_index, output_index)),
+            shape=(len(input_codes), len(output_codes)),
+        ).tocsr()
+
+        input_totals = (
+            overlap_df.groupby(input_geography)["original_pop"]
+            .first()
+            .reindex(input_codes)
+            .astype(float)
+            .to_numpy()
+        )
+
+        return cls(
+            input_codes=pd.Index(input_codes),
+            output_codes=pd.Index(output_codes),
+            weights=matrix,
+            input_totals=input_totals,
+        )
+
+    def save(self, directory: Path):
+        """
+        Write the CSR arrays, codes and totals as .npy files that .load can
+        memory map. Written to a temporary directory and moved into place,
+        so processes compiling the same matrix never see half of one.
+        """
+        directory = Path(directory)
+        directory.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {
+            "data": self.weights.data,
+            "indices": self.weights.indices,
+            "indptr": self.weights.indptr,
+            "input_totals": self.input_totals,
+            # fixed width strings, so the codes map without pickling
+            "input_codes": np.asarray(self.input_codes, dtype=str),
+            "output_codes": np.asarray(self.output_codes, dtype=str),
+        }
+        tmp_dir = Path(tempfile.mkdtemp(dir=directory.parent))
+        for name, array in arrays.items():
+            np.save(tmp_dir / f"{name}.npy", array)
+        try:
+            os.replace(tmp_dir, directory)
+        except OSError:
+            # another process got there first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: Path) -> "WeightMatrix":
+        """
+        Open a matrix written by .save. The weights are memory mapped
+        read only, so every process loading it shares one copy.
+        """
+
+        def array(name: str) -> np.ndarray:
+            return np.load(Path(directory, f"{name}.npy"), mmap_mode="r")
+
+        input_codes = pd.Index(array("input_codes").astype(object))
+        output_codes = pd.Index(array("output_codes").astype(object))
+        weights = sparse.csr_matrix(
+            (array("data"), array("indices"), array("indptr")),
+            shape=(len(input_codes), len(output_codes)),
+            copy=False,
+        )
+        return cls(
+            input_codes=input_codes,
+            output_codes=output_codes,
+            weights=weights,
+            input_totals=array("input_totals"),
+        )
+
+    def compose(self, other: "WeightMatrix") -> "WeightMatrix":
+        """
+        Chain this matrix (A -> B) with another (B -> C) to get A -> C.
+        Each B geography is split across C by its share in the second matrix,
+        so the result is still the absolute overlap of each A/C fragment.
+        Shares are of B's total in the same measure (its row sum), as
+        input_totals is always the population even for area weights.
+        """
+        # line up the B codes, dropping any that don't carry on to C
+        hop_index = other.input_codes.get_indexer(self.output_codes)
+        keep = np.flatnonzero(hop_index >= 0)
+        hop_index = hop_index[keep]
+
+        hop_weights = other.weights[hop_index]
+        hop_totals = np.asarray(hop_weights.sum(axis=1)).ravel()
+        with np.errstate(divide="ignore"):
+            shares = (
+                sparse.diags(np.nan_to_num(1 / hop_totals, posinf=0.0)) @ hop_weights
+            )
+
+        weights = (self.weights[:, keep] @ shares).tocsr()
+
+        return WeightMatrix(
+            input_codes=self.input_codes,
+            output_codes=other.output_codes,
+            weights=weights,
+            input_totals=self.input_totals,
+        )
+
+    def sum_fragments(
+        self, df: pd.DataFrame, input_values_type: DataValues = "percentage"
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        For a df where the first column is the input geography codes, get the
+        per output geography sums of the values and of the overlap,
+        and which output geographies were touched.
+        These can be added up across row batches of the same input.
+        """
+        row_index = self.input_codes.get_indexer(df.iloc[:, 0])
+        found = row_index >= 0
+        row_index = row_index[found]
+
+        values = df.iloc[:, 1:].to_numpy(dtype=float)[found]
+
+        if input_values_type == "absolute":
+            # [absolute]/[total pop] for the input geography
+            values = values / self.input_totals[row_index][:, None]
+
+        # missing values count as zero, as in a pandas sum
+        values = np.nan_to_num(values, nan=0.0)
+
+        # a row per input row, so duplicated input codes are counted twice
+        selected = self.weights[row_index]
+
+        # [original absolute unit] expected in each output geography
+        sums = selected.T @ values
+
+        # the total overlap (roughly the output geography pop/area)
+        totals = np.asarray(selected.sum(axis=0)).ravel()
+
+        # output geographies only appear if an input row has a fragment in them
+        present = np.bincount(selected.indices, minlength=selected.shape[1]) > 0
+
+        return sums, totals, present
+
+    def convert_chunks(
+        self,
+        chunks: Iterable[pd.DataFrame],
+        *,
+        output_code_col: str,
+        input_values_type: DataValues = "percentage",
+        output_values_type: DataValues = "percentage",
+    ) -> pd.DataFrame:
+        """
+        Convert a df that arrives in row batches, keeping a running sum for each
+        output geography. Only one batch of input needs to be in memory at once.
+        """
+        original_columns = None
+        sums = np.zeros((len(self.output_codes), 0))
+        totals = np.zeros(len(self.output_codes))
+        present = np.zeros(len(self.output_codes), dtype=bool)
+
+        for chunk in chunks:
+            if original_columns is None:
+                original_columns = list(chunk.columns)[1:]
+                sums = np.zeros((len(self.output_codes), len(original_columns)))
+            elif list(chunk.columns)[1:] != original_columns:
+                raise ValueError("all chunks must have the same columns")
+
+            chunk_sums, chunk_totals, chunk_present = self.sum_fragments(
+                chunk, input_values_type
+            )
+            sums += chunk_sums
+            totals += chunk_totals
+            present |= chunk_present
+
+        if original_columns is None:
+            raise ValueError("no chunks to convert")
+
+        if output_values_type == "percentage":
+            # percentage of the summed overlap
+            with np.errstate(divide="ignore", invalid="ignore"):
+                sums = sums / totals[:, None]
+
+        final = pd.DataFrame(sums[present], columns=original_columns)
+        final.insert(0, output_code_col, self.output_codes[present])
+
+        return final
+
+    def convert(
+        self,
+        df: pd.DataFrame,
+        *,
+        output_code_col: str,
+        input_values_type: DataValues = "percentage",
+        output_values_type: DataValues = "percentage",
+    ) -> pd.DataFrame:
+        """
+        Convert a df where the first column is the input geography codes.
+        All question columns are converted in a single sparse-dense product.
+        """
+        return self.convert_chunks(
+            [df],
+            output_code_col=output_code_col,
+            input_values_type=input_values_type,
+            output_values_type=output_values_type,
+        )
+
+    def aggregate_outputs(
+        self, aggregation: sparse.spmatrix, output_codes: pd.Index
+    ) -> "WeightMatrix":
+        """
+        Combine output geographies, e.g. councils into higher tiers.
+        aggregation has a row per current output and a column per new output,
+        with a 1 where the current output is part of the new one.
+        Keeping the fragments from each input means covariances between
+        outputs that share an input are carried through.
+        """
+        return WeightMatrix(
+            input_codes=self.input_codes,
+            output_codes=pd.Index(output_codes),
+            weights=(self.weights @ aggregation).tocsr(),
+            input_totals=self.input_totals,
+        )
+
+    def convert_uncertainty(
+        self,
+        df: pd.DataFrame,
+        *,
+        output_code_col: str,
+        uncertainty: UncertaintyTypes = "standard_error",
+        input_values_type: DataValues = "percentage",
+        output_values_type: DataValues = "percentage",
+        draws: int | None = None,
+        level: float = 0.95,
+        seed: int | None = None,
+    ) -> pd.DataFrame:
+        """
+        Convert values with standard errors (value_se columns) or bounds
+        (value_lower and value_upper columns), treating inputs as independent.
+        Each value gets value_se, value_lower and value_upper columns.
+
+        By default the variance is propagated in closed form, through the
+        squared weights. With draws, the intervals come from that many normal
+        samples of every input, converted together in one matrix product.
+        """
+        value_cols = uncertainty_value_columns(list(df.columns)[1:], uncertainty)
+
+        row_index = self.input_codes.get_indexer(df.iloc[:, 0])
+        found = row_index >= 0
+        row_index = row_index[found]
+
+        values = df[value_cols].to_numpy(dtype=float)[found]
+        errors = standard_errors(df, value_cols, uncertainty, level)[found]
+
+        # [absolute]/[total pop] for the input geography
+        scale = np.ones(len(row_index))
+        if input_values_type == "absolute":
+            scale = 1 / self.input_totals[row_index]
+
+        # missing values count as zero, as in a pandas sum
+        values = np.nan_to_num(values * scale[:, None], nan=0.0)
+        errors = np.nan_to_num(errors * scale[:, None], nan=0.0)
+
+        selected = self.weights[row_index]
+        totals = np.asarray(selected.sum(axis=0)).ravel()
+        present = np.bincount(selected.indices, minlength=selected.shape[1]) > 0
+
+        # the share of each output that is each input
+        divisor = totals if output_values_type == "percentage" else np.ones_like(totals)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            estimates = (selected.T @ values) / divisor[:, None]
+            variances = (selected.power(2).T @ errors**2) / (divisor**2)[:, None]
+
+        if draws:
+            output_errors, lower, upper = sample_intervals(
+                selected,
+                values,
+                errors,
+                scale,
+                divisor,
+                draws=draws,
+                level=level,
+                clip=input_values_type == "percentage",
+                rng=np.random.default_rng(seed),
+            )
+        else:
+            output_errors = np.sqrt(variances)
+            z = z_score(level)
+            lower = estimates - z * output_errors
+            upper = estimates + z * output_errors
+
+        columns = {output_code_col: self.output_codes[present]}
+        for i, c in enumerate(value_cols):
+            columns[c] = estimates[present, i]
+            columns[c + "_se"] = output_errors[present, i]
+            columns[c + "_lower"] = lower[present, i]
+            columns[c + "_upper"] = upper[present, i]
+        return pd.DataFrame(columns)
+
+
+def sample_intervals(
+    selected: sparse.csr_matrix,
+    values: np.ndarray,
+    errors: np.ndarray,
+    scale: np.ndarray,
+    divisor: np.ndarray,
+    *,
+    draws: int,
+    level: float,
+    clip: bool,
+    rng: np.random.Generator,
+    max_elements: int = 2**24,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Monte Carlo standard errors and intervals for converted values.
+    Every draw of a batch of questions is converted in one sparse product,
+    with the questions batched only to bound memory.
+    """
+    n_inputs, n_values = values.shape
+    n_outputs = selected.shape[1]
+    batch = max(1, max_elements // max(1, draws * n_inputs))
+    quantiles = [(1 - level) / 2, (1 + level) / 2]
+
+    output_errors = np.zeros((n_outputs, n_values))
+    lower = np.zeros((n_outputs, n_values))
+    upper = np.zeros((n_outputs, n_values))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for start in range(0, n_values, batch):
+            cols = slice(start, start + batch)
+            width = len(range(*cols.indices(n_values)))
+            # draw in the original units, so percentages can be kept in 0-1
+            mean = values[:, cols] / scale[:, None]
+            spread = errors[:, cols] / scale[:, None]
+            samples = rng.normal(mean, spread, size=(draws, n_inputs, width))
+            if clip:
+                np.clip(samples, 0, 1, out=samples)
+            samples *= scale[None, :, None]
+
+            # inputs as rows, every (draw, question) as a column
+            flat = samples.transpose(1, 0, 2).reshape(n_inputs, draws * width)
+            converted = (selected.T @ flat).reshape(n_outputs, draws, width)
+            converted /= divisor[:, None, None]
+
+            output_errors[:, cols] = converted.std(axis=1, ddof=1)
+            lower[:, cols], upper[:, cols] = np.quantile(converted, quantiles, axis=1)
+
+    return output_errors, lower, upper
+
+
+def read_chunks(path: Path, chunksize: int = 10_000) -> Iterator[pd.DataFrame]:
+    """
+    Read a csv or parquet file in row batches
+    """
+    path = Path(path)
+    if path.suffix == ".parquet":
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+def get_weight_matrix(
+    input_geography: ValidGeographies,
+    output_geography: ValidGeographies,
+    overlap_measure: OverlapTypes = "population",
+    *,
+    version_name: str = "latest",
+    cache: "OverlapCache | None" = None,
+    refresh: bool = False,
+) -> WeightMatrix:
+    """
+    Fetch the overlap between two geographies and compile it to a WeightMatrix.
+    The compiled matrix is kept in the cache alongside the overlap file,
+    and later calls (in any process) memory map it rather than reading the parquet.
+    """
+    if cache is None:
+        cache = default_cache()
+    overlap_column = get_overlap_column(overlap_measure)
+
+    path = get_overlap_path(
+        input_geography,
+        output_geography,
+        version_name=version_name,
+        cache=cache,
+        refresh=refresh,
     )
+    # cache objects are named by their content hash
+    compiled = cache.compiled_path(path.stem, overlap_column)
+    if not compiled.exists():
+        WeightMatrix.from_overlap_df(
+            pd.read_parquet(path),
+            input_geography=input_geography,
+            output_geography=output_geography,
+            overlap_column=overlap_column,
+        ).save(compiled)
+    return WeightMatrix.load(compiled)
+
+
+class GeographyConverter:
+    """
+    A conversion between two geographies compiled once and reused.
+    Holds the factorised codes and weights, so .convert only does the arithmetic.
+
+    converter = GeographyConverter("PARL10", "LAD23", "population")
+    for df in polls:
+        converter.convert(df, input_code_col="PCON2010")
+
+    Where there is no direct overlap file, 'via' gives the intermediate
+    geographies to go through (e.g. via=("PARL25",) for PARL10 -> PARL25 -> LAD23).
+    The overlap matrices are multiplied together once when the converter is built,
+    so converting is the same cost as a single hop.
+    """
+
+    def __init__(
+        self,
+        input_geography: ValidGeographies,
+        output_geography: ValidGeographies,
+        overlap_measure: OverlapTypes = "population",
+        *,
+        via: tuple[ValidGeographies, ...] = (),
+        version_name: str = "latest",
+        cache: "OverlapCache | None" = None,
+        refresh: bool = False,
+    ):
+        validate_geography(input_geography, "input")
+        validate_geography(output_geography, "output")
+        for geography in via:
+            validate_geography(geography, "intermediate")
+
+        self.input_geography = input_geography
+        self.output_geography = output_geography
+        self.overlap_measure = overlap_measure
+        self.via = tuple(via)
+
+        path = [input_geography, *via, output_geography]
+        matrices = [
+            get_weight_matrix(
+                a,
+                b,
+                overlap_measure,
+                version_name=version_name,
+                cache=cache,
+                refresh=refresh,
+            )
+            for a, b in zip(path[:-1], path[1:])
+        ]
+        self.matrix = reduce(WeightMatrix.compose, matrices)
+
+    def __repr__(self) -> str:
+        via = f", via={self.via!r}" if self.via else ""
+        return (
+            f"GeographyConverter({self.input_geography!r}, "
+            f"{self.output_geography!r}, {self.overlap_measure!r}{via})"
+        )
+
+    def check_arguments(
+        self,
+        input_code_col: str | None,
+        output_code_col: str | None,
+        input_values_type: DataValues,
+        output_values_type: DataValues | None,
+    ) -> tuple[str, str, DataValues]:
+        """
+        Fill in the default code columns and output type, and validate the types
+        """
+        if input_code_col is None:
+            input_code_col = self.input_geography
+        if output_code_col is None:
+            output_code_col = self.output_geography
+        if output_values_type is None:
+            output_values_type = input_values_type
+
+        if input_values_type not in get_args(DataValues):
+            raise ValueError("values must be either 'percentage' or 'absolute'")
+
+        if output_values_type not in get_args(DataValues):
+            raise ValueError("values must be either 'percentage' or 'absolute'")
+
+        return input_code_col, output_code_col, output_values_type
+
+    def convert(
+        self,
+        df: pd.DataFrame,
+        *,
+        input_code_col: str | None = None,
+        output_code_col: str | None = None,
+        input_values_type: DataValues = "percentage",
+        output_values_type: DataValues | None = None,
+    ) -> pd.DataFrame:
+        """
+        Convert a df where the first column is the input geography codes.
+        Arguments are as for convert_data_geographies.
+        """
+        return self.convert_chunks(
+            [df],
+            input_code_col=input_code_col,
+            output_code_col=output_code_col,
+            input_values_type=input_values_type,
+            output_values_type=output_values_type,
+        )
+
+    def convert_chunks(
+        self,
+        chunks: Iterable[pd.DataFrame],
+        *,
+        input_code_col: str | None = None,
+        output_code_col: str | None = None,
+        input_values_type: DataValues = "percentage",
+        output_values_type: DataValues | None = None,
+    ) -> pd.DataFrame:
+        """
+        Convert input that arrives as row batches (e.g. from read_chunks).
+        Memory is bounded by the batch size, results match .convert.
+        """
+        input_code_col, output_code_col, output_values_type = self.check_arguments(
+            input_code_col, output_code_col, input_values_type, output_values_type
+        )
+
+        def checked(chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+            for chunk in chunks:
+                if chunk.columns[0] != input_code_col:
+                    raise ValueError(
+                        f"input geography {input_code_col} must be first column"
+                    )
+                yield chunk
+
+        return self.matrix.convert_chunks(
+            checked(chunks),
+            output_code_col=output_code_col,
+            input_values_type=input_values_type,
+            output_values_type=output_values_type,
+        )
+
+    def convert_uncertainty(
+        self,
+        df: pd.DataFrame,
+        *,
+        uncertainty: UncertaintyTypes = "standard_error",
+        input_code_col: str | None = None,
+        output_code_col: str | None = None,
+        input_values_type: DataValues = "percentage",
+        output_values_type: DataValues | None = None,
+        draws: int | None = None,
+        level: float = 0.95,
+        seed: int | None = None,
+    ) -> pd.DataFrame:
+        """
+        Convert values with standard errors or bounds,
+        see WeightMatrix.convert_uncertainty.
+        Other arguments are as for .convert.
+        """
+        input_code_col, output_code_col, output_values_type = self.check_arguments(
+            input_code_col, output_code_col, input_values_type, output_values_type
+        )
+        if df.columns[0] != input_code_col:
+            raise ValueError(f"input geography {input_code_col} must be first column")
+
+        return self.matrix.convert_uncertainty(
+            df,
+            output_code_col=output_code_col,
+            uncertainty=uncertainty,
+            input_values_type=input_values_type,
+            output_values_type=output_values_type,
+            draws=draws,
+            level=level,
+            seed=seed,
+        )
 
-    return pd.read_parquet(url)
+    def convert_file(
+        self, path: Path, *, chunksize: int = 10_000, **kwargs
+    ) -> pd.DataFrame:
+        """
+        Convert a csv or parquet file without loading it all into memory.
+        Other arguments are as for .convert.
+        """
+        return self.convert_chunks(read_chunks(path, chunksize), **kwargs)
+
+
+@lru_cache(maxsize=None)
+def get_converter(
+    input_geography: ValidGeographies,
+    output_geography: ValidGeographies,
+    overlap_measure: OverlapTypes = "population",
+    *,
+    via: tuple[ValidGeographies, ...] = (),
+    version_name: str = "latest",
+    refresh: bool = False,
+) -> GeographyConverter:
+    """
+    Get a GeographyConverter, reusing one already built in this process.
+    Chained conversions keep their composed matrix.
+    """
+    return GeographyConverter(
+        input_geography,
+        output_geography,
+        overlap_measure,
+        via=via,
+        version_name=version_name,
+        refresh=refresh,
+    )
 
 
 def convert_data_geographies(
@@ -59,6 +838,11 @@ def convert_data_geographies(
     output_code_col: str | None = None,
     input_values_type: DataValues = "percentage",
     output_values_type: DataValues | None = None,
+    engine: ConversionEngines = "sparse",
+    via: tuple[ValidGeographies, ...] = (),
+    uncertainty: UncertaintyTypes | None = None,
+    draws: int | None = None,
+    level: float = 0.95,
 ) -> pd.DataFrame:
     """
     Convert data from one geography to another.
@@ -68,6 +852,19 @@ def convert_data_geographies(
 
     It will return an output dataframe with the first column
     being the output geography codes.
+
+    The 'sparse' engine compiles the overlap into a weight matrix and
+    converts all columns at once. The 'pandas' engine merges the overlap
+    onto the df and converts column by column - results are the same.
+
+    'via' chains the conversion through intermediate geographies
+    (sparse engine only).
+
+    With 'uncertainty', each value column comes with either a value_se column
+    ("standard_error") or value_lower and value_upper columns ("bounds", read
+    as a normal interval at 'level'). The output has value_se, value_lower and
+    value_upper columns, from the closed form variance or, with 'draws',
+    from that many Monte Carlo samples (sparse engine only).
     """
 
     # validate inputs
@@ -78,15 +875,8 @@ def convert_data_geographies(
     if output_values_type is None:
         output_values_type = input_values_type
 
-    if input_geography not in (o := get_args(ValidGeographies)):
-        raise ValueError(
-            f"input geography {input_geography} not valid. Expected one of {o}"
-        )
-
-    if output_geography not in (o := get_args(ValidGeographies)):
-        raise ValueError(
-            f"output geography {output_geography} not valid. Expected one of {o}"
-        )
+    validate_geography(input_geography, "input")
+    validate_geography(output_geography, "output")
 
     if input_code_col not in df.columns:
         raise ValueError(f"input geography {input_code_col} not in dataframe")
@@ -97,27 +887,54 @@ def convert_data_geographies(
     if output_values_type not in get_args(DataValues):
         raise ValueError("values must be either 'percentage' or 'absolute'")
 
-    # get correct overlap column
-    if overlap_measure == "population":
-        overlap_column = "percentage_overlap_pop"
-    elif overlap_measure == "area":
-        overlap_column = "percentage_overlap_area"
-    else:
-        raise ValueError("overlap_measure must be either 'population' or 'area'")
+    if engine not in get_args(ConversionEngines):
+        raise ValueError("engine must be either 'pandas' or 'sparse'")
+
+    if via and engine != "sparse":
+        raise ValueError("chained conversions need the 'sparse' engine")
+
+    if uncertainty is not None and engine != "sparse":
+        raise ValueError("converting uncertainty needs the 'sparse' engine")
 
     # input_code_col needs to be the first column, raise error if not
     if df.columns[0] != input_code_col:
         raise ValueError(f"input geography {input_code_col} must be first column")
 
-    if overlap_measure == "population":
-        overlap_column = "overlap_pop"
-    elif overlap_measure == "area":
-        overlap_column = "overlap_area"
-    else:
-        raise ValueError("overlap_measure must be either 'population' or 'area'")
+    # get correct overlap column
+    overlap_column = get_overlap_column(overlap_measure)
+
+    if engine == "sparse":
+        converter = get_converter(
+            input_geography, output_geography, overlap_measure, via=tuple(via)
+        )
+        if uncertainty is not None:
+            return converter.convert_uncertainty(
+                df,
+                uncertainty=uncertainty,
+                input_code_col=input_code_col,
+                output_code_col=output_code_col,
+                input_values_type=input_values_type,
+                output_values_type=output_values_type,
+                draws=draws,
+                level=level,
+            )
+        return converter.convert(
+            df,
+            input_code_col=input_code_col,
+            output_code_col=output_code_col,
+            input_values_type=input_values_type,
+            output_values_type=output_values_type,
+        )
 
     # fetch the geography intersepction lookup file
     overlap_df = get_overlap_df(input_geography, output_geography)
+    if overlap_column not in overlap_df.columns:
+        raise ValueError(
+            f"the {input_geography} to {output_geography} overlap has no "
+            f"{overlap_column} column (generated population overlaps "
+            "can only be used for population conversions)"
+        )
+    overlap_df = overlap_df[overlap_df[input_geography].notna()]
 
     original_columns = list(df.columns)[1:]
     df = df.merge(
@@ -1,9 +1,44 @@
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from data_common.pandas import GovLayers
+from dataclasses import dataclass
+from contextlib import contextmanager
+from functools import partial
 from datetime import date
-from typing import Literal, Annotated
-from .convert_polling import convert_data_geographies
+import traceback
+from typing import Iterator, Literal, Annotated, Sequence
+from scipy import sparse
+from .convert_polling import (
+    OverlapTypes,
+    UncertaintyTypes,
+    WeightMatrix,
+    get_converter,
+)
+from .council_info import add_council_info
+from .instrumentation import note_rows
+from .polling_sources import CODE_COL, RESULTS_DATASET, SOURCES, PollingSource
+from .storage import (
+    concat_interim,
+    interim_path,
+    long_format,
+    read_dataset,
+    render_csv,
+    write_interim,
+    write_partition,
+)
+from .tasks import Task, report, run_tasks
+from .tiers import LOWER_TIER, TIER_NAMES, TierMembership, get_tier_membership
+from .workbooks import read_sheet
+
+COUNCILS_2023 = date(2023, 4, 2)
+
+COUNCIL_TIERS = (*TIER_NAMES.values(), LOWER_TIER)
+
+# what the converted results are divided by, to give percentages
+DENOMINATORS: dict[OverlapTypes, str] = {
+    "population": "pop-2020",
+    "area": "overlap-area",
+}
 
 PollingDataFrame = Annotated[
     pd.DataFrame,
@@ -19,154 +54,413 @@ def convert_parl_polling_to_la(
     """
     Convert the polling data from constituency (2010 boundaries) to local authority (2023).
     Includes generating the higher geographies.
+    Population results are shares of the council population, area results
+    shares of the council area the constituencies cover.
     """
 
-    councils_2023 = date(2023, 4, 2)
+    from data_common.pandas import GovLayers
 
-    df = convert_data_geographies(
+    # the same converter is reused for every poll in this process
+    converter = get_converter("PARL10", "LAD23", overlap_measure)
+    df = converter.convert(
         polling_df,
-        input_geography="PARL10",
         input_code_col="PCON2010",
-        output_geography="LAD23",
         output_code_col="gss-code",
         input_values_type="percentage",
         output_values_type="absolute",
-        overlap_measure=overlap_measure,
     )
 
     original_cols = list(df.columns)[1:]
+    denominator = DENOMINATORS[overlap_measure]
+    if overlap_measure == "area":
+        area = overlap_totals(converter.matrix, polling_df)
+        df[denominator] = df["gss-code"].map(area)
 
     final = GovLayers(df).create_code_column(
         from_type="gss", source_col="gss-code", drop_source=True
     )
 
-    final = GovLayers(final).get_council_info(
-        ["pop-2020"], include_historical=True, as_of_date=councils_2023
-    )
+    if overlap_measure == "population":
+        final = add_council_info(final, ["pop-2020"], as_of_date=COUNCILS_2023)
 
-    upper_layers = GovLayers(final).to_multiple_higher(aggfunc="sum")
+    # sum up to counties and combined authorities in one aggregation
+    membership = get_tier_membership(final["local-authority-code"], COUNCILS_2023)
+    upper_layers = membership.roll_up(final, [denominator] + original_cols)
 
     # recombine the upper layers with the lower layers
     final = pd.concat([upper_layers, final])
 
     # calculate the percentages
     for c in original_cols:
-        final[c] = final[c] / final["pop-2020"]
+        final[c] = final[c] / final[denominator]
 
-    final = GovLayers(final).get_council_info(
-        ["official-name"], include_historical=True, as_of_date=councils_2023
-    )
+    final = add_council_info(final, ["official-name"], as_of_date=COUNCILS_2023)
 
     final = final[["local-authority-code", "official-name"] + original_cols]
 
     return final
 
 
-def sort_name(s: str) -> str:
+def overlap_totals(matrix: WeightMatrix, polling_df: pd.DataFrame) -> pd.Series:
     """
-    Rough function to convert constituency names to a standard format
+    The summed overlap each output gets from the polled constituencies.
+    For area weights, the area that the results are a share of.
     """
+    _, totals, present = matrix.sum_fragments(polling_df.iloc[:, :1])
+    return pd.Series(totals[present], index=matrix.output_codes[present])
 
-    s = s.replace("Na h-Eileanan An Iar (Western Isles)", "Na h-Eileanan an Iar")
-    s = s.replace(" (Yorks)", "")
-    s = s.replace("Môn", "Mon")
-    s = s.replace("-", " ").lower()
-    s = s.replace(" & ", " and ")
-    s = s.replace(" of ", " ")
-    s = s.replace(" the ", " ")
-    s = s.replace(",", "")
-    s = s.replace(" st ", " saint ")
-    s = s.replace(" st.", " saint ")
-    s = s.replace(" st,", " saint ")
-    s = s.replace(" of", " ")
-    s = s.replace("kingston upon hull", "hull")
-    s = s.replace(")", "")
-    s = s.replace("(", "")
-
-    while "  " in s:
-        s = s.replace("  ", " ")
-
-    l = s.strip().split(" ")
-    l.sort()
-    return " ".join(l)
 
-
-def convert_renewable_uk():
+@dataclass
+class CouncilOutputs:
     """
-    Convert RenewableUK polling to local authorities
-    https://www.renewableuk.com/news/615931/Polling-in-every-constituency-in-Britain-shows-strong-support-for-wind-farms-to-drive-down-bills.htm
-
+    Aggregation from the LAD23 outputs (gss codes) to councils.
+    Columns are the higher tier councils (summing their members),
+    then the lower tier councils, for the tiers asked for.
     """
-    polling_df = (
-        pd.read_excel(
-            str(
-                Path(
-                    "data",
-                    "raw",
-                    "polling",
-                    "RenewableUK-MRP-Constituency-Topline.xlsx",
-                )
-            )
+
+    # the council code for each gss code, NaN if there isn't one
+    lower_codes: pd.Index
+    # the council code for each column of the aggregation
+    codes: pd.Index
+    aggregation: sparse.csr_matrix
+    membership: TierMembership
+
+    @classmethod
+    def from_gss_codes(
+        cls,
+        gss_codes: pd.Index,
+        as_of_date: date = COUNCILS_2023,
+        tiers: Sequence[str] = COUNCIL_TIERS,
+    ) -> "CouncilOutputs":
+        from data_common.pandas import GovLayers
+
+        if unknown := set(tiers) - set(COUNCIL_TIERS):
+            raise ValueError(f"unknown tiers {unknown}, expected {COUNCIL_TIERS}")
+
+        codes = GovLayers(pd.DataFrame({"gss-code": gss_codes})).create_code_column(
+            from_type="gss", source_col="gss-code"
+        )
+        gss_to_code = dict(zip(codes["gss-code"], codes["local-authority-code"]))
+        lower_codes = pd.Index(pd.Index(gss_codes).map(gss_to_code))
+        found = np.flatnonzero(lower_codes.notna())
+
+        membership = get_tier_membership(lower_codes[found], as_of_date)
+        selection = sparse.coo_matrix(
+            (
+                np.ones(len(found)),
+                (found, membership.lower_codes.get_indexer(lower_codes[found])),
+            ),
+            shape=(len(lower_codes), len(membership.lower_codes)),
+        )
+
+        higher = np.flatnonzero(membership.tiers(membership.higher_codes).isin(tiers))
+        blocks = [(selection @ membership.matrix).tocsc()[:, higher]]
+        output_codes = membership.higher_codes[higher]
+        if LOWER_TIER in tiers:
+            blocks.append(sparse.identity(len(lower_codes), format="csc")[:, found])
+            output_codes = output_codes.append(lower_codes[found])
+
+        return cls(
+            lower_codes=lower_codes,
+            codes=output_codes,
+            aggregation=sparse.hstack(blocks).tocsr(),
+            membership=membership,
+        )
+
+    def populations(self) -> np.ndarray:
+        """
+        The population of the council for each gss code, NaN if there isn't one
+        """
+        pop = add_council_info(
+            pd.DataFrame({"local-authority-code": self.lower_codes.dropna().unique()}),
+            ["pop-2020"],
+            as_of_date=COUNCILS_2023,
         )
-        .drop(columns=["Variable", "Name"])
-        .rename(columns={"Group": "PCON2010"})
-        .set_index("PCON2010")
+        return self.lower_codes.map(
+            dict(zip(pop["local-authority-code"], pop["pop-2020"]))
+        ).to_numpy(dtype=float)
+
+
+def convert_parl_polling_batch(
+    polls: dict[str, PollingDataFrame],
+    *,
+    overlap_measures: Sequence[OverlapTypes] = ("population",),
+    tiers: Sequence[str] = COUNCIL_TIERS,
+) -> dict[str, pd.DataFrame]:
+    """
+    Convert several polls to councils for several overlap measures,
+    in one pass over the weight matrices.
+    Returns a df for each poll of method, local-authority-code, official-name
+    and its questions. The rows for each method are the ones
+    convert_parl_polling_to_la gives, in the same order.
+
+    The measures' weights sit side by side in one matrix, so the polls are
+    factorised and multiplied once, and one aggregation adds up every tier
+    for every measure and poll.
+    Each poll has its own column marking the constituencies it covers,
+    so its higher tiers only add up the councils it has results for.
+    A constituency repeated within a poll is only counted once.
+    """
+    polls = {name: df.drop_duplicates(df.columns[0]) for name, df in polls.items()}
+
+    # a row for each constituency in any poll, a block of columns for each poll
+    codes = pd.Index(pd.concat([df.iloc[:, 0] for df in polls.values()]).unique())
+    blocks = []
+    coverage = np.zeros((len(codes), len(polls)))
+    for i, df in enumerate(polls.values()):
+        rows = codes.get_indexer(df.iloc[:, 0])
+        block = np.full((len(codes), df.shape[1] - 1), np.nan)
+        block[rows] = df.iloc[:, 1:].to_numpy(dtype=float)
+        blocks.append(block)
+        coverage[rows, i] = 1
+
+    matrices = [get_converter("PARL10", "LAD23", m).matrix for m in overlap_measures]
+    first = matrices[0]
+    for matrix in matrices[1:]:
+        if not (
+            matrix.input_codes.equals(first.input_codes)
+            and matrix.output_codes.equals(first.output_codes)
+        ):
+            raise ValueError("overlap measures must cover the same geographies")
+
+    row_index = first.input_codes.get_indexer(codes)
+    found = row_index >= 0
+    # columns are (measure, gss code)
+    selected = sparse.hstack([m.weights for m in matrices]).tocsr()[row_index[found]]
+
+    # as sum_fragments, with the coverage columns giving each poll's overlap
+    values = np.nan_to_num(np.hstack(blocks + [coverage])[found], nan=0.0)
+    sums = selected.T @ values
+    question_sums, totals = sums[:, : -len(polls)], sums[:, -len(polls) :]
+
+    # outputs appear if one of the poll's constituencies has a fragment in them
+    fragments = sparse.csr_matrix(
+        (np.ones_like(selected.data), selected.indices, selected.indptr),
+        shape=selected.shape,
+    )
+    present = fragments.T @ coverage[found] > 0
+
+    # population results are shares of the council population,
+    # area results of the area the polled constituencies cover
+    outputs = CouncilOutputs.from_gss_codes(first.output_codes, COUNCILS_2023, tiers)
+    gss_pop = np.nan_to_num(outputs.populations())[:, None]
+    denominators = np.vstack(
+        [
+            np.broadcast_to(gss_pop, block.shape) if measure == "population" else block
+            for measure, block in zip(overlap_measures, np.split(totals, len(matrices)))
+        ]
     )
 
-    polling_df = polling_df / 100
-    polling_df = polling_df.reset_index()
+    # only councils with polling count towards the higher tiers, as in roll_up
+    aggregation = sparse.block_diag([outputs.aggregation] * len(matrices)).tocsr()
+    council_sums = aggregation.T @ question_sums
+    council_denominators = aggregation.T @ (denominators * present)
+    council_present = aggregation.T @ present.astype(float) > 0
+
+    names = add_council_info(
+        pd.DataFrame({"local-authority-code": outputs.codes}),
+        ["official-name"],
+        as_of_date=COUNCILS_2023,
+    )
+    methods = np.repeat(list(overlap_measures), len(outputs.codes))
+    council_codes = np.tile(names["local-authority-code"], len(matrices))
+    official_names = np.tile(names["official-name"], len(matrices))
+
+    results = {}
+    start = 0
+    for i, (name, df) in enumerate(polls.items()):
+        question_cols = list(df.columns)[1:]
+        columns = slice(start, start + len(question_cols))
+        start += len(question_cols)
+
+        rows = council_present[:, i]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            percentages = (
+                council_sums[rows, columns] / council_denominators[rows, i][:, None]
+            )
+        final = pd.DataFrame(percentages, columns=question_cols)
+        final.insert(0, "method", methods[rows])
+        final.insert(1, "local-authority-code", council_codes[rows])
+        final.insert(2, "official-name", official_names[rows])
+        results[name] = final
+    return results
 
-    df = convert_parl_polling_to_la(polling_df)
 
-    melted_df = df.melt(
-        id_vars=["local-authority-code", "official-name"],
-        value_name="percentage",
+def convert_parl_polling_methods(
+    polling_df: PollingDataFrame,
+    *,
+    overlap_measures: Sequence[OverlapTypes] = ("population", "area"),
+    tiers: Sequence[str] = COUNCIL_TIERS,
+) -> pd.DataFrame:
+    """
+    Convert the polling data to councils for several overlap measures in one go.
+    Returns a long df of method, local-authority-code, official-name,
+    question, percentage, with councils in the same order
+    as convert_parl_polling_to_la for each method.
+    """
+    final = convert_parl_polling_batch(
+        {"polling": polling_df}, overlap_measures=overlap_measures, tiers=tiers
+    )["polling"]
+
+    return long_format(
+        final,
+        id_cols=["method", "local-authority-code", "official-name"],
+        value_cols=list(polling_df.columns)[1:],
         var_name="question",
+        value_name="percentage",
     )
-    melted_df["source"] = "RenewableUK2022"
-    # move to first column
-    cols = melted_df.columns.tolist()
-    cols = cols[-1:] + cols[:-1]
-    melted_df = melted_df[cols]
-
-    questions = melted_df["question"].unique().tolist()
-    short = ["Q" + x.split(")")[0] for x in questions]
-    lookup = dict(zip(questions, short))
-    melted_df["question"] = melted_df["question"].map(lookup)
-
-    lookup_dataframe = pd.DataFrame.from_dict(lookup, orient="index")
-    lookup_dataframe = lookup_dataframe.reset_index()
-    lookup_dataframe.columns = ["question", "short"]
-    lookup_dataframe["source"] = "RenewableUK2022"
-    # move to first column
-    cols = lookup_dataframe.columns.tolist()
-    cols = cols[-1:] + cols[:-1]
-    lookup_dataframe = lookup_dataframe[cols]
-
-    lookup_dataframe.to_csv(
-        Path("data", "interim", "polling", "RenewableUK2022_lookup.csv"), index=False
+
+
+def convert_parl_intervals_to_la(
+    polling_df: pd.DataFrame,
+    *,
+    overlap_measure: Literal["area", "population"] = "population",
+    uncertainty: UncertaintyTypes = "standard_error",
+    draws: int | None = None,
+    level: float = 0.95,
+    seed: int | None = None,
+) -> pd.DataFrame:
+    """
+    As convert_parl_polling_to_la, for polling with standard errors (_se columns)
+    or bounds (_lower and _upper columns).
+    Each question gets _se, _lower and _upper columns for every council.
+    Higher tiers are added to the weight matrix as extra outputs, so councils
+    that share a constituency are not treated as independent when summed.
+    """
+    matrix = get_converter("PARL10", "LAD23", overlap_measure).matrix
+    outputs = CouncilOutputs.from_gss_codes(matrix.output_codes, COUNCILS_2023)
+    matrix = matrix.aggregate_outputs(outputs.aggregation, outputs.codes)
+
+    df = matrix.convert_uncertainty(
+        polling_df,
+        output_code_col="local-authority-code",
+        uncertainty=uncertainty,
+        input_values_type="percentage",
+        output_values_type="absolute",
+        draws=draws,
+        level=level,
+        seed=seed,
     )
+    value_cols = list(df.columns)[1:]
+    denominator = DENOMINATORS[overlap_measure]
+
+    if overlap_measure == "area":
+        # the aggregated matrix already sums the area of the higher tiers
+        area = overlap_totals(matrix, polling_df)
+        final = df.assign(**{denominator: df["local-authority-code"].map(area)})
+    else:
+        is_lower = df["local-authority-code"].isin(outputs.lower_codes)
+        pop = add_council_info(
+            df.loc[is_lower, ["local-authority-code"]],
+            ["pop-2020"],
+            as_of_date=COUNCILS_2023,
+        )
+        pop = pd.concat([outputs.membership.roll_up(pop, ["pop-2020"]), pop])
+        final = df.merge(pop, on="local-authority-code", how="left")
 
-    melted_df.to_csv(
-        Path("data", "interim", "polling", "RenewableUK2022.csv"), index=False
+    # calculate the percentages
+    for c in value_cols:
+        final[c] = final[c] / final[denominator]
+
+    final = add_council_info(final, ["official-name"], as_of_date=COUNCILS_2023)
+
+    return final[["local-authority-code", "official-name"] + value_cols]
+
+
+def source_results(source: PollingSource, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Take one source's converted questions as a long df of
+    source, method, local-authority-code, official-name, question, percentage
+    without an intermediate melt
+    """
+    id_cols = ["method", "local-authority-code", "official-name"]
+    return long_format(
+        df,
+        id_cols=id_cols,
+        value_cols=[c for c in df.columns if c not in id_cols],
+        var_name="question",
+        value_name="percentage",
+        constants={"source": source.name},
     )
 
 
+def write_source_results(source: PollingSource, df: pd.DataFrame):
+    """
+    Write a source's converted results, and its question lookup if it has one
+    """
+    long_df = source_results(source, df)
+
+    questions = long_df["question"].cat.categories.tolist()
+    lookup_df = source.question_lookup(questions)
+    if lookup_df is not None:
+        lookup = dict(zip(lookup_df["question"], lookup_df["short"]))
+        long_df["question"] = long_df["question"].map(lookup)
+        write_interim(lookup_df, interim_path("polling", f"{source.name}_lookup"))
+
+    write_partition(long_df, RESULTS_DATASET)
+    note_rows(rows_out=len(long_df))
+
+
+@contextmanager
+def reported(name: str, failed: dict[str, Exception]) -> Iterator[None]:
+    """
+    Print and record an error for a source, rather than stopping the others
+    """
+    try:
+        yield
+    except Exception as e:
+        print(f"{name} failed:")
+        traceback.print_exc()
+        failed[name] = e
+
+
+def convert_sources(
+    names: list[str] | None = None,
+    *,
+    overlap_measures: Sequence[OverlapTypes] = ("population",),
+):
+    """
+    Convert registered polling sources to local authorities.
+    All the sources' questions are converted together in one batch,
+    for every overlap measure.
+    A source that fails to read or write is reported after the others
+    are written.
+    """
+    sources = [SOURCES[name] for name in (names or SOURCES)]
+
+    failed: dict[str, Exception] = {}
+    polls = {}
+    for source in sources:
+        with reported(source.name, failed):
+            polls[source.name] = source.read()
+    note_rows(rows_in=sum(len(df) for df in polls.values()))
+
+    if polls:
+        results = convert_parl_polling_batch(polls, overlap_measures=overlap_measures)
+        for source in sources:
+            if source.name in results:
+                with reported(source.name, failed):
+                    write_source_results(source, results[source.name])
+
+    if failed:
+        raise RuntimeError(f"Polling sources failed: {', '.join(failed)}")
+
+
+def convert_renewable_uk():
+    """
+    Convert RenewableUK polling to local authorities
+    https://www.renewableuk.com/news/615931/Polling-in-every-constituency-in-Britain-shows-strong-support-for-wind-farms-to-drive-down-bills.htm
+
+    """
+    convert_sources(["RenewableUK2022"])
+
+
 def convert_onward_guide():
     """
     Make guide lookup correct
     """
-    guide_df = pd.read_excel(
-        str(
-            Path(
-                "data",
-                "raw",
-                "polling",
-                "Public-First-Poll-for-Onward-MRP-Model.xlsx",
-            )
-        ),
-        sheet_name="GUIDE",
-    )
+    guide_path = SOURCES["Onward2022"].file
+    guide_df = read_sheet(guide_path, "GUIDE")
 
     party_qs = guide_df[["Key", "Question"]].head(11)
 
@@ -178,18 +472,7 @@ def convert_onward_guide():
             answer = row["Question"] + " -- " + answer_row["Answer Options"]
             new_keys[key] = answer
 
-    guide_df = pd.read_excel(
-        str(
-            Path(
-                "data",
-                "raw",
-                "polling",
-                "Public-First-Poll-for-Onward-MRP-Model.xlsx",
-            )
-        ),
-        sheet_name="GUIDE",
-        skiprows=15,
-    )
+    guide_df = read_sheet(guide_path, "GUIDE", skiprows=15)
 
     # in Question column, fill a nan value with the previous value in the column
     guide_df["Key"] = guide_df["Key"].fillna(method="ffill")
@@ -203,68 +486,15 @@ def convert_onward_guide():
     new_keys["source"] = "Onward2022"
     # rearrange to source,question,short
     new_keys = new_keys[["source", "question", "short"]]
-    new_keys.to_csv(
-        Path("data", "interim", "polling", "Onward2022_lookup.csv"), index=False
-    )
+    write_interim(new_keys, interim_path("polling", "Onward2022_lookup"))
+    note_rows(rows_out=len(new_keys))
 
 
 def convert_onward():
     """
     Convert  onward 2022 polling
     """
-    df = pd.read_excel(
-        str(
-            Path(
-                "data",
-                "raw",
-                "polling",
-                "Public-First-Poll-for-Onward-MRP-Model.xlsx",
-            )
-        ),
-        sheet_name="MRP Results",
-    )
-    valid_columns = [
-        c
-        for c in df.columns
-        if (c == "Constituency" or c.startswith("Q")) and not c.endswith("Winner")
-    ]
-    df = df[valid_columns]
-
-    lookup = pd.read_csv(
-        Path(
-            "data",
-            "raw",
-            "Westminster_Parliamentary_Constituencies_(Dec_2020)_Names_and_Codes_in_the_United_Kingdom.csv",
-        )
-    )
-    lookup["PCON20NM"] = lookup["PCON20NM"].apply(sort_name)
-
-    lookup = lookup.set_index("PCON20NM")["PCON20CD"].to_dict()
-
-    df["PCON2010"] = df["Constituency"].apply(sort_name).apply(lambda x: lookup[x])
-
-    # move the constituency column to the front
-    cols = df.columns.tolist()
-    cols = cols[-1:] + cols[:-1]
-    df = df[cols]
-
-    # drop constituency name
-    df = df.drop(columns=["Constituency"])
-
-    df = convert_parl_polling_to_la(df)
-
-    melted_df = df.melt(
-        id_vars=["local-authority-code", "official-name"],
-        value_name="percentage",
-        var_name="question",
-    )
-    melted_df["source"] = "Onward2022"
-    # move to front
-    cols = melted_df.columns.tolist()
-    cols = cols[-1:] + cols[:-1]
-    melted_df = melted_df[cols]
-
-    melted_df.to_csv(Path("data", "interim", "polling", "Onward2022.csv"), index=False)
+    convert_sources(["Onward2022"])
 
 
 def join_files():
@@ -273,43 +503,52 @@ def join_files():
     """
     polling_dir = Path("data", "interim", "polling")
 
-    # read all polling files
-    polling_files = [
-        x
-        for x in polling_dir.iterdir()
-        if x.suffix == ".csv" and "lookup" not in x.name
-    ]
-    polling_dfs = [pd.read_csv(x) for x in polling_files]
-    df = pd.concat(polling_dfs, ignore_index=True)
-    df.to_csv(
+    table = read_dataset(RESULTS_DATASET)
+    note_rows(rows_in=table.num_rows, rows_out=table.num_rows)
+    render_csv(
+        table,
         Path(
             "data",
             "packages",
             "local_authority_climate_polling",
             "local_authority_climate_polling.csv",
         ),
-        index=False,
     )
 
     # convert guides
     guide_files = [
-        x for x in polling_dir.iterdir() if x.suffix == ".csv" and "lookup" in x.name
+        x
+        for x in sorted(polling_dir.iterdir())
+        if x.suffix == ".parquet" and "lookup" in x.name
     ]
-    guide_dfs = [pd.read_csv(x) for x in guide_files]
-    df = pd.concat(guide_dfs, ignore_index=True)
-    df.to_csv(
+    table = concat_interim(guide_files)
+    render_csv(
+        table,
         Path(
             "data",
             "packages",
             "local_authority_climate_polling",
             "local_authority_climate_polling_guide.csv",
         ),
-        index=False,
     )
 
 
-def convert_all():
-    convert_renewable_uk()
-    convert_onward()
-    convert_onward_guide()
-    join_files()
+def convert_all(
+    jobs: int = 1, overlap_measures: Sequence[OverlapTypes] = ("population",)
+):
+    """
+    Convert all polling sources and join them.
+    The sources convert as one batch for all the overlap measures,
+    alongside the Onward guide when jobs > 1.
+    """
+    sources = [
+        Task(
+            "polling_sources",
+            partial(convert_sources, overlap_measures=tuple(overlap_measures)),
+        ),
+        Task("onward_guide", convert_onward_guide),
+    ]
+    join = Task("join_files", join_files, depends_on=tuple(t.name for t in sources))
+
+    results = run_tasks(sources + [join], jobs=jobs)
+    report(results)
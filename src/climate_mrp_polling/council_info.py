@@ -0,0 +1,182 @@
+"""
+Process-wide, date-indexed cache of council metadata.
+
+GovLayers.get_council_info rebuilds its joined council table on every call.
+Here the columns the pipelines use are fetched once for the councils needed,
+held in a table indexed by council code for each (as_of_date, include_historical),
+and can be saved to disk so CLI runs and notebooks share them.
+
+Saved tables are keyed by council_data_version, so updating data_common
+gives a fresh cache. Set CLIMATE_MRP_COUNCIL_DATA_VERSION to pick up
+changes to the council data that data_common doesn't record.
+"""
+
+import hashlib
+import importlib.metadata
+import importlib.util
+import os
+import subprocess
+from dataclasses import dataclass, field
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+
+COUNCIL_CACHE_DIR = Path("data", "cache", "councils")
+COUNCIL_DATA_VERSION_ENV = "CLIMATE_MRP_COUNCIL_DATA_VERSION"
+
+# every lookup fetches all of these, so one call serves every later use
+COUNCIL_INFO_COLUMNS = [
+    "official-name",
+    "pop-2020",
+    "replaced-by",
+    "county-la",
+    "combined-authority",
+]
+
+CouncilFetcher = Callable[[list[str], date, bool], pd.DataFrame]
+
+
+@lru_cache(maxsize=None)
+def council_data_version() -> str:
+    """
+    Fingerprint of the council data GovLayers reads: the installed data_common
+    version and the commit of its checkout, without importing it.
+    CLIMATE_MRP_COUNCIL_DATA_VERSION is included if set.
+    """
+    parts = [os.environ.get(COUNCIL_DATA_VERSION_ENV, "")]
+    spec = importlib.util.find_spec("data_common")
+    if spec is None or spec.origin is None:
+        parts.append("no data_common")
+    else:
+        try:
+            parts.append(importlib.metadata.version("data_common"))
+        except importlib.metadata.PackageNotFoundError:
+            pass
+        package_dir = Path(spec.origin).parent
+        # the submodule checkout, rather than the repo around it
+        for parent in [package_dir, *package_dir.parents]:
+            if (parent / ".git").exists():
+                commit = subprocess.run(
+                    ["git", "rev-parse", "HEAD"],
+                    cwd=parent,
+                    capture_output=True,
+                    text=True,
+                )
+                parts.append(commit.stdout.strip())
+                break
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:16]
+
+
+def fetch_from_gov_layers(
+    codes: list[str], as_of_date: date, include_historical: bool
+) -> pd.DataFrame:
+    from data_common.pandas import GovLayers
+
+    return GovLayers(pd.DataFrame({"local-authority-code": codes})).get_council_info(
+        COUNCIL_INFO_COLUMNS,
+        include_historical=include_historical,
+        as_of_date=as_of_date,
+    )
+
+
+@dataclass
+class CouncilInfoCache:
+    as_of_date: date
+    include_historical: bool = True
+    cache_dir: Path | None = COUNCIL_CACHE_DIR
+    fetch: CouncilFetcher = fetch_from_gov_layers
+    version: str = ""
+    table: pd.DataFrame = field(init=False)
+
+    def __post_init__(self):
+        if self.path is not None and self.path.exists():
+            self.table = pd.read_parquet(self.path)
+        else:
+            self.table = pd.DataFrame(
+                columns=COUNCIL_INFO_COLUMNS,
+                index=pd.Index([], name="local-authority-code"),
+            )
+
+    @property
+    def path(self) -> Path | None:
+        if self.cache_dir is None:
+            return None
+        kind = "historical" if self.include_historical else "current"
+        version = f"_{self.version}" if self.version else ""
+        return (
+            self.cache_dir
+            / f"councils_{self.as_of_date.isoformat()}_{kind}{version}.parquet"
+        )
+
+    def lookup(self, codes: pd.Series | list[str], columns: list[str]) -> pd.DataFrame:
+        """
+        Get the columns for each code, in the same order as codes.
+        Councils not seen before are fetched together in one call.
+        Codes the fetch doesn't return are kept as empty rows,
+        so they aren't fetched again.
+        """
+        codes = pd.Series(codes, dtype=object)
+        missing = codes[~codes.isin(self.table.index)].dropna().unique().tolist()
+        if missing:
+            fetched = (
+                self.fetch(missing, self.as_of_date, self.include_historical)
+                .drop_duplicates("local-authority-code")
+                .set_index("local-authority-code")[COUNCIL_INFO_COLUMNS]
+                .reindex(pd.Index(missing, name="local-authority-code"))
+            )
+            self.table = pd.concat([self.table, fetched])
+            self.save()
+        return self.table.reindex(codes)[columns].reset_index(drop=True)
+
+    def save(self):
+        """
+        Write the table, adding anything another process saved meanwhile.
+        Written to a temporary file and moved into place, so readers never
+        see half a file.
+        """
+        if self.path is None:
+            return
+        if self.path.exists():
+            saved = pd.read_parquet(self.path)
+            saved = saved[~saved.index.isin(self.table.index)]
+            self.table = pd.concat([saved, self.table])
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        partial = self.path.with_suffix(f".{os.getpid()}.tmp")
+        self.table.astype({"pop-2020": float}).to_parquet(partial)
+        os.replace(partial, self.path)
+
+
+_caches: dict[tuple[date, bool], CouncilInfoCache] = {}
+
+
+def get_council_cache(
+    as_of_date: date, include_historical: bool = True
+) -> CouncilInfoCache:
+    key = (as_of_date, include_historical)
+    if key not in _caches:
+        _caches[key] = CouncilInfoCache(
+            as_of_date, include_historical, version=council_data_version()
+        )
+    return _caches[key]
+
+
+def add_council_info(
+    df: pd.DataFrame,
+    columns: list[str],
+    *,
+    as_of_date: date,
+    include_historical: bool = True,
+    code_col: str = "local-authority-code",
+) -> pd.DataFrame:
+    """
+    Add council metadata columns to a df, as GovLayers.get_council_info does,
+    from the cache.
+    """
+    cache = get_council_cache(as_of_date, include_historical)
+    info = cache.lookup(df[code_col], columns)
+    df = df.reset_index(drop=True).copy()
+    df[columns] = info
+    return df
@@ -2,6 +2,9 @@ from pathlib import Path
 import pandas as pd
 from data_common.pandas import GovLayers
 
+from .storage import interim_path, write_interim
+from .workbooks import read_sheet
+
 
 def create_unified_con_pop():
     """
@@ -15,7 +18,7 @@ def create_unified_con_pop():
 
     print("pPocessing E&W 2020")
     df = (
-        pd.read_excel(str(pop_file), sheet_name="Mid-2020 Persons", header=4)
+        read_sheet(pop_file, "Mid-2020 Persons", header=4)
         .drop(columns=["PCON11NM", "All Ages"])
         .set_index("PCON11CD")
     )
@@ -29,7 +32,7 @@ def create_unified_con_pop():
     print("Processing Scot 2021")
     scot_pop_file = pop_folder / "ukpc-21-tabs.xlsx"
     df = (
-        pd.read_excel(str(scot_pop_file), sheet_name="2021", header=3)
+        read_sheet(scot_pop_file, "2021", header=3)
         .rename(columns={"UK Parliamentary Constituency 2005 Code": "PCON11CD"})
         .loc[lambda df: df["Sex"] == "Persons"]
         .drop(columns=["UK Parliamentary Constituency 2005 Name", "Sex", "Total"])
@@ -42,7 +45,7 @@ def create_unified_con_pop():
 
     print("Processing NI 2020")
     ni_file = pop_folder / "MYE20-SYA.xlsx"
-    df = pd.read_excel(str(ni_file), sheet_name="Flat")
+    df = read_sheet(ni_file, "Flat")
 
     partial = df.loc[
         (df["area"] == "3. Parliamentary Constituencies (2008)")
@@ -56,7 +59,7 @@ def create_unified_con_pop():
     print("Joining all three")
     pops = [ew_pop, scot_pop, ni_pop]
     df_con = pd.concat(pops)
-    df_con.to_csv(Path("data", "interim", "con_2010_pops.csv"), index=False)
+    write_interim(df_con, interim_path("con_2010_pops"))
     print("Done")
 
 
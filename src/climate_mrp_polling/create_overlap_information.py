@@ -1,11 +1,26 @@
 from datetime import date
 from pathlib import Path
 
-import geopandas
 import pandas as pd
 
-from data_common.db.duck import DuckQuery
-from data_common.pandas import GovLayers
+from .build import Stage, run_stages
+from .council_info import add_council_info, council_data_version
+from .instrumentation import note_rows, stage
+from .storage import interim_path, read_interim, render_csv, write_interim
+from .tiers import TierMembership, get_tier_membership
+
+ONSPD_FILE = Path("data", "raw", "ONSPD_NOV_2022_UK_reduced.parquet")
+LSOA_POP_FILE = Path("data", "raw", "2019_population.csv")
+LA_FILE = Path(
+    "data", "raw", "geopackages", "Local_Authority_Districts_(May_2021)_UK_BFC.gpkg"
+)
+PA_FILE = Path(
+    "data",
+    "raw",
+    "geopackages",
+    "Westminster_Parliamentary_Constituencies_(Dec_2021)_UK_BFC.gpkg",
+)
+COUNCILS_2023 = date(2023, 4, 2)
 
 
 def create_2022_council_percentages_pop():
@@ -14,153 +29,93 @@ def create_2022_council_percentages_pop():
     Basically using the onspd, we know the mapping of postcodes to lsoas, local authorities, and pcons
     Using the lsoa population, we can work out the rough population of each postcode
     We then sum this back up for pcons, and for each overlap between pcons and local authorities
+    See population_overlap.py for the query, which scans the onspd once.
     """
-    print("Calcuating population")
-
-    duck = DuckQuery()
-
-    onspd = Path("data", "raw", "ONSPD_NOV_2022_UK_reduced.parquet")
-    lsoa_pop_df = pd.read_csv(Path("data", "raw", "2019_population.csv"), thousands=",")
+    from .population_overlap import create_pop_overlap, read_lsoa_pop
 
-    duck.register("onspd", onspd)
-    duck.register("lsoa_pop", lsoa_pop_df)
-
-    # get the count of how many postcodes in each lsoa
+    print("Calcuating population")
 
-    duck.query(
-        "SELECT lsoa11 as lsoa, count(distinct pcd) as count FROM onspd group by all"
-    ).to_view("lsoa_count").df().head()
+    with stage("population/onspd"):
+        output = create_pop_overlap(
+            ONSPD_FILE,
+            read_lsoa_pop(LSOA_POP_FILE),
+            interim_path("percentage_overlap_2022_councils_pop"),
+        )
+        df = read_interim(output)
+        note_rows(rows_out=len(df))
 
-    # calculate average population per postcode -
-    # where this is 0, set to 1 (areas with high commerical, low residence, roughly this works out fine)
-    query = """
-    select
-        lsoa,
-        pop,
-        count,
-        case when cast(pop as float)/cast(count as float) = 0 then 1 else cast(pop as float)/cast(count as float) end as average_pop_per_postcode
-    from
-        lsoa_count
-    join
-        lsoa_pop using(lsoa)
-    """
+    with stage("population/update_to_2023"):
+        df_2023 = update_to_2023(df)
+        note_rows(rows_in=len(df), rows_out=len(df_2023))
+    write_interim(df_2023, interim_path("percentage_overlap_2023_councils_pop"))
 
-    duck.query(query).to_view("lsoa_count_pop")
-
-    # sum up the average population per postcode for each pcon
-    query = """
-    select
-        pcon,
-        sum(average_pop_per_postcode) as pcon_pop
-    from
-        onspd
-    join
-        lsoa_count_pop on (onspd.lsoa11 = lsoa_count_pop.lsoa)
-    group by
-        ALL
-    """
 
-    duck.query(query).to_view("pcon_pop")
-
-    # this is the poplation overlap between the pcon and the la
-    query = """
-    select
-        pcon,
-        oslaua,
-        sum(average_pop_per_postcode) as pop_overlap
-    from
-        onspd
-    join
-        lsoa_count_pop on (onspd.lsoa11 = lsoa_count_pop.lsoa)
-    group by
-        ALL
-    order by
-        pcon
+def create_onspd_overlaps(
+    pairs: list[tuple[str, str]],
+    labels: dict[str, str] | None = None,
+    add_to_cache: bool = False,
+):
     """
-
-    duck.query(query).to_view("pop_overlap")
-
-    # finally we can get the percentage of the pcon population that overlaps with the la
-
-    query = """
-    select
-        pcon as PCON21CD,
-        oslaua as LAD21CD,
-        pop_overlap/pcon_pop as percentage_overlap
-    from
-        pop_overlap
-    join
-        pcon_pop using (pcon)
+    Generate population overlap files for any pairs of ONSPD geographies,
+    in one scan of the ONSPD.
+    With add_to_cache, get_overlap_df will use these rather than downloading.
     """
-
-    df = duck.query(query).df()
-
-    df.to_csv(
-        Path("data", "interim", "percentage_overlap_2022_councils_pop.csv"),
-        index=False,
+    from .population_overlap import (
+        cache_pop_overlaps,
+        create_pop_overlaps,
+        read_lsoa_pop,
     )
 
-    df_2023 = update_to_2023(df)
-    df_2023.to_csv(
-        Path("data", "interim", "percentage_overlap_2023_councils_pop.csv"),
-        index=False,
+    print("Calcuating population overlaps")
+    paths = create_pop_overlaps(
+        ONSPD_FILE,
+        read_lsoa_pop(LSOA_POP_FILE),
+        pairs,
+        Path("data", "interim", "overlaps"),
+        labels=labels,
     )
+    if add_to_cache:
+        cache_pop_overlaps(paths)
 
 
-def overlap(row: pd.Series) -> float:
-    pc_geo = row["pc_geo"]
-    la_geo = row["la_geo"]
-    intersect = pc_geo.intersection(la_geo)
-    percentage = intersect.area / pc_geo.area
-    return percentage
-
-
-def create_2022_council_percentages_area():
+def create_2022_council_percentages_area(processes: int = 1):
     """
     Create overlap of area between constituencies and local authorities as of 2022 from shapefile
+    Intersections are calculated as one vectorised operation,
+    optionally spread across several processes.
     """
-    print("Calcuating area")
-    raw_data = Path("data", "raw", "geopackages")
-    la_file = raw_data / "Local_Authority_Districts_(May_2021)_UK_BFC.gpkg"
-    pa_file = (
-        raw_data / "Westminster_Parliamentary_Constituencies_(Dec_2021)_UK_BFC.gpkg"
-    )
-    la_df = geopandas.read_file(la_file)
-    pa_df = geopandas.read_file(pa_file)
-    la_df["geometry"] = la_df["geometry"].buffer(0)
-    pa_df["geometry"] = pa_df["geometry"].buffer(0)
-
-    # merge both on geometry
-    df = pa_df.sjoin(la_df, how="left")[["PCON21CD", "PCON21NM", "LAD21CD", "LAD21NM"]]
+    from .spatial import area_overlap, read_repaired_file
 
-    # get the geometry column back in
-    df = df.merge(pa_df[["PCON21CD", "geometry"]], on="PCON21CD").rename(
-        columns={"geometry": "pc_geo"}
-    )
-    pa_df = None
-    df = df.merge(la_df[["LAD21CD", "geometry"]], on="LAD21CD").rename(
-        columns={"geometry": "la_geo"}
-    )
-    la_df = None
+    print("Calcuating area")
+    # repaired geometries are cached, keyed on the source file
+    with stage("area/read_boundaries"):
+        la_df = read_repaired_file(LA_FILE)
+        pa_df = read_repaired_file(PA_FILE)
+        note_rows(rows_out=len(la_df) + len(pa_df))
 
     # calculate the percentage overlap between a constituency and a local authority based on area
-    df["percentage_overlap"] = df.apply(overlap, axis="columns")
+    with stage("area/intersect"):
+        df = area_overlap(
+            pa_df,
+            la_df,
+            from_code="PCON21CD",
+            to_code="LAD21CD",
+            processes=processes,
+        )
+        note_rows(rows_in=len(la_df) + len(pa_df), rows_out=len(df))
 
-    df = (
-        df[df["percentage_overlap"] >= 0.01]
-        .sort_values("percentage_overlap")
-        .drop(columns=["pc_geo", "la_geo"])
-    )
-    df.to_csv(
-        Path("data", "interim", "percentage_overlap_2022_councils_area.csv"),
-        index=False,
-    )
+    # add the names back in
+    df = df.merge(pa_df[["PCON21CD", "PCON21NM"]], on="PCON21CD").merge(
+        la_df[["LAD21CD", "LAD21NM"]], on="LAD21CD"
+    )[["PCON21CD", "PCON21NM", "LAD21CD", "LAD21NM", "percentage_overlap"]]
 
-    df_2023 = update_to_2023(df)
-    df_2023.to_csv(
-        Path("data", "interim", "percentage_overlap_2023_councils_area.csv"),
-        index=False,
-    )
+    df = df[df["percentage_overlap"] >= 0.01].sort_values("percentage_overlap")
+    write_interim(df, interim_path("percentage_overlap_2022_councils_area"))
+
+    with stage("area/update_to_2023"):
+        df_2023 = update_to_2023(df)
+        note_rows(rows_in=len(df), rows_out=len(df_2023))
+    write_interim(df_2023, interim_path("percentage_overlap_2023_councils_area"))
 
 
 def update_to_2023(df: pd.DataFrame) -> pd.DataFrame:
@@ -168,13 +123,20 @@ def update_to_2023(df: pd.DataFrame) -> pd.DataFrame:
     Update 2022 to 2023 boundaries, including rolling up to higher tiers
     Results in some double counting - but that's fine as long as interpreted right at the next stgae.
     """
-    councils_2023 = date(2023, 4, 2)
+    from data_common.pandas import GovLayers
 
     df = GovLayers(df).create_code_column("gss", "LAD21CD")
-    df = GovLayers(df).get_council_info(
-        ["replaced-by"], include_historical=True, as_of_date=councils_2023
-    )
+    df = add_council_info(df, ["replaced-by"], as_of_date=COUNCILS_2023)
+    return roll_up_to_2023(df)
+
 
+def roll_up_to_2023(
+    df: pd.DataFrame, membership: TierMembership | None = None
+) -> pd.DataFrame:
+    """
+    Move councils to the councils that replaced them, then add the higher tiers.
+    df has PCON21CD, local-authority-code, replaced-by and percentage_overlap columns.
+    """
     df["future-code"] = df["replaced-by"].fillna(df["local-authority-code"])
 
     lower_tiers = (
@@ -184,66 +146,97 @@ def update_to_2023(df: pd.DataFrame) -> pd.DataFrame:
         .rename(columns={"future-code": "local-authority-code"})
     )
 
-    layers = ["county-la", "combined-authority"]
-
-    gdf = GovLayers(lower_tiers).get_council_info(
-        layers, include_historical=True, as_of_date=councils_2023
-    )
-
-    dfs = [lower_tiers]
-    for layer in layers:
-        # reduce to just nonnas in the layer
-        df = gdf[gdf[layer].notna()]
-        # then group by the layer and sum the percentage overlap
-        df = (
-            df.groupby(["PCON21CD", layer])
-            .agg({"percentage_overlap": "sum"})
-            .reset_index()
+    # all higher tiers in one sparse aggregation
+    if membership is None:
+        membership = get_tier_membership(
+            lower_tiers["local-authority-code"], COUNCILS_2023
         )
-        # then rename the layer column to be the same as the layer
-        df = df.rename(columns={layer: "local-authority-code"})
-        dfs.append(df)
+    higher_tiers = membership.roll_up_long(
+        lower_tiers, key_col="PCON21CD", value_col="percentage_overlap"
+    )
 
-    df = pd.concat(dfs)
+    df = pd.concat([lower_tiers, higher_tiers])
 
     return df
 
 
-def merge_data():
-    area_df = pd.read_csv(
-        Path("data", "interim", "percentage_overlap_2023_councils_area.csv")
-    ).rename(columns={"percentage_overlap": "percentage_overlap_area"})
-    pop_df = pd.read_csv(
-        Path("data", "interim", "percentage_overlap_2023_councils_pop.csv")
-    ).rename(columns={"percentage_overlap": "percentage_overlap_pop"})
+def merge_overlaps(area_df: pd.DataFrame, pop_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Join the area and population overlaps for each constituency and council
+    """
+    area_df = area_df.rename(columns={"percentage_overlap": "percentage_overlap_area"})
+    pop_df = pop_df.rename(columns={"percentage_overlap": "percentage_overlap_pop"})
 
     # if percentage_overlap_area > 0.999 - round up to 1
     area_df.loc[
         area_df["percentage_overlap_area"] > 0.9999, "percentage_overlap_area"
     ] = 1
 
-    df = area_df.merge(
+    return area_df.merge(
         pop_df, on=["PCON21CD", "local-authority-code"], how="outer"
     ).fillna(0)
-    df.to_csv(
-        Path("data", "interim", "percentage_overlap_2023_councils_both.csv"),
-        index=False,
-    )
-    df.to_csv(
+
+
+def merge_data():
+    area_df = read_interim(interim_path("percentage_overlap_2023_councils_area"))
+    pop_df = read_interim(interim_path("percentage_overlap_2023_councils_pop"))
+    df = merge_overlaps(area_df, pop_df)
+    note_rows(rows_in=len(area_df) + len(pop_df), rows_out=len(df))
+    write_interim(df, interim_path("percentage_overlap_2023_councils_both"))
+    render_csv(
+        df,
         Path(
             "data",
             "packages",
             "constituencies_to_local_authorities",
             "percentage_overlap_2023_councils_both.csv",
         ),
-        index=False,
     )
 
 
-def run_conversion():
-    create_2022_council_percentages_area()
-    create_2022_council_percentages_pop()
-    merge_data()
+def run_conversion(processes: int = 1, force: bool = False, dry_run: bool = False):
+    """
+    Build the overlap files, skipping stages whose inputs haven't changed
+    """
+    # a data_common update reruns the stages that use its council data
+    council_date = {
+        "councils_as_of": COUNCILS_2023.isoformat(),
+        "council_data": council_data_version(),
+    }
+    area_2023 = interim_path("percentage_overlap_2023_councils_area")
+    pop_2023 = interim_path("percentage_overlap_2023_councils_pop")
+
+    stages = [
+        Stage(
+            "area",
+            lambda: create_2022_council_percentages_area(processes=processes),
+            inputs=[LA_FILE, PA_FILE],
+            outputs=[interim_path("percentage_overlap_2022_councils_area"), area_2023],
+            values=council_date,
+        ),
+        Stage(
+            "population",
+            create_2022_council_percentages_pop,
+            inputs=[ONSPD_FILE, LSOA_POP_FILE],
+            outputs=[interim_path("percentage_overlap_2022_councils_pop"), pop_2023],
+            values=council_date,
+        ),
+        Stage(
+            "merge",
+            merge_data,
+            inputs=[area_2023, pop_2023],
+            outputs=[
+                interim_path("percentage_overlap_2023_councils_both"),
+                Path(
+                    "data",
+                    "packages",
+                    "constituencies_to_local_authorities",
+                    "percentage_overlap_2023_councils_both.csv",
+                ),
+            ],
+        ),
+    ]
+    run_stages(stages, force=force, dry_run=dry_run)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,17 @@
+"""
+Content fingerprints for input files, used to key caches.
+"""
+
+import hashlib
+from pathlib import Path
+
+
+def file_hash(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """
+    sha256 of a file's content, read in chunks so large files aren't held in memory
+    """
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
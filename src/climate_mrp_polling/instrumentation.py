@@ -0,0 +1,235 @@
+"""
+Timings, row counts, memory and IO for each pipeline stage.
+
+Profiling is switched on with environment variables, so it carries into
+the worker processes of the task runner:
+
+CLIMATE_MRP_PROFILE - a file each stage appends a line of JSON to
+CLIMATE_MRP_PROFILE_STAGE - a stage to run under a profiler
+CLIMATE_MRP_PROFILER - cprofile (the default) or pyinstrument
+
+Stages note their row counts with note_rows, which does nothing when
+profiling is off.
+"""
+
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterator, Literal
+
+PROFILE_ENV = "CLIMATE_MRP_PROFILE"
+PROFILE_STAGE_ENV = "CLIMATE_MRP_PROFILE_STAGE"
+PROFILER_ENV = "CLIMATE_MRP_PROFILER"
+
+Profilers = Literal["cprofile", "pyinstrument"]
+
+
+@dataclass
+class StageRecord:
+    stage: str
+    pid: int
+    started: float
+    seconds: float = 0.0
+    rows_in: int | None = None
+    rows_out: int | None = None
+    peak_rss_bytes: int | None = None
+    bytes_read: int | None = None
+    bytes_written: int | None = None
+    status: str = "done"
+
+
+# the stages running in this process, innermost last
+_active: list[StageRecord] = []
+
+
+def profile_path() -> Path | None:
+    path = os.environ.get(PROFILE_ENV)
+    return Path(path) if path else None
+
+
+def enable_profiling(
+    path: Path,
+    stage: str | None = None,
+    profiler: Profilers = "cprofile",
+):
+    """
+    Record every stage to path (cleared first), and optionally profile one stage
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("")
+    os.environ[PROFILE_ENV] = str(path)
+    if stage:
+        os.environ[PROFILE_STAGE_ENV] = stage
+        os.environ[PROFILER_ENV] = profiler
+
+
+def peak_rss_bytes() -> int:
+    """
+    Peak resident memory of this process since the last reset_peak_rss,
+    or since it started where the OS can't reset it
+    """
+    try:
+        lines = Path("/proc/self/status").read_text().splitlines()
+    except OSError:
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on linux, bytes on mac
+        return usage if sys.platform == "darwin" else usage * 1024
+    status = dict(line.split(":", 1) for line in lines if ":" in line)
+    return int(status["VmHWM"].split()[0]) * 1024
+
+
+def reset_peak_rss():
+    """
+    Reset the peak to the current resident memory, on linux
+    """
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+    except OSError:
+        pass
+
+
+def note_peak_rss(records: list[StageRecord]):
+    """
+    Fold the peak since the last reset into each record
+    """
+    peak = peak_rss_bytes()
+    for record in records:
+        record.peak_rss_bytes = max(record.peak_rss_bytes or 0, peak)
+
+
+def io_counters() -> tuple[int, int] | None:
+    """
+    Bytes read and written by this process so far, where the OS reports them
+    """
+    try:
+        lines = Path("/proc/self/io").read_text().splitlines()
+    except OSError:
+        return None
+    counters = dict(line.split(": ") for line in lines)
+    return int(counters["rchar"]), int(counters["wchar"])
+
+
+def note_rows(rows_in: int | None = None, rows_out: int | None = None):
+    """
+    Record the rows the current stage read and produced
+    """
+    if not _active:
+        return
+    record = _active[-1]
+    if rows_in is not None:
+        record.rows_in = (record.rows_in or 0) + rows_in
+    if rows_out is not None:
+        record.rows_out = (record.rows_out or 0) + rows_out
+
+
+@contextmanager
+def profiled(name: str, profiler: Profilers) -> Iterator[None]:
+    """
+    Run a block under cProfile or pyinstrument, saving the output next to the
+    profile file and printing the top of it
+    """
+    out_dir = (profile_path() or Path(".")).parent
+    if profiler == "pyinstrument":
+        from pyinstrument import Profiler
+
+        pyinstrument_profiler = Profiler()
+        pyinstrument_profiler.start()
+        try:
+            yield
+        finally:
+            pyinstrument_profiler.stop()
+            output = out_dir / f"{name}.html"
+            output.write_text(pyinstrument_profiler.output_html())
+            print(pyinstrument_profiler.output_text())
+            print(f"Saved profile to {output}")
+        return
+
+    import cProfile
+    import pstats
+
+    cprofile = cProfile.Profile()
+    cprofile.enable()
+    try:
+        yield
+    finally:
+        cprofile.disable()
+        output = out_dir / f"{name}.prof"
+        cprofile.dump_stats(output)
+        pstats.Stats(cprofile).sort_stats("cumulative").print_stats(20)
+        print(f"Saved profile to {output}")
+
+
+@contextmanager
+def stage(name: str) -> Iterator[StageRecord | None]:
+    """
+    Time a stage and write its record, if profiling is on
+    """
+    path = profile_path()
+    if path is None:
+        yield None
+        return
+
+    record = StageRecord(stage=name, pid=os.getpid(), started=time.time())
+    io_start = io_counters()
+    # enclosing stages keep their peak so far, then each stage measures its own
+    note_peak_rss(_active)
+    reset_peak_rss()
+    _active.append(record)
+    start = time.perf_counter()
+    try:
+        if os.environ.get(PROFILE_STAGE_ENV) == name:
+            profiler = os.environ.get(PROFILER_ENV, "cprofile")
+            with profiled(name, profiler):  # type: ignore
+                yield record
+        else:
+            yield record
+    except BaseException:
+        record.status = "failed"
+        raise
+    finally:
+        record.seconds = time.perf_counter() - start
+        # anything in this stage also counts towards the stages around it
+        note_peak_rss(_active)
+        _active.remove(record)
+        io_end = io_counters()
+        if io_start and io_end:
+            record.bytes_read = io_end[0] - io_start[0]
+            record.bytes_written = io_end[1] - io_start[1]
+        # one short append per record, so processes can share the file
+        with path.open("a") as f:
+            f.write(json.dumps(asdict(record)) + "\n")
+
+
+def read_records(path: Path) -> list[StageRecord]:
+    return [
+        StageRecord(**json.loads(line))
+        for line in Path(path).read_text().splitlines()
+        if line.strip()
+    ]
+
+
+def summary(records: list[StageRecord]) -> str:
+    """
+    A table of the stage records
+    """
+
+    def size(value: int | None) -> str:
+        return "" if value is None else f"{value / 2**20:.1f}"
+
+    def count(value: int | None) -> str:
+        return "" if value is None else f"{value:,}"
+
+    header = f"{'stage':<24} {'seconds':>9} {'rows in':>12} {'rows out':>12} {'peak MiB':>9} {'read MiB':>9} {'written MiB':>11}"
+    lines = [header, "-" * len(header)]
+    for r in records:
+        lines.append(
+            f"{r.stage:<24} {r.seconds:>9.2f} {count(r.rows_in):>12} "
+            f"{count(r.rows_out):>12} {size(r.peak_rss_bytes):>9} "
+            f"{size(r.bytes_read):>9} {size(r.bytes_written):>11}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,212 @@
+"""
+Match constituency names from polling files to codes.
+
+Names are normalised with vectorised string operations and matched exactly
+through a lookup. Any misses fall back to the closest fuzzy match, and names
+that still can't be matched are reported together.
+
+Fuzzy matches have to be clear: well ahead of the next best name, with every
+word close to a word in the other name (so "north" never matches "south"),
+and not for a code that another name already has.
+"""
+
+from collections import Counter
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+
+import pandas as pd
+
+# the replacements sort_name makes, in order, after the dashes are removed
+LOWER_REPLACEMENTS = [
+    (" & ", " and "),
+    (" of ", " "),
+    (" the ", " "),
+    (",", ""),
+    (" st ", " saint "),
+    (" st.", " saint "),
+    (" st,", " saint "),
+    (" of", " "),
+    ("kingston upon hull", "hull"),
+    (")", ""),
+    ("(", ""),
+]
+
+
+class UnmatchedNamesError(ValueError):
+    """
+    Raised when names can't be matched, listing all of them
+    """
+
+    def __init__(self, names: list[str], fuzzy: list["FuzzyMatch"] | None = None):
+        self.names = names
+        self.fuzzy = fuzzy or []
+        message = f"Could not match {len(names)} names: {names}"
+        if self.fuzzy:
+            matched = [f"{m.name} -> {m.matched}" for m in self.fuzzy]
+            message += f" (fuzzy matched: {matched})"
+        super().__init__(message)
+
+
+def sort_name(s: str) -> str:
+    """
+    Rough function to convert constituency names to a standard format
+    """
+
+    s = s.replace("Na h-Eileanan An Iar (Western Isles)", "Na h-Eileanan an Iar")
+    s = s.replace(" (Yorks)", "")
+    s = s.replace("Môn", "Mon")
+    s = s.replace("-", " ").lower()
+    for old, new in LOWER_REPLACEMENTS:
+        s = s.replace(old, new)
+
+    while "  " in s:
+        s = s.replace("  ", " ")
+
+    l = s.strip().split(" ")
+    l.sort()
+    return " ".join(l)
+
+
+def normalise_names(names: pd.Series) -> pd.Series:
+    """
+    sort_name for a whole series at once
+    """
+    s = (
+        names.astype(str)
+        .str.replace(
+            "Na h-Eileanan An Iar (Western Isles)", "Na h-Eileanan an Iar", regex=False
+        )
+        .str.replace(" (Yorks)", "", regex=False)
+        .str.replace("Môn", "Mon", regex=False)
+        .str.replace("-", " ", regex=False)
+        .str.lower()
+    )
+    for old, new in LOWER_REPLACEMENTS:
+        s = s.str.replace(old, new, regex=False)
+
+    s = s.str.replace(r" {2,}", " ", regex=True).str.strip()
+    return s.str.split(" ").map(sorted).str.join(" ")
+
+
+def similarity(a: str, b: str) -> float:
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def words_match(a: str, b: str, cutoff: float) -> bool:
+    """
+    Whether every word in each name is close to a word in the other
+    """
+    a_words, b_words = a.split(" "), b.split(" ")
+    return all(
+        max(similarity(x, y) for y in others) >= cutoff
+        for words, others in [(a_words, b_words), (b_words, a_words)]
+        for x in words
+    )
+
+
+@dataclass
+class FuzzyMatch:
+    name: str
+    normalised: str
+    matched: str
+    code: str
+    score: float
+
+
+@dataclass
+class NameMatches:
+    """
+    The code for each name, and the names that were only matched fuzzily
+    """
+
+    codes: pd.Series
+    fuzzy: list[FuzzyMatch] = field(default_factory=list)
+
+
+@dataclass
+class NameIndex:
+    """
+    Normalised names to codes
+    """
+
+    lookup: pd.Series
+
+    @classmethod
+    def from_names(cls, names: pd.Series, codes: pd.Series) -> "NameIndex":
+        lookup = pd.Series(codes.to_numpy(), index=normalise_names(names).to_numpy())
+        # as with a dict, a later name wins if two normalise the same
+        lookup = lookup[~lookup.index.duplicated(keep="last")]
+        return cls(lookup)
+
+    def closest(
+        self,
+        name: str,
+        candidates: list[str],
+        cutoff: float,
+        margin: float,
+        word_cutoff: float,
+    ) -> tuple[str, float] | None:
+        """
+        The candidate clearly closest to a normalised name, if there is one
+        """
+        scores = sorted(((similarity(name, c), c) for c in candidates), reverse=True)
+        if not scores:
+            return None
+        best_score, best = scores[0]
+        runner_up = scores[1][0] if len(scores) > 1 else 0.0
+        if best_score < cutoff or best_score - runner_up < margin:
+            return None
+        if not words_match(name, best, word_cutoff):
+            return None
+        return best, best_score
+
+    def match(
+        self,
+        names: pd.Series,
+        fuzzy: bool = True,
+        cutoff: float = 0.85,
+        margin: float = 0.05,
+        word_cutoff: float = 0.85,
+    ) -> NameMatches:
+        """
+        Get the code for each name, with the fuzzy matches made.
+        Raises UnmatchedNamesError listing every name that can't be matched.
+        """
+        normalised = normalise_names(names)
+        codes = normalised.map(self.lookup)
+
+        misses = normalised[codes.isna()].unique()
+        fuzzy_matches: list[FuzzyMatch] = []
+        if len(misses) and fuzzy:
+            # codes with an exact match can't be given to another name
+            used = set(codes.dropna())
+            candidates = [n for n, code in self.lookup.items() if code not in used]
+            originals = dict(zip(normalised, names))
+            for miss in misses:
+                if found := self.closest(miss, candidates, cutoff, margin, word_cutoff):
+                    matched, score = found
+                    fuzzy_matches.append(
+                        FuzzyMatch(
+                            originals[miss], miss, matched, self.lookup[matched], score
+                        )
+                    )
+
+            # two names fuzzily matching one code is as unclear as no match
+            counts = Counter(m.code for m in fuzzy_matches)
+            fuzzy_matches = [m for m in fuzzy_matches if counts[m.code] == 1]
+            codes = codes.fillna(
+                normalised.map({m.normalised: m.code for m in fuzzy_matches})
+            )
+
+        if codes.isna().any():
+            raise UnmatchedNamesError(
+                names[codes.isna()].unique().tolist(), fuzzy_matches
+            )
+
+        return NameMatches(codes, fuzzy_matches)
+
+    def resolve(self, names: pd.Series, fuzzy: bool = True, **kwargs) -> pd.Series:
+        """
+        Get the code for each name, see .match
+        """
+        return self.match(names, fuzzy=fuzzy, **kwargs).codes
@@ -0,0 +1,299 @@
+"""
+Local on-disk cache for the geography overlap files on pages.mysociety.org.
+
+Files are stored under the sha256 of their content, with an index mapping
+(input_geography, output_geography, version_name) to that hash.
+The same file fetched for two versions is only stored once.
+
+Compiled weight matrices are kept next to the file they were built from
+(compiled/{hash}-{overlap column}/), as .npy arrays that processes
+memory map and share rather than each decoding the parquet.
+
+Configured through environment variables:
+
+CLIMATE_MRP_CACHE_DIR - where to keep the cache (default data/cache/overlaps)
+CLIMATE_MRP_OFFLINE - if set to 1/true, never download, only use the cache
+CLIMATE_MRP_CACHE_MAX_BYTES - evict least recently used files above this size
+CLIMATE_MRP_LATEST_MAX_AGE - seconds before a 'latest' download is fetched again
+    (default a day), pinned versions never change so are kept
+CLIMATE_MRP_REFRESH_BEFORE - a unix time, downloads from before it are fetched
+    again (set by --refresh-overlaps, so every worker sees the same cut off)
+
+Files added from local paths (add_file) are never refreshed.
+Reads don't touch the index, last use is the file's modification time.
+Index updates are made under a lock, so parallel workers don't lose
+each other's entries (where fcntl is available, so not on Windows).
+
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import urllib.request
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:
+    # windows, where the index lock is skipped
+    fcntl = None
+
+DEFAULT_CACHE_DIR = Path("data", "cache", "overlaps")
+DEFAULT_MAX_BYTES = 2_000_000_000
+DEFAULT_LATEST_MAX_AGE = 24 * 60 * 60
+
+CACHE_DIR_ENV = "CLIMATE_MRP_CACHE_DIR"
+OFFLINE_ENV = "CLIMATE_MRP_OFFLINE"
+MAX_BYTES_ENV = "CLIMATE_MRP_CACHE_MAX_BYTES"
+LATEST_MAX_AGE_ENV = "CLIMATE_MRP_LATEST_MAX_AGE"
+REFRESH_BEFORE_ENV = "CLIMATE_MRP_REFRESH_BEFORE"
+
+
+class OverlapCacheMiss(Exception):
+    """
+    Raised when an overlap file is not in the cache and we are offline
+    """
+
+
+def env_flag(name: str) -> bool:
+    return os.environ.get(name, "").lower() in ("1", "true", "yes")
+
+
+def cache_key(input_geography: str, output_geography: str, version_name: str) -> str:
+    return f"{input_geography}_{output_geography}_{version_name}"
+
+
+def write_atomic(path: Path, content: bytes):
+    """
+    Write via a temporary file so parallel workers never see half a file
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as f:
+        f.write(content)
+    os.replace(f.name, path)
+
+
+@dataclass
+class OverlapCache:
+    cache_dir: Path = DEFAULT_CACHE_DIR
+    offline: bool = False
+    max_bytes: int | None = DEFAULT_MAX_BYTES
+    latest_max_age: float | None = DEFAULT_LATEST_MAX_AGE
+    refresh_before: float | None = None
+
+    @classmethod
+    def from_env(cls) -> "OverlapCache":
+        max_bytes = os.environ.get(MAX_BYTES_ENV)
+        latest_max_age = os.environ.get(LATEST_MAX_AGE_ENV)
+        refresh_before = os.environ.get(REFRESH_BEFORE_ENV)
+        return cls(
+            cache_dir=Path(os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR)),
+            offline=env_flag(OFFLINE_ENV),
+            max_bytes=int(max_bytes) if max_bytes else DEFAULT_MAX_BYTES,
+            latest_max_age=(
+                float(latest_max_age) if latest_max_age else DEFAULT_LATEST_MAX_AGE
+            ),
+            refresh_before=float(refresh_before) if refresh_before else None,
+        )
+
+    @property
+    def index_path(self) -> Path:
+        return self.cache_dir / "index.json"
+
+    def object_path(self, content_hash: str) -> Path:
+        return self.cache_dir / "objects" / f"{content_hash}.parquet"
+
+    def compiled_path(self, content_hash: str, overlap_column: str) -> Path:
+        return self.cache_dir / "compiled" / f"{content_hash}-{overlap_column}"
+
+    def read_index(self) -> dict[str, dict]:
+        if not self.index_path.exists():
+            return {}
+        return json.loads(self.index_path.read_text())
+
+    def write_index(self, index: dict[str, dict]):
+        write_atomic(self.index_path, json.dumps(index, indent=2).encode())
+
+    @contextmanager
+    def locked_index(self) -> Iterator[dict[str, dict]]:
+        """
+        Read the index for updating, holding a lock until it is written back
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with (self.cache_dir / "index.lock").open("w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            index = self.read_index()
+            yield index
+            self.write_index(index)
+
+    def is_stale(self, item: dict, version_name: str) -> bool:
+        """
+        Whether a downloaded file should be fetched again
+        """
+        if item.get("local"):
+            return False
+        fetched = item.get("fetched", 0)
+        if self.refresh_before is not None and fetched < self.refresh_before:
+            return True
+        if version_name == "latest" and self.latest_max_age is not None:
+            return time.time() - fetched > self.latest_max_age
+        return False
+
+    def get_path(
+        self,
+        input_geography: str,
+        output_geography: str,
+        version_name: str,
+        *,
+        allow_stale: bool = True,
+    ) -> Path | None:
+        """
+        Get the local path for a cached file, or None if it isn't cached
+        (or is stale, unless allow_stale)
+        """
+        key = cache_key(input_geography, output_geography, version_name)
+        item = self.read_index().get(key)
+        if item is None:
+            return None
+        if not allow_stale and self.is_stale(item, version_name):
+            return None
+        path = self.object_path(item["hash"])
+        try:
+            # the modification time records the last use, without an index write
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def add_bytes(
+        self,
+        content: bytes,
+        *,
+        input_geography: str,
+        output_geography: str,
+        version_name: str,
+        local: bool = False,
+    ) -> Path:
+        """
+        Store file content in the cache under its hash
+        """
+        content_hash = hashlib.sha256(content).hexdigest()
+        path = self.object_path(content_hash)
+        if path.exists():
+            os.utime(path)
+        else:
+            write_atomic(path, content)
+
+        with self.locked_index() as index:
+            index[cache_key(input_geography, output_geography, version_name)] = {
+                "hash": content_hash,
+                "size": len(content),
+                "fetched": time.time(),
+                "local": local,
+            }
+        self.evict()
+        return path
+
+    def add_file(
+        self,
+        file_path: Path,
+        *,
+        input_geography: str,
+        output_geography: str,
+        version_name: str = "latest",
+    ) -> Path:
+        """
+        Fill the cache from a local file (e.g. a test fixture or a locally
+        generated overlap) so no download is needed
+        """
+        return self.add_bytes(
+            Path(file_path).read_bytes(),
+            input_geography=input_geography,
+            output_geography=output_geography,
+            version_name=version_name,
+            local=True,
+        )
+
+    def fetch(
+        self,
+        url: str,
+        *,
+        input_geography: str,
+        output_geography: str,
+        version_name: str,
+        refresh: bool = False,
+    ) -> Path:
+        """
+        Get the local path for an overlap file, downloading it if needed.
+        Stale files are downloaded again, unless offline.
+        'refresh' downloads again whatever the age (local files are kept).
+        """
+        if self.offline:
+            path = self.get_path(input_geography, output_geography, version_name)
+            if path is not None:
+                return path
+            raise OverlapCacheMiss(
+                f"{cache_key(input_geography, output_geography, version_name)} "
+                f"is not in the cache at {self.cache_dir} and offline mode is on"
+            )
+
+        item = self.read_index().get(
+            cache_key(input_geography, output_geography, version_name), {}
+        )
+        if not refresh or item.get("local"):
+            path = self.get_path(
+                input_geography, output_geography, version_name, allow_stale=False
+            )
+            if path is not None:
+                return path
+
+        with urllib.request.urlopen(url) as response:
+            content = response.read()
+
+        return self.add_bytes(
+            content,
+            input_geography=input_geography,
+            output_geography=output_geography,
+            version_name=version_name,
+        )
+
+    def evict(self):
+        """
+        Remove least recently used files until under max_bytes
+        """
+        if self.max_bytes is None:
+            return
+
+        with self.locked_index() as index:
+            # files can be shared between keys, so each hash is counted once
+            sizes = {item["hash"]: item["size"] for item in index.values()}
+            last_used = {}
+            for content_hash in sizes:
+                try:
+                    last_used[content_hash] = (
+                        self.object_path(content_hash).stat().st_mtime_ns
+                    )
+                except FileNotFoundError:
+                    last_used[content_hash] = 0
+
+            total = sum(sizes.values())
+            # always keep the most recently used file, even if too big on its own
+            for content_hash in sorted(last_used, key=last_used.get)[:-1]:  # type: ignore
+                if total <= self.max_bytes:
+                    break
+                self.object_path(content_hash).unlink(missing_ok=True)
+                for compiled in self.cache_dir.glob(f"compiled/{content_hash}-*"):
+                    shutil.rmtree(compiled, ignore_errors=True)
+                for key in [k for k, v in index.items() if v["hash"] == content_hash]:
+                    del index[key]
+                total -= sizes[content_hash]
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
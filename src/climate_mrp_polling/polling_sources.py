@@ -0,0 +1,125 @@
+"""
+Declarations of the polling sources, and reading them into a standard shape.
+
+Each source says where its file is, how constituencies are identified,
+what scale the results are on and how to make short question keys.
+Adding a new MRP poll should only need a new entry in the registry.
+"""
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+import pandas as pd
+
+from .name_matching import NameIndex
+from .workbooks import read_sheet
+
+RAW_POLLING = Path("data", "raw", "polling")
+
+CONSTITUENCY_NAMES = Path(
+    "data",
+    "raw",
+    "Westminster_Parliamentary_Constituencies_(Dec_2020)_Names_and_Codes_in_the_United_Kingdom.csv",
+)
+
+CODE_COL = "PCON2010"
+
+# long results of every source, partitioned by source
+RESULTS_DATASET = Path("data", "interim", "polling_results")
+# the question lookups for each source
+LOOKUP_DIR = Path("data", "interim", "polling")
+
+
+@dataclass
+class PollingSource:
+    """
+    A constituency level MRP poll.
+
+    Either code_col gives the PCON 2010 codes, or name_col gives constituency
+    names that are matched to codes.
+    scale is what a result of 100% is in the file (e.g. 100 or 1).
+    question_key, if given, makes short keys for the questions and a lookup
+    between the two is saved alongside the results.
+    """
+
+    name: str
+    file: Path
+    sheet: str | int = 0
+    code_col: str | None = None
+    name_col: str | None = None
+    drop_columns: list[str] = field(default_factory=list)
+    include_column: Callable[[str], bool] = lambda column: True
+    scale: float = 1
+    question_key: Callable[[str], str] | None = None
+
+    def read_sheet(self) -> pd.DataFrame:
+        return read_sheet(self.file, self.sheet)
+
+    def read(self) -> pd.DataFrame:
+        """
+        Read the source as a df of PCON2010 codes, then a 0-1 column per question
+        """
+        df = self.read_sheet().drop(columns=self.drop_columns)
+
+        if self.code_col is not None:
+            codes = df.pop(self.code_col)
+        elif self.name_col is not None:
+            names = pd.read_csv(CONSTITUENCY_NAMES)
+            name_index = NameIndex.from_names(names["PCON20NM"], names["PCON20CD"])
+            codes = name_index.resolve(df.pop(self.name_col))
+        else:
+            raise ValueError(f"{self.name} needs either a code_col or name_col")
+
+        questions = [c for c in df.columns if self.include_column(c)]
+        df = df[questions].astype(float) / self.scale
+        df.insert(0, CODE_COL, codes)
+        return df
+
+    def question_lookup(self, questions: list[str]) -> pd.DataFrame | None:
+        """
+        source, question, short table for the questions, if this source shortens them
+        """
+        if self.question_key is None:
+            return None
+        return pd.DataFrame(
+            {
+                "source": self.name,
+                "question": questions,
+                "short": [self.question_key(q) for q in questions],
+            }
+        )
+
+
+SOURCES: dict[str, PollingSource] = {}
+
+
+def register(source: PollingSource) -> PollingSource:
+    if source.name in SOURCES:
+        raise ValueError(f"{source.name} is already registered")
+    SOURCES[source.name] = source
+    return source
+
+
+# https://www.renewableuk.com/news/615931/Polling-in-every-constituency-in-Britain-shows-strong-support-for-wind-farms-to-drive-down-bills.htm
+register(
+    PollingSource(
+        name="RenewableUK2022",
+        file=RAW_POLLING / "RenewableUK-MRP-Constituency-Topline.xlsx",
+        code_col="Group",
+        drop_columns=["Variable", "Name"],
+        scale=100,
+        question_key=lambda question: "Q" + question.split(")")[0],
+    )
+)
+
+register(
+    PollingSource(
+        name="Onward2022",
+        file=RAW_POLLING / "Public-First-Poll-for-Onward-MRP-Model.xlsx",
+        sheet="MRP Results",
+        name_col="Constituency",
+        include_column=lambda column: column.startswith("Q")
+        and not column.endswith("Winner"),
+    )
+)
@@ -0,0 +1,207 @@
+"""
+Population weighted overlaps between geographies, from the ONSPD.
+
+Using the onspd, we know the mapping of postcodes to lsoas, local authorities, and pcons
+Using the lsoa population, we can work out the rough population of each postcode
+We then sum this back up for pcons, and for each overlap between pcons and local authorities
+
+The same approach works for any pair of geographies in the ONSPD.
+The onspd is scanned once for all requested pairs, into population weighted
+fragments, which are then summed up for each pair.
+"""
+
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+
+from .overlap_cache import OverlapCache
+
+# short names for the ONSPD geography columns
+ONSPD_GEOGRAPHIES = {
+    "ward": "osward",
+    "lsoa": "lsoa11",
+    "msoa": "msoa11",
+    "pcon": "pcon",
+    "lad": "oslaua",
+    "cty": "oscty",
+}
+
+FRAGMENTS_QUERY = """
+create temp table weighted_fragments as
+with fragments as (
+    -- the only scan of the onspd, reading just these columns.
+    -- a postcode is in exactly one area of each geography, so the distinct postcodes
+    -- in an lsoa is the sum across its fragments
+    select
+        lsoa11 as lsoa,
+        {columns},
+        count(*) as postcodes,
+        count(distinct pcd) as distinct_postcodes
+    from
+        read_parquet('{onspd}')
+    where
+        lsoa11 is not null
+    group by
+        ALL
+),
+lsoa_average as (
+    -- average population per postcode -
+    -- where this is 0, set to 1 (areas with high commerical, low residence, roughly this works out fine)
+    select
+        {columns},
+        postcodes,
+        cast(pop as double) / sum(distinct_postcodes) over (partition by lsoa) as average_pop_per_postcode
+    from
+        fragments
+    join
+        lsoa_pop using (lsoa)
+)
+select
+    {columns},
+    postcodes * case when average_pop_per_postcode = 0 then 1 else average_pop_per_postcode end as pop
+from
+    lsoa_average
+"""
+
+PAIR_QUERY = """
+with pop_overlap as (
+    -- the poplation overlap between the two geographies
+    select
+        {input} as input_code,
+        {output} as output_code,
+        sum(pop) as pop_overlap
+    from
+        weighted_fragments
+    where
+        -- postcodes without an input area can't be converted from
+        {input} is not null
+    group by
+        ALL
+)
+select
+    input_code as "{input_label}",
+    output_code as "{output_label}",
+    pop_overlap as overlap_pop,
+    sum(pop_overlap) over (partition by input_code) as original_pop,
+    pop_overlap / sum(pop_overlap) over (partition by input_code) as percentage_overlap_pop
+from
+    pop_overlap
+order by
+    input_code, output_code
+"""
+
+
+def onspd_column(geography: str) -> str:
+    return ONSPD_GEOGRAPHIES.get(geography, geography)
+
+
+def read_lsoa_pop(path: Path) -> pa.Table:
+    """
+    Read the lsoa population file as an arrow table of lsoa, pop
+    """
+    df = pd.read_csv(path, thousands=",", usecols=["lsoa", "pop"])
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def load_fragments(
+    onspd: Path, lsoa_pop: pa.Table, geographies: list[str]
+) -> duckdb.DuckDBPyConnection:
+    """
+    Scan the onspd once into population weighted fragments
+    for every combination of the requested geographies
+    """
+    columns = list(dict.fromkeys(onspd_column(g) for g in geographies))
+    con = duckdb.connect()
+    # duckdb scans the arrow table in place
+    con.register("lsoa_pop", lsoa_pop)
+    con.execute(
+        FRAGMENTS_QUERY.format(onspd=Path(onspd).as_posix(), columns=", ".join(columns))
+    )
+    return con
+
+
+def pair_query(
+    input_geography: str,
+    output_geography: str,
+    labels: dict[str, str] | None = None,
+) -> str:
+    labels = labels or {}
+    return PAIR_QUERY.format(
+        input=onspd_column(input_geography),
+        output=onspd_column(output_geography),
+        input_label=labels.get(input_geography, input_geography),
+        output_label=labels.get(output_geography, output_geography),
+    )
+
+
+def create_pop_overlaps(
+    onspd: Path,
+    lsoa_pop: pa.Table,
+    pairs: list[tuple[str, str]],
+    output_dir: Path,
+    labels: dict[str, str] | None = None,
+) -> dict[tuple[str, str], Path]:
+    """
+    Write population overlap tables for each (input, output) pair of geographies,
+    in the same layout as the files get_overlap_df downloads
+    (but with only population overlaps, so no area conversions).
+    Geographies are ONSPD columns or their short names (see ONSPD_GEOGRAPHIES).
+    'labels' renames geographies in the output (e.g. {"pcon": "PARL10"}).
+    """
+    labels = labels or {}
+    output_dir.mkdir(parents=True, exist_ok=True)
+    con = load_fragments(onspd, lsoa_pop, [g for pair in pairs for g in pair])
+
+    paths = {}
+    for input_geography, output_geography in pairs:
+        input_label = labels.get(input_geography, input_geography)
+        output_label = labels.get(output_geography, output_geography)
+        path = output_dir / f"{input_label}_{output_label}_combo_overlap.parquet"
+        query = pair_query(input_geography, output_geography, labels)
+        con.execute(f"COPY ({query}) TO '{path.as_posix()}' (FORMAT PARQUET)")
+        paths[(input_label, output_label)] = path
+
+    con.close()
+    return paths
+
+
+def cache_pop_overlaps(
+    paths: dict[tuple[str, str], Path],
+    cache: OverlapCache | None = None,
+    version_name: str = "latest",
+):
+    """
+    Put locally generated overlaps in the overlap cache,
+    so get_overlap_df uses them instead of downloading
+    """
+    if cache is None:
+        cache = OverlapCache.from_env()
+    for (input_geography, output_geography), path in paths.items():
+        cache.add_file(
+            path,
+            input_geography=input_geography,
+            output_geography=output_geography,
+            version_name=version_name,
+        )
+
+
+def create_pop_overlap(onspd: Path, lsoa_pop: pa.Table, output: Path) -> Path:
+    """
+    Write the pcon/la population overlap straight to parquet
+    """
+    output.parent.mkdir(parents=True, exist_ok=True)
+    con = load_fragments(onspd, lsoa_pop, ["pcon", "lad"])
+    query = pair_query("pcon", "lad", {"pcon": "PCON21CD", "lad": "LAD21CD"})
+    con.execute(
+        f"""
+        COPY (
+            select PCON21CD, LAD21CD, percentage_overlap_pop as percentage_overlap
+            from ({query})
+            order by PCON21CD, LAD21CD
+        ) TO '{output.as_posix()}' (FORMAT PARQUET)
+        """
+    )
+    con.close()
+    return output
@@ -0,0 +1,229 @@
+"""
+A local HTTP/JSON API over the polling results.
+
+The partitioned parquet results are loaded into DuckDB once, with each
+council's tier, sorted and indexed by council code. Requests filter by
+local-authority-code, source, method, question and tier, and the encoded responses
+are cached, so repeated lookups don't touch the database.
+
+GET /polling?local-authority-code=BIR&source=Onward2022&method=population&tier=county
+GET /questions?source=RenewableUK2022
+
+Filters can be repeated or comma separated to match several values.
+"""
+
+import json
+import math
+from datetime import date
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable
+from urllib.parse import parse_qs, urlparse
+
+import duckdb
+import pandas as pd
+
+from .polling_sources import LOOKUP_DIR, RESULTS_DATASET
+
+COUNCILS_DATE = date(2023, 4, 2)
+
+# query parameter -> column
+FILTERS = {
+    "local-authority-code": "local-authority-code",
+    "source": "source",
+    "method": "method",
+    "question": "question",
+    "tier": "tier",
+}
+
+Filters = tuple[tuple[str, tuple[str, ...]], ...]
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def lookup_tiers(codes: list[str]) -> pd.DataFrame:
+    from .tiers import get_tier_membership
+
+    membership = get_tier_membership(codes, COUNCILS_DATE)
+    return pd.DataFrame(
+        {"local-authority-code": codes, "tier": membership.tiers(codes).to_numpy()}
+    )
+
+
+class PollingStore:
+    """
+    The polling results in DuckDB, with cached filtered lookups
+    """
+
+    def __init__(
+        self,
+        results: Path = RESULTS_DATASET,
+        lookups: Path | None = LOOKUP_DIR,
+        get_tiers: Callable[[list[str]], pd.DataFrame] = lookup_tiers,
+        cache_size: int = 1024,
+    ):
+        self.con = duckdb.connect()
+        self.con.execute(
+            f"""
+            create table raw_polling as
+            select *
+            from read_parquet('{Path(results).as_posix()}/*/*.parquet', hive_partitioning=1)
+            """
+        )
+        codes = [
+            row[0]
+            for row in self.con.execute(
+                'select distinct "local-authority-code" from raw_polling order by 1'
+            ).fetchall()
+        ]
+        tiers = get_tiers(codes)
+        self.con.register("council_tiers", tiers)
+        self.con.execute(
+            """
+            create table polling as
+            select
+                source,
+                method,
+                "local-authority-code",
+                "official-name",
+                tier,
+                question,
+                percentage
+            from
+                raw_polling
+            left join
+                council_tiers using ("local-authority-code")
+            order by
+                "local-authority-code", source, method, question
+            """
+        )
+        self.con.execute("drop table raw_polling")
+        self.con.unregister("council_tiers")
+        self.con.execute(
+            'create index polling_code on polling ("local-authority-code")'
+        )
+
+        lookup_files = sorted(Path(lookups).glob("*_lookup.parquet")) if lookups else []
+        if lookup_files:
+            files = ", ".join(f"'{p.as_posix()}'" for p in lookup_files)
+            self.con.execute(
+                f"create table questions as select * from read_parquet([{files}])"
+            )
+        else:
+            self.con.execute(
+                "create table questions (source varchar, question varchar, short varchar)"
+            )
+
+        self.polling = lru_cache(maxsize=cache_size)(self._polling)
+        self.questions = lru_cache(maxsize=cache_size)(self._questions)
+
+    def select(self, table: str, filters: Filters, columns: list[str]) -> list[dict]:
+        clauses = []
+        params = []
+        for column, values in filters:
+            clauses.append(f'"{column}" in ({", ".join("?" for _ in values)})')
+            params.extend(values)
+        where = f"where {' and '.join(clauses)}" if clauses else ""
+        selected = ", ".join(f'"{c}"' for c in columns)
+        # a cursor per query, as requests come from several threads
+        cursor = self.con.cursor()
+        rows = cursor.execute(
+            f"select {selected} from {table} {where}", params
+        ).fetchall()
+        cursor.close()
+        # NaN isn't valid JSON
+        return [
+            {
+                c: None if isinstance(v, float) and math.isnan(v) else v
+                for c, v in zip(columns, row)
+            }
+            for row in rows
+        ]
+
+    def _polling(self, filters: Filters) -> bytes:
+        rows = self.select(
+            "polling",
+            filters,
+            [
+                "source",
+                "method",
+                "local-authority-code",
+                "official-name",
+                "tier",
+                "question",
+                "percentage",
+            ],
+        )
+        return json.dumps({"count": len(rows), "rows": rows}).encode()
+
+    def _questions(self, filters: Filters) -> bytes:
+        rows = self.select("questions", filters, ["source", "question", "short"])
+        return json.dumps({"count": len(rows), "rows": rows}).encode()
+
+
+def parse_filters(query: str, allowed: list[str]) -> Filters:
+    """
+    Query string to a hashable, order independent set of filters
+    """
+    filters = {}
+    for key, values in parse_qs(query).items():
+        if key not in allowed:
+            raise BadRequest(f"Unknown filter '{key}', expected one of {allowed}")
+        split = {v.strip() for value in values for v in value.split(",") if v.strip()}
+        filters[FILTERS[key]] = tuple(sorted(split))
+    return tuple(sorted(filters.items()))
+
+
+def make_handler(store: PollingStore) -> type[BaseHTTPRequestHandler]:
+    routes = {
+        "/polling": (store.polling, list(FILTERS)),
+        "/questions": (store.questions, ["source", "question"]),
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path not in routes:
+                return self.send_json(
+                    404, {"error": f"Not found, try one of {list(routes)}"}
+                )
+            query, allowed = routes[url.path]
+            try:
+                body = query(parse_filters(url.query, allowed))
+            except BadRequest as e:
+                return self.send_json(400, {"error": str(e)})
+            self.send_body(200, body)
+
+        def send_json(self, status: int, content: dict):
+            self.send_body(status, json.dumps(content).encode())
+
+        def send_body(self, status: int, body: bytes):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def make_server(
+    store: PollingStore, host: str = "127.0.0.1", port: int = 8000
+) -> ThreadingHTTPServer:
+    return ThreadingHTTPServer((host, port), make_handler(store))
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000):
+    store = PollingStore()
+    server = make_server(store, host, port)
+    print(f"Serving polling results on http://{host}:{server.server_port}/polling")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
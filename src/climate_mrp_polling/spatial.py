@@ -0,0 +1,99 @@
+"""
+Geometry helpers for the area overlap pipeline.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import geopandas
+import numpy as np
+import pandas as pd
+import shapely
+
+from .fingerprint import file_hash
+
+GEOMETRY_CACHE_DIR = Path("data", "cache", "geometry")
+
+
+def read_repaired_file(
+    path: Path, cache_dir: Path = GEOMETRY_CACHE_DIR
+) -> geopandas.GeoDataFrame:
+    """
+    Read a boundary file and repair its geometries with buffer(0).
+    The repaired layer is stored as GeoParquet keyed by the hash of the source file,
+    so later reads skip both the parsing and the repair.
+    """
+    path = Path(path)
+    cached = cache_dir / f"{path.stem}-{file_hash(path)[:16]}.parquet"
+    if cached.exists():
+        return geopandas.read_parquet(cached)
+
+    df = geopandas.read_file(path)
+    df["geometry"] = df["geometry"].buffer(0)
+
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    partial = cached.with_suffix(f".{os.getpid()}.tmp")
+    df.to_parquet(partial)
+    os.replace(partial, cached)
+
+    return df
+
+
+def intersection_areas(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """
+    Area of the intersection of each pair of geometries, as one array operation
+    """
+    return shapely.area(shapely.intersection(left, right))
+
+
+def pairwise_intersection_areas(
+    left: np.ndarray, right: np.ndarray, processes: int = 1
+) -> np.ndarray:
+    """
+    Area of the intersection of each pair of geometries.
+    With processes > 1 the pairs are split into batches across a process pool.
+    """
+    if processes <= 1 or len(left) < processes:
+        return intersection_areas(left, right)
+
+    batches = np.array_split(np.arange(len(left)), processes * 4)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        areas = executor.map(
+            intersection_areas,
+            [left[b] for b in batches],
+            [right[b] for b in batches],
+        )
+        return np.concatenate(list(areas))
+
+
+def area_overlap(
+    from_df: geopandas.GeoDataFrame,
+    to_df: geopandas.GeoDataFrame,
+    *,
+    from_code: str,
+    to_code: str,
+    processes: int = 1,
+) -> pd.DataFrame:
+    """
+    For each pair of intersecting areas (from the spatial index),
+    the percentage of the 'from' area that is in the 'to' area.
+    Areas of the 'from' geometries are only calculated once.
+    """
+    pairs = from_df.sjoin(to_df[[to_code, "geometry"]], how="inner")[
+        [from_code, to_code]
+    ]
+
+    from_geo = from_df.set_index(from_code)["geometry"]
+    to_geo = to_df.set_index(to_code)["geometry"]
+    from_area = pd.Series(shapely.area(from_geo.to_numpy()), index=from_geo.index)
+
+    left = from_geo.loc[pairs[from_code]].to_numpy()
+    right = to_geo.loc[pairs[to_code]].to_numpy()
+
+    pairs["percentage_overlap"] = (
+        pairwise_intersection_areas(left, right, processes)
+        / from_area.loc[pairs[from_code]].to_numpy()
+    )
+
+    return pairs.reset_index(drop=True)
@@ -0,0 +1,165 @@
+"""
+Reading and writing the interim files passed between pipeline stages.
+
+Interim files are typed parquet, with the repeated text columns
+dictionary-encoded. CSV is only written as the last step, for files
+that are published in a data package.
+
+Results that grow with each new source are kept as a parquet dataset
+partitioned by source, so a source can be rewritten without touching the rest.
+"""
+
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# columns with a small set of repeated values
+CATEGORY_COLUMNS = [
+    "source",
+    "method",
+    "question",
+    "short",
+    "local-authority-code",
+    "official-name",
+    "PCON21CD",
+    "PCON21NM",
+    "LAD21CD",
+    "LAD21NM",
+]
+
+
+def interim_path(*parts: str) -> Path:
+    """
+    Path to a parquet file in data/interim
+    """
+    return Path("data", "interim", *parts).with_suffix(".parquet")
+
+
+def write_interim(df: pd.DataFrame, path: Path) -> Path:
+    """
+    Write a df as parquet, dictionary-encoding the repeated text columns
+    """
+    path = Path(path).with_suffix(".parquet")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df = df.astype({c: "category" for c in CATEGORY_COLUMNS if c in df.columns})
+    df.to_parquet(path, index=False)
+    return path
+
+
+def read_interim_table(path: Path) -> pa.Table:
+    return pq.read_table(Path(path).with_suffix(".parquet"))
+
+
+def read_interim(path: Path, categorical: bool = False) -> pd.DataFrame:
+    """
+    Read a parquet interim file.
+    By default the dictionary columns come back as plain strings, so merges
+    and groupbys behave as they would on a csv.
+    """
+    df = read_interim_table(path).to_pandas()
+    if not categorical:
+        df = df.astype(
+            {
+                c: object
+                for c in df.columns
+                if isinstance(df[c].dtype, pd.CategoricalDtype)
+            }
+        )
+    return df
+
+
+def concat_interim(paths: Iterable[Path]) -> pa.Table:
+    """
+    Join interim files with the same columns into one arrow table
+    """
+    tables = [read_interim_table(p) for p in paths]
+    # pandas picks the smallest index type for each file, so make them match
+    tables = [
+        t.cast(
+            pa.schema(
+                [
+                    pa.field(f.name, pa.dictionary(pa.int32(), f.type.value_type))
+                    if pa.types.is_dictionary(f.type)
+                    else f
+                    for f in t.schema
+                ]
+            )
+        )
+        for t in tables
+    ]
+    return pa.concat_tables(tables).unify_dictionaries()
+
+
+def long_format(
+    df: pd.DataFrame,
+    id_cols: list[str],
+    value_cols: list[str],
+    var_name: str = "variable",
+    value_name: str = "value",
+    constants: dict[str, str] | None = None,
+) -> pd.DataFrame:
+    """
+    The same rows as df.melt, built directly from the value array,
+    with the ids and the variable names as categoricals.
+    'constants' are categorical columns with a single value, placed first.
+    """
+    n_rows, n_values = len(df), len(value_cols)
+    long_df = {}
+    for name, value in (constants or {}).items():
+        long_df[name] = pd.Categorical.from_codes(
+            np.zeros(n_rows * n_values, dtype=np.int8), categories=[value]
+        )
+    for c in id_cols:
+        ids = pd.Categorical(df[c])
+        long_df[c] = pd.Categorical.from_codes(
+            np.tile(ids.codes, n_values), dtype=ids.dtype
+        )
+    long_df[var_name] = pd.Categorical.from_codes(
+        np.repeat(np.arange(n_values), n_rows), categories=value_cols
+    )
+    # column by column, as melt stacks them
+    long_df[value_name] = df[value_cols].to_numpy().ravel(order="F")
+    return pd.DataFrame(long_df)
+
+
+def write_partition(df: pd.DataFrame, root: Path, partition_col: str = "source"):
+    """
+    Write a df into a parquet dataset partitioned by one column,
+    replacing the partitions it has rows for
+    """
+    df = df.astype({c: "category" for c in CATEGORY_COLUMNS if c in df.columns})
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_to_dataset(
+        table,
+        root,
+        partition_cols=[partition_col],
+        basename_template="part-{i}.parquet",
+        existing_data_behavior="delete_matching",
+    )
+
+
+def read_dataset(root: Path, partition_col: str = "source") -> pa.Table:
+    """
+    Read a partitioned dataset, with the partition column first
+    and partitions in name order
+    """
+    files = sorted(Path(root).glob(f"{partition_col}=*/*.parquet"))
+    dataset = ds.dataset(files, partitioning="hive", partition_base_dir=str(root))
+    table = dataset.to_table()
+    return table.select(
+        [partition_col] + [c for c in table.column_names if c != partition_col]
+    )
+
+
+def render_csv(data: pd.DataFrame | pa.Table, path: Path):
+    """
+    Write the published csv version of a file
+    """
+    if isinstance(data, pa.Table):
+        data = data.to_pandas()
+    data.to_csv(path, index=False)
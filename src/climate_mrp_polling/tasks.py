@@ -0,0 +1,131 @@
+"""
+Small task graph runner for the pipelines.
+
+Each task declares the tasks it depends on. Tasks whose dependencies are
+done run in a process pool, so independent steps (e.g. converting
+different polling sources) run at the same time.
+A failing task is reported without stopping unrelated tasks,
+tasks that depend on it are skipped.
+"""
+
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Literal
+
+from . import instrumentation
+
+TaskStatus = Literal["done", "failed", "skipped"]
+
+
+class TaskFailed(Exception):
+    """
+    Raised after a run if any task failed or was skipped
+    """
+
+
+@dataclass
+class Task:
+    name: str
+    func: Callable[[], object]
+    depends_on: tuple[str, ...] = field(default_factory=tuple)
+
+
+@dataclass
+class TaskResult:
+    name: str
+    status: TaskStatus
+    error: str | None = None
+
+
+def run_task(task: Task) -> TaskResult:
+    try:
+        with instrumentation.stage(task.name):
+            task.func()
+    except Exception:
+        return TaskResult(task.name, "failed", traceback.format_exc())
+    return TaskResult(task.name, "done")
+
+
+def check_graph(tasks: list[Task]):
+    """
+    Check all dependencies exist and there are no cycles
+    """
+    names = {t.name for t in tasks}
+    if len(names) != len(tasks):
+        raise ValueError("task names must be unique")
+    for task in tasks:
+        if missing := set(task.depends_on) - names:
+            raise ValueError(f"{task.name} depends on unknown tasks {missing}")
+
+    remaining = {t.name: set(t.depends_on) for t in tasks}
+    while remaining:
+        ready = [name for name, deps in remaining.items() if not deps]
+        if not ready:
+            raise ValueError(f"tasks have circular dependencies: {list(remaining)}")
+        for name in ready:
+            del remaining[name]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+
+
+def run_tasks(tasks: list[Task], jobs: int = 1) -> dict[str, TaskResult]:
+    """
+    Run tasks in dependency order, with up to `jobs` running at once.
+    With jobs=1 everything runs in this process.
+    """
+    check_graph(tasks)
+
+    results: dict[str, TaskResult] = {}
+    pending = {t.name: t for t in tasks}
+
+    def next_ready() -> list[Task]:
+        ready = []
+        for task in list(pending.values()):
+            dep_results = [results.get(d) for d in task.depends_on]
+            if any(r is not None and r.status != "done" for r in dep_results):
+                del pending[task.name]
+                results[task.name] = TaskResult(
+                    task.name, "skipped", "a task it depends on did not complete"
+                )
+            elif all(r is not None for r in dep_results):
+                del pending[task.name]
+                ready.append(task)
+        return ready
+
+    if jobs <= 1:
+        while pending:
+            for task in next_ready():
+                results[task.name] = run_task(task)
+        return results
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        running: dict[Future, str] = {}
+        while pending or running:
+            for task in next_ready():
+                running[executor.submit(run_task, task)] = task.name
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception:
+                    # e.g. the worker process died
+                    results[name] = TaskResult(name, "failed", traceback.format_exc())
+
+    return results
+
+
+def report(results: dict[str, TaskResult]):
+    """
+    Print the outcome of each task, and raise if anything didn't complete
+    """
+    for result in results.values():
+        print(f"{result.name}: {result.status}")
+        if result.status == "failed":
+            print(result.error)
+
+    if failed := [r.name for r in results.values() if r.status != "done"]:
+        raise TaskFailed(f"Tasks did not complete: {', '.join(failed)}")
@@ -0,0 +1,194 @@
+"""
+Roll up lower tier councils to higher tiers (counties and combined authorities)
+with a precomputed membership matrix.
+
+The matrix is built once from the council info for a date, and every higher
+tier is then produced in one sparse aggregation, rather than a filter and
+groupby for each layer.
+"""
+
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .council_info import add_council_info
+
+HIGHER_LAYERS = ["county-la", "combined-authority"]
+
+# tier names for councils in each higher layer, and for the rest
+TIER_NAMES = {"county-la": "county", "combined-authority": "combined-authority"}
+LOWER_TIER = "lower"
+
+
+@dataclass
+class TierMembership:
+    """
+    Rows are lower tier council codes, columns are higher tier council codes
+    (ordered by layer, then code) and a 1 marks membership.
+    """
+
+    lower_codes: pd.Index
+    higher_codes: pd.Index
+    higher_layers: np.ndarray
+    matrix: sparse.csr_matrix
+    layers: list[str] = field(default_factory=lambda: list(HIGHER_LAYERS))
+
+    @classmethod
+    def from_council_info(
+        cls,
+        council_df: pd.DataFrame,
+        layers: list[str] = HIGHER_LAYERS,
+        code_col: str = "local-authority-code",
+    ) -> "TierMembership":
+        """
+        Build from a df with a council code column and a column for each layer
+        giving the higher tier council (if any) for that council.
+        e.g. the output of GovLayers.get_council_info(layers)
+        """
+        council_df = council_df.drop_duplicates(code_col)
+        lower_codes = pd.Index(council_df[code_col])
+
+        higher = []
+        layer_rank = []
+        for rank, layer in enumerate(layers):
+            codes = sorted(council_df[layer].dropna().unique())
+            higher.extend(codes)
+            layer_rank.extend([rank] * len(codes))
+        higher_codes = pd.Index(higher)
+
+        edges = council_df.melt(
+            id_vars=[code_col], value_vars=layers, value_name="higher"
+        ).dropna(subset=["higher"])
+
+        matrix = sparse.coo_matrix(
+            (
+                np.ones(len(edges)),
+                (
+                    lower_codes.get_indexer(edges[code_col]),
+                    higher_codes.get_indexer(edges["higher"]),
+                ),
+            ),
+            shape=(len(lower_codes), len(higher_codes)),
+        ).tocsr()
+
+        return cls(
+            lower_codes=lower_codes,
+            higher_codes=higher_codes,
+            higher_layers=np.array(layer_rank, dtype=int),
+            matrix=matrix,
+            layers=list(layers),
+        )
+
+    def roll_up(
+        self,
+        df: pd.DataFrame,
+        value_cols: list[str],
+        code_col: str = "local-authority-code",
+    ) -> pd.DataFrame:
+        """
+        Sum a df with one row per lower tier council to every higher tier.
+        Returns a df of the higher tier councils that have a member in df,
+        ordered by layer and code.
+        """
+        lower_index = self.lower_codes.get_indexer(df[code_col])
+        found = lower_index >= 0
+
+        selected = self.matrix[lower_index[found]]
+        values = np.nan_to_num(df[value_cols].to_numpy(dtype=float)[found], nan=0.0)
+        sums = selected.T @ values
+
+        present = np.bincount(selected.indices, minlength=selected.shape[1]) > 0
+
+        final = pd.DataFrame(sums[present], columns=value_cols)
+        final.insert(0, code_col, self.higher_codes[present])
+        return final
+
+    def roll_up_long(
+        self,
+        df: pd.DataFrame,
+        key_col: str,
+        value_col: str,
+        code_col: str = "local-authority-code",
+    ) -> pd.DataFrame:
+        """
+        For a long df of (key, lower tier council, value),
+        sum the values for each (key, higher tier council).
+        Rows are ordered by layer, key and code, as a groupby per layer would be.
+        """
+        lower_index = self.lower_codes.get_indexer(df[code_col])
+        found = lower_index >= 0
+        key_index, keys = pd.factorize(df[key_col][found], sort=True)
+
+        shape = (len(self.lower_codes), len(keys))
+        rows = lower_index[found]
+        values = sparse.coo_matrix(
+            (
+                np.nan_to_num(df[value_col].to_numpy(dtype=float)[found]),
+                (rows, key_index),
+            ),
+            shape=shape,
+        ).tocsr()
+        # counts keep (key, council) pairs whose values sum to zero
+        counts = sparse.coo_matrix(
+            (np.ones(len(rows)), (rows, key_index)), shape=shape
+        ).tocsr()
+
+        membership = self.matrix.T.tocsr()
+        pairs = (membership @ counts).tocoo()
+        sums = np.asarray((membership @ values)[pairs.row, pairs.col]).ravel()
+
+        order = np.lexsort((pairs.row, pairs.col, self.higher_layers[pairs.row]))
+
+        return pd.DataFrame(
+            {
+                key_col: np.asarray(keys)[pairs.col[order]],
+                code_col: self.higher_codes[pairs.row[order]],
+                value_col: sums[order],
+            }
+        )
+
+    def tiers(self, codes: pd.Series | list[str]) -> pd.Series:
+        """
+        The tier of each council: the higher layer it is a council for,
+        otherwise the lower tier
+        """
+        names = np.array(
+            [TIER_NAMES.get(layer, layer) for layer in self.layers] + [LOWER_TIER],
+            dtype=object,
+        )
+        higher_index = self.higher_codes.get_indexer(pd.Index(codes))
+        found = higher_index >= 0
+        rank = np.full(len(higher_index), len(self.layers))
+        rank[found] = self.higher_layers[higher_index[found]]
+        return pd.Series(names[rank], index=getattr(codes, "index", None))
+
+
+# memberships already built in this process, by date
+_memberships: dict[date, TierMembership] = {}
+
+
+def get_tier_membership(codes: Iterable[str], as_of_date: date) -> TierMembership:
+    """
+    Get the membership matrix for councils as of a date.
+    Reused within the process, and only rebuilt if new councils are needed.
+    """
+    codes = set(codes)
+    known = _memberships.get(as_of_date)
+    if known is not None and codes <= set(known.lower_codes):
+        return known
+    if known is not None:
+        codes |= set(known.lower_codes)
+
+    council_df = add_council_info(
+        pd.DataFrame({"local-authority-code": sorted(codes)}),
+        HIGHER_LAYERS,
+        as_of_date=as_of_date,
+    )
+
+    membership = TierMembership.from_council_info(council_df)
+    _memberships[as_of_date] = membership
+    return membership
@@ -0,0 +1,243 @@
+"""
+Read Excel workbooks through a parquet snapshot of their cells.
+
+Parsing xlsx with openpyxl is slow, and the same workbooks are read several
+times with different sheets and header rows. Each workbook is parsed once,
+every sheet's cells are stored as a long arrow table keyed by the hash of the
+workbook, and later reads rebuild the sheet from that snapshot.
+read_sheet returns the same df as pd.read_excel for the same arguments.
+"""
+
+import json
+import math
+import os
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from pandas.io.parsers import TextParser
+
+from .fingerprint import file_hash
+
+WORKBOOK_CACHE_DIR = Path("data", "cache", "workbooks")
+
+# a column of the snapshot for each kind of cell value
+CELL_KINDS = {
+    "integer": pa.int64(),
+    "number": pa.float64(),
+    "text": pa.string(),
+    "boolean": pa.bool_(),
+    "timestamp": pa.timestamp("us"),
+    "time": pa.time64("us"),
+    "duration": pa.duration("us"),
+}
+
+
+def cell_kind(value) -> str:
+    # bool before int, as bools are ints
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "number"
+    if isinstance(value, str):
+        return "text"
+    if isinstance(value, datetime):
+        return "timestamp"
+    if isinstance(value, time):
+        return "time"
+    if isinstance(value, timedelta):
+        return "duration"
+    raise ValueError(f"Can't snapshot a cell of type {type(value).__name__}")
+
+
+def convert_cell(cell):
+    """
+    Cell value as pandas' openpyxl reader gives it
+    """
+    from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+    if cell.value is None:
+        return ""
+    if cell.data_type == TYPE_ERROR:
+        return math.nan
+    if cell.data_type == TYPE_NUMERIC:
+        as_int = int(cell.value)
+        if as_int == cell.value:
+            return as_int
+    return cell.value
+
+
+def read_sheet_cells(sheet) -> list[list]:
+    """
+    Rows of cell values, with trailing empty cells and rows trimmed
+    """
+    sheet.reset_dimensions()
+    rows = []
+    last_row_with_data = -1
+    for row_number, row in enumerate(sheet.rows):
+        values = [convert_cell(cell) for cell in row]
+        while values and values[-1] == "":
+            values.pop()
+        if values:
+            last_row_with_data = row_number
+        rows.append(values)
+    return rows[: last_row_with_data + 1]
+
+
+def parse_workbook(path: Path) -> pa.Table:
+    """
+    Parse every sheet of a workbook into one table of
+    sheet, row, col, kind and a value column for each kind.
+    Empty cells are left out.
+    """
+    from openpyxl import load_workbook
+
+    book = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+
+    sheets = []
+    columns = {name: [] for name in ["sheet", "row", "col", "kind"]}
+    values = {kind: [] for kind in CELL_KINDS}
+    kind_codes = {kind: code for code, kind in enumerate(CELL_KINDS)}
+
+    for sheet in book.worksheets:
+        rows = read_sheet_cells(sheet)
+        width = max((len(row) for row in rows), default=0)
+        sheets.append({"name": sheet.title, "rows": len(rows), "cols": width})
+        for row_number, row in enumerate(rows):
+            for col_number, value in enumerate(row):
+                if isinstance(value, str) and value == "":
+                    continue
+                kind = cell_kind(value)
+                columns["sheet"].append(sheet.title)
+                columns["row"].append(row_number)
+                columns["col"].append(col_number)
+                columns["kind"].append(kind_codes[kind])
+                for k in CELL_KINDS:
+                    values[k].append(value if k == kind else None)
+
+    book.close()
+
+    table = pa.table(
+        {
+            "sheet": pa.array(columns["sheet"], pa.string()).dictionary_encode(),
+            "row": pa.array(columns["row"], pa.int32()),
+            "col": pa.array(columns["col"], pa.int32()),
+            "kind": pa.array(columns["kind"], pa.int8()),
+            **{k: pa.array(values[k], type) for k, type in CELL_KINDS.items()},
+        }
+    )
+    return table.replace_schema_metadata({"sheets": json.dumps(sheets)})
+
+
+def snapshot_workbook(path: Path, cache_dir: Path = WORKBOOK_CACHE_DIR) -> Path:
+    """
+    Path to the snapshot of a workbook, parsing it if it isn't already stored
+    """
+    path = Path(path)
+    snapshot = cache_dir / f"{path.stem}-{file_hash(path)[:16]}.parquet"
+    if snapshot.exists():
+        return snapshot
+
+    table = parse_workbook(path)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    partial = snapshot.with_suffix(f".{os.getpid()}.tmp")
+    pq.write_table(table, partial)
+    os.replace(partial, snapshot)
+    return snapshot
+
+
+class WorkbookSnapshot:
+    """
+    The cells of a parsed workbook, rebuilt into sheets on request
+    """
+
+    def __init__(self, table: pa.Table):
+        self.table = table
+        self.sheets = json.loads(table.schema.metadata[b"sheets"])
+
+    @property
+    def sheet_names(self) -> list[str]:
+        return [s["name"] for s in self.sheets]
+
+    def cells(self, sheet_name: str | int = 0) -> list[list]:
+        """
+        Rows of cell values, padded to the same width, as pandas' excel reader has them
+        """
+        if isinstance(sheet_name, int):
+            info = self.sheets[sheet_name]
+        else:
+            info = next((s for s in self.sheets if s["name"] == sheet_name), None)
+            if info is None:
+                raise ValueError(f"Worksheet named '{sheet_name}' not found")
+
+        cells = self.table.filter(pc.equal(self.table["sheet"], info["name"]))
+        grid = np.full((info["rows"], info["cols"]), "", dtype=object)
+        rows = cells["row"].to_numpy()
+        cols = cells["col"].to_numpy()
+        kinds = cells["kind"].to_numpy()
+        for code, kind in enumerate(CELL_KINDS):
+            mask = kinds == code
+            if mask.any():
+                # python values, as the parser would get from openpyxl
+                selected = np.empty(mask.sum(), dtype=object)
+                selected[:] = cells[kind].filter(pa.array(mask)).to_pylist()
+                grid[rows[mask], cols[mask]] = selected
+        return grid.tolist()
+
+    def sheet(
+        self,
+        sheet_name: str | int = 0,
+        *,
+        header: int | None = 0,
+        skiprows: int | list[int] | None = None,
+        **kwargs,
+    ) -> pd.DataFrame:
+        """
+        A sheet as a df, as pd.read_excel would read it.
+        Other arguments are passed to the same parser pd.read_excel uses.
+        """
+        data = self.cells(sheet_name)
+        if not data:
+            return pd.DataFrame()
+        parser = TextParser(
+            data,
+            header=header,
+            skiprows=skiprows,
+            skip_blank_lines=False,
+            **kwargs,
+        )
+        return parser.read()
+
+
+@lru_cache(maxsize=None)
+def load_snapshot(snapshot: Path) -> WorkbookSnapshot:
+    # snapshots are keyed by content, so can be held for the whole process
+    return WorkbookSnapshot(pq.read_table(snapshot))
+
+
+def open_workbook(path: Path, cache_dir: Path = WORKBOOK_CACHE_DIR) -> WorkbookSnapshot:
+    return load_snapshot(snapshot_workbook(path, cache_dir))
+
+
+def read_sheet(
+    path: Path,
+    sheet_name: str | int = 0,
+    *,
+    header: int | None = 0,
+    skiprows: int | list[int] | None = None,
+    cache_dir: Path = WORKBOOK_CACHE_DIR,
+    **kwargs,
+) -> pd.DataFrame:
+    """
+    Read a sheet of a workbook, as pd.read_excel, from its snapshot
+    """
+    return open_workbook(path, cache_dir).sheet(
+        sheet_name, header=header, skiprows=skiprows, **kwargs
+    )
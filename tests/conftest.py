@@ -0,0 +1,30 @@
+from typing import Callable, Iterator
+
+import pandas as pd
+import pytest
+
+from climate_mrp_polling.convert_polling import get_converter
+from climate_mrp_polling.overlap_cache import CACHE_DIR_ENV, OFFLINE_ENV, OverlapCache
+
+
+@pytest.fixture
+def offline_overlaps(monkeypatch, tmp_path) -> Iterator[Callable[[pd.DataFrame], None]]:
+    """
+    Serve overlap tables from an offline cache, so no download is attempted.
+    Call with each overlap df, its first two columns named for the geographies.
+    """
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+    monkeypatch.setenv(OFFLINE_ENV, "1")
+    cache = OverlapCache.from_env()
+
+    def add(df: pd.DataFrame):
+        path = tmp_path / f"{df.columns[0]}_{df.columns[1]}.parquet"
+        df.to_parquet(path)
+        cache.add_file(
+            path, input_geography=df.columns[0], output_geography=df.columns[1]
+        )
+        get_converter.cache_clear()
+
+    get_converter.cache_clear()
+    yield add
+    get_converter.cache_clear()
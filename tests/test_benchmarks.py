@@ -0,0 +1,71 @@
+from contextlib import contextmanager
+
+import numpy as np
+
+from climate_mrp_polling.benchmarks import (
+    Benchmark,
+    BenchmarkResult,
+    compare,
+    conversion_benchmark,
+    read_baseline,
+    run_benchmark,
+    synthetic_overlap,
+    write_baseline,
+)
+
+SIZES = {"PARL10": 20, "LAD23": 6}
+
+
+def test_synthetic_overlap():
+    df = synthetic_overlap("PARL10", "LAD23", SIZES)
+    assert df["PARL10"].nunique() == 20
+    assert not df.duplicated(["PARL10", "LAD23"]).any()
+    shares = (
+        df.groupby("PARL10")["overlap_pop"].sum()
+        / df.groupby("PARL10")["original_pop"].first()
+    )
+    assert np.allclose(shares, 1)
+
+
+def test_run_benchmark():
+    calls = []
+
+    @contextmanager
+    def setup(tmp):
+        yield lambda: calls.append(bytearray(1_000_000))
+
+    result = run_benchmark(Benchmark("allocate", setup), repeat=2)
+    assert len(calls) == 3
+    assert result.peak_bytes >= 1_000_000
+
+
+def test_conversion_benchmark_runs():
+    result = run_benchmark(conversion_benchmark("PARL10", "LAD23", 5, sizes=SIZES), 1)
+    assert result.name == "convert/PARL10-LAD23/q5"
+
+
+def test_compare_and_baseline(tmp_path):
+    path = tmp_path / "baseline.json"
+    write_baseline({"a": BenchmarkResult("a", 1.0, 100)}, path)
+    write_baseline({"b": BenchmarkResult("b", 1.0, 100)}, path)
+    baseline = read_baseline(path)
+    assert set(baseline) == {"a", "b"}
+
+    results = {
+        "a": BenchmarkResult("a", 1.1, 100 + 2**21),
+        "b": BenchmarkResult("b", 2.0, 100),
+        "new": BenchmarkResult("new", 5.0, 100),
+    }
+    regressions = compare(results, baseline, tolerance=0.25)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("a: peak")
+    assert regressions[1].startswith("b: 2.000s")
+
+
+def test_compare_ignores_noise():
+    baseline = {"fast": BenchmarkResult("fast", 0.01, 300_000)}
+    noisy = {"fast": BenchmarkResult("fast", 0.02, 400_000)}
+    assert compare(noisy, baseline) == []
+
+    slow = {"fast": BenchmarkResult("fast", 0.1, 3_000_000)}
+    assert len(compare(slow, baseline)) == 2
@@ -0,0 +1,41 @@
+from climate_mrp_polling.build import Stage, run_stages
+
+
+def test_stages_skipped_when_inputs_unchanged(tmp_path):
+    raw = tmp_path / "raw.csv"
+    interim = tmp_path / "interim.csv"
+    final = tmp_path / "final.csv"
+    manifest = tmp_path / "manifest.json"
+    raw.write_text("a")
+
+    def build_interim():
+        interim.write_text(raw.read_text().upper())
+
+    def build_final():
+        final.write_text(interim.read_text() * 2)
+
+    stages = [
+        Stage("interim", build_interim, inputs=[raw], outputs=[interim]),
+        Stage("final", build_final, inputs=[interim], outputs=[final]),
+    ]
+
+    assert run_stages(stages, manifest_path=manifest) == ["interim", "final"]
+    assert run_stages(stages, manifest_path=manifest) == []
+    assert run_stages(stages, manifest_path=manifest, force=True) == [
+        "interim",
+        "final",
+    ]
+
+    raw.write_text("b")
+    assert run_stages(stages, manifest_path=manifest, dry_run=True) == [
+        "interim",
+        "final",
+    ]
+    # dry run changes nothing
+    assert final.read_text() == "AA"
+
+    assert run_stages(stages, manifest_path=manifest) == ["interim", "final"]
+    assert final.read_text() == "BB"
+
+    final.unlink()
+    assert run_stages(stages, manifest_path=manifest) == ["final"]
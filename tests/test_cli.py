@@ -0,0 +1,44 @@
+import subprocess
+import sys
+
+# modules only some commands need, which shouldn't load with the CLI
+HEAVY_MODULES = [
+    "data_common",
+    "duckdb",
+    "geopandas",
+    "numpy",
+    "pandas",
+    "pyarrow",
+    "scipy",
+    "shapely",
+]
+
+# microseconds for importing the CLI module, including its dependencies
+IMPORT_BUDGET = 500_000
+
+
+def import_times(module: str) -> dict[str, int]:
+    """
+    Cumulative import time of every module loaded by importing module,
+    from python -X importtime
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_cli_import_is_light():
+    times = import_times("climate_mrp_polling.__main__")
+    loaded = [m for m in HEAVY_MODULES if m in times]
+    assert not loaded, f"CLI imports {loaded} at startup"
+    assert times["climate_mrp_polling.__main__"] < IMPORT_BUDGET
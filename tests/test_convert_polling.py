@@ -0,0 +1,322 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from climate_mrp_polling.convert_polling import (
+    GeographyConverter,
+    convert_data_geographies,
+    get_converter,
+)
+from climate_mrp_polling.overlap_cache import CACHE_DIR_ENV, OFFLINE_ENV, OverlapCache
+
+
+@pytest.fixture
+def overlap_df() -> pd.DataFrame:
+    """
+    Three constituencies split across two councils
+    """
+    return pd.DataFrame(
+        {
+            "PARL10": ["C1", "C1", "C2", "C3", "C3"],
+            "LAD23": ["LB", "LA", "LA", "LA", "LB"],
+            "overlap_pop": [100.0, 300.0, 200.0, 50.0, 150.0],
+            "overlap_area": [10.0, 10.0, 40.0, 5.0, 30.0],
+            "original_pop": [400.0, 400.0, 200.0, 200.0, 200.0],
+        }
+    )
+
+
+@pytest.fixture
+def polling_df() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "PCON2010": ["C1", "C2", "C3", "C4"],
+            "Q1": [0.5, 0.2, 0.9, 0.4],
+            "Q2": [0.1, np.nan, 0.3, 0.7],
+        }
+    )
+
+
+@pytest.fixture(autouse=True)
+def local_overlap(monkeypatch, tmp_path, overlap_df):
+    """
+    Fill an offline cache from a local file so no download is attempted
+    """
+    fixture = tmp_path / "PARL10_LAD23_combo_overlap.parquet"
+    overlap_df.to_parquet(fixture)
+
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path / "cache"))
+    monkeypatch.setenv(OFFLINE_ENV, "1")
+    OverlapCache.from_env().add_file(
+        fixture, input_geography="PARL10", output_geography="LAD23"
+    )
+    get_converter.cache_clear()
+
+
+@pytest.mark.parametrize("overlap_measure", ["population", "area"])
+@pytest.mark.parametrize(
+    "input_values_type,output_values_type",
+    [
+        ("percentage", "percentage"),
+        ("percentage", "absolute"),
+        ("absolute", "percentage"),
+        ("absolute", "absolute"),
+    ],
+)
+def test_sparse_engine_matches_pandas(
+    polling_df, overlap_measure, input_values_type, output_values_type
+):
+    kwargs = dict(
+        input_geography="PARL10",
+        output_geography="LAD23",
+        input_code_col="PCON2010",
+        output_code_col="gss-code",
+        overlap_measure=overlap_measure,
+        input_values_type=input_values_type,
+        output_values_type=output_values_type,
+    )
+    expected = convert_data_geographies(polling_df, engine="pandas", **kwargs)
+    result = convert_data_geographies(polling_df, engine="sparse", **kwargs)
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_sparse_engine_percentages():
+    df = pd.DataFrame({"PARL10": ["C1", "C3"], "Q1": [0.5, 0.9]})
+    result = convert_data_geographies(
+        df, input_geography="PARL10", output_geography="LAD23"
+    )
+
+    assert result["LAD23"].tolist() == ["LA", "LB"]
+    # LA is 300 people from C1 and 50 from C3
+    assert result["Q1"].tolist() == pytest.approx(
+        [(300 * 0.5 + 50 * 0.9) / 350, (100 * 0.5 + 150 * 0.9) / 250]
+    )
+
+
+def test_invalid_engine(polling_df):
+    with pytest.raises(ValueError):
+        convert_data_geographies(
+            polling_df,
+            input_geography="PARL10",
+            output_geography="LAD23",
+            input_code_col="PCON2010",
+            engine="numpy",  # type: ignore
+        )
+
+
+def test_converter_reused(polling_df):
+    converter = GeographyConverter("PARL10", "LAD23", "area")
+    expected = convert_data_geographies(
+        polling_df,
+        input_geography="PARL10",
+        output_geography="LAD23",
+        input_code_col="PCON2010",
+        overlap_measure="area",
+        engine="pandas",
+    )
+    for _ in range(2):
+        result = converter.convert(polling_df, input_code_col="PCON2010")
+        pd.testing.assert_frame_equal(result, expected)
+
+    assert get_converter("PARL10", "LAD23") is get_converter("PARL10", "LAD23")
+
+
+def test_chained_conversion(tmp_path, polling_df):
+    """
+    PARL10 -> PARL25 -> LAD23 in one composed matrix gives the same absolute
+    values as converting twice
+    """
+    cache = OverlapCache.from_env()
+    hops = {
+        ("PARL10", "PARL25"): pd.DataFrame(
+            {
+                "PARL10": ["C1", "C1", "C2", "C3"],
+                "PARL25": ["N1", "N2", "N2", "N3"],
+                "overlap_pop": [100.0, 300.0, 200.0, 200.0],
+                "overlap_area": [5.0, 15.0, 40.0, 35.0],
+                "original_pop": [400.0, 400.0, 200.0, 200.0],
+            }
+        ),
+        ("PARL25", "LAD23"): pd.DataFrame(
+            {
+                "PARL25": ["N1", "N2", "N2", "N3"],
+                "LAD23": ["LA", "LA", "LB", "LB"],
+                "overlap_pop": [100.0, 250.0, 250.0, 200.0],
+                "overlap_area": [5.0, 25.0, 30.0, 35.0],
+                "original_pop": [100.0, 500.0, 500.0, 200.0],
+            }
+        ),
+    }
+    for (a, b), df in hops.items():
+        df.to_parquet(tmp_path / f"{a}_{b}.parquet")
+        cache.add_file(
+            tmp_path / f"{a}_{b}.parquet", input_geography=a, output_geography=b
+        )
+
+    converter = GeographyConverter("PARL10", "LAD23", via=("PARL25",))
+    result = converter.convert(
+        polling_df, input_code_col="PCON2010", output_values_type="absolute"
+    )
+
+    first = GeographyConverter("PARL10", "PARL25").convert(
+        polling_df, input_code_col="PCON2010", output_values_type="absolute"
+    )
+    expected = GeographyConverter("PARL25", "LAD23").convert(
+        first, input_values_type="absolute"
+    )
+
+    pd.testing.assert_frame_equal(result, expected)
+
+    # by area, each PARL25 constituency is split by its share of its own area
+    area = GeographyConverter("PARL10", "LAD23", "area", via=("PARL25",))
+    np.testing.assert_allclose(
+        np.asarray(area.matrix.weights.sum(axis=1)).ravel(), [20.0, 40.0, 35.0]
+    )
+    # C1 is 5 of N1 (all in LA) and 15 of N2 (25/55 in LA), C2 is 40 of N2
+    np.testing.assert_allclose(
+        area.matrix.weights.toarray(),
+        [
+            [5 + 15 * 25 / 55, 15 * 30 / 55],
+            [40 * 25 / 55, 40 * 30 / 55],
+            [0.0, 35.0],
+        ],
+    )
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet"])
+def test_chunked_conversion(tmp_path, polling_df, suffix):
+    converter = GeographyConverter("PARL10", "LAD23")
+    expected = converter.convert(polling_df, input_code_col="PCON2010")
+
+    path = tmp_path / f"polling{suffix}"
+    if suffix == ".csv":
+        polling_df.to_csv(path, index=False)
+    else:
+        polling_df.to_parquet(path, index=False)
+
+    result = converter.convert_file(path, chunksize=1, input_code_col="PCON2010")
+    pd.testing.assert_frame_equal(result, expected)
+
+
+@pytest.fixture
+def interval_df(polling_df) -> pd.DataFrame:
+    df = polling_df.assign(Q2=polling_df["Q2"].fillna(0.5))
+    df["Q1_se"] = [0.05, 0.02, 0.04, 0.03]
+    df["Q2_se"] = [0.01, 0.03, 0.02, 0.05]
+    return df
+
+
+def test_uncertainty_estimates_match_point(interval_df):
+    converted = convert_data_geographies(
+        interval_df,
+        input_geography="PARL10",
+        output_geography="LAD23",
+        input_code_col="PCON2010",
+        uncertainty="standard_error",
+    )
+    point = convert_data_geographies(
+        interval_df[["PCON2010", "Q1", "Q2"]],
+        input_geography="PARL10",
+        output_geography="LAD23",
+        input_code_col="PCON2010",
+    )
+    pd.testing.assert_frame_equal(converted[point.columns], point)
+    assert list(converted.columns) == [
+        "LAD23",
+        "Q1",
+        "Q1_se",
+        "Q1_lower",
+        "Q1_upper",
+        "Q2",
+        "Q2_se",
+        "Q2_lower",
+        "Q2_upper",
+    ]
+
+    # LB is 100 people from C1 and 150 from C3
+    q1_se = converted.set_index("LAD23").loc["LB", "Q1_se"]
+    assert q1_se == pytest.approx(np.hypot(0.4 * 0.05, 0.6 * 0.04))
+
+
+def test_monte_carlo_matches_closed_form(interval_df):
+    converter = get_converter("PARL10", "LAD23")
+    closed = converter.convert_uncertainty(interval_df, input_code_col="PCON2010")
+    sampled = converter.convert_uncertainty(
+        interval_df, input_code_col="PCON2010", draws=20_000, seed=1
+    )
+    pd.testing.assert_series_equal(sampled["Q1"], closed["Q1"])
+    np.testing.assert_allclose(sampled["Q1_se"], closed["Q1_se"], rtol=0.05)
+    np.testing.assert_allclose(sampled["Q2_lower"], closed["Q2_lower"], atol=0.005)
+
+
+def test_bounds_match_standard_errors(interval_df):
+    bounds = interval_df[["PCON2010", "Q1", "Q2"]].copy()
+    for c in ["Q1", "Q2"]:
+        bounds[c + "_lower"] = interval_df[c] - 1.959964 * interval_df[c + "_se"]
+        bounds[c + "_upper"] = interval_df[c] + 1.959964 * interval_df[c + "_se"]
+
+    converter = get_converter("PARL10", "LAD23")
+    from_se = converter.convert_uncertainty(interval_df, input_code_col="PCON2010")
+    from_bounds = converter.convert_uncertainty(
+        bounds, input_code_col="PCON2010", uncertainty="bounds"
+    )
+    pd.testing.assert_frame_equal(from_bounds, from_se, rtol=1e-5)
+
+    with pytest.raises(ValueError, match="Q2_upper"):
+        converter.convert_uncertainty(
+            bounds.drop(columns="Q2_upper"),
+            input_code_col="PCON2010",
+            uncertainty="bounds",
+        )
+
+
+def test_aggregated_outputs_keep_covariance(interval_df):
+    from scipy import sparse
+
+    matrix = get_converter("PARL10", "LAD23").matrix
+    # both councils as one output
+    combined = matrix.aggregate_outputs(
+        sparse.csr_matrix(np.ones((len(matrix.output_codes), 1))), pd.Index(["ALL"])
+    )
+    df = combined.convert_uncertainty(
+        interval_df, output_code_col="code", output_values_type="absolute"
+    )
+    # every constituency is wholly inside the combined output
+    expected = np.sqrt(((interval_df["Q1_se"][:3] * [400, 200, 200]) ** 2).sum())
+    assert df["Q1_se"].iloc[0] == pytest.approx(expected)
+
+
+def test_uncertainty_needs_sparse_engine(interval_df):
+    with pytest.raises(ValueError, match="sparse"):
+        convert_data_geographies(
+            interval_df,
+            input_geography="PARL10",
+            output_geography="LAD23",
+            input_code_col="PCON2010",
+            engine="pandas",
+            uncertainty="standard_error",
+        )
+
+
+def test_compiled_weights_memory_mapped(tmp_path, overlap_df):
+    from climate_mrp_polling.convert_polling import WeightMatrix, get_weight_matrix
+
+    cache = OverlapCache.from_env()
+    matrix = get_weight_matrix("PARL10", "LAD23", "area", cache=cache)
+    assert len(list(cache.cache_dir.glob("compiled/*-overlap_area/*.npy"))) == 6
+
+    # read only views of the files, not copies
+    assert not matrix.weights.data.flags.writeable
+    assert not matrix.input_totals.flags.writeable
+
+    compiled = WeightMatrix.from_overlap_df(
+        overlap_df,
+        input_geography="PARL10",
+        output_geography="LAD23",
+        overlap_column="overlap_area",
+    )
+    pd.testing.assert_index_equal(matrix.input_codes, compiled.input_codes)
+    pd.testing.assert_index_equal(matrix.output_codes, compiled.output_codes)
+    np.testing.assert_array_equal(matrix.weights.toarray(), compiled.weights.toarray())
+    np.testing.assert_array_equal(matrix.input_totals, compiled.input_totals)
@@ -0,0 +1,191 @@
+import sys
+import types
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from climate_mrp_polling import convert_specific_polling, council_info, tiers
+from climate_mrp_polling.convert_specific_polling import (
+    COUNCILS_2023,
+    convert_parl_intervals_to_la,
+    convert_parl_polling_batch,
+    convert_parl_polling_methods,
+    convert_all,
+    convert_parl_polling_to_la,
+    convert_sources,
+)
+from climate_mrp_polling.polling_sources import PollingSource
+
+
+@pytest.fixture
+def councils(monkeypatch, offline_overlaps):
+    """
+    Three constituencies over three councils, L1 and L2 in county C1 and L1
+    in combined authority CA1, without data_common or a download
+    """
+    overlap = pd.DataFrame(
+        {
+            "PARL10": ["P1", "P1", "P2", "P3"],
+            "LAD23": ["G1", "G2", "G2", "G3"],
+            "overlap_pop": [100.0, 50.0, 200.0, 300.0],
+            "original_pop": [150.0, 150.0, 200.0, 300.0],
+            "overlap_area": [10.0, 30.0, 20.0, 40.0],
+        }
+    )
+
+    def fetch(codes, as_of_date, include_historical):
+        info = pd.DataFrame(
+            {
+                "local-authority-code": ["L1", "L2", "L3"],
+                "official-name": ["One", "Two", "Three"],
+                "pop-2020": [200.0, 400.0, 500.0],
+                "replaced-by": [None, None, None],
+                "county-la": ["C1", "C1", None],
+                "combined-authority": ["CA1", None, None],
+            }
+        )
+        return info[info["local-authority-code"].isin(codes)]
+
+    class GovLayers:
+        def __init__(self, df):
+            self.df = df
+
+        def create_code_column(self, from_type, source_col, drop_source=False):
+            df = self.df.copy()
+            df["local-authority-code"] = df[source_col].str.replace("G", "L")
+            return df.drop(columns=[source_col]) if drop_source else df
+
+    monkeypatch.setitem(sys.modules, "data_common", types.ModuleType("data_common"))
+    monkeypatch.setitem(
+        sys.modules,
+        "data_common.pandas",
+        types.SimpleNamespace(GovLayers=GovLayers),
+    )
+    monkeypatch.setattr(
+        council_info,
+        "_caches",
+        {
+            (COUNCILS_2023, True): council_info.CouncilInfoCache(
+                COUNCILS_2023, cache_dir=None, fetch=fetch
+            )
+        },
+    )
+    monkeypatch.setattr(tiers, "_memberships", {})
+    offline_overlaps(overlap)
+
+
+POLLING = pd.DataFrame(
+    {"PCON2010": ["P1", "P2", "P3"], "Q1": [0.2, 0.6, 0.9], "Q2": [0.5, 0.1, 0.3]}
+)
+
+
+def by_council(df: pd.DataFrame) -> pd.DataFrame:
+    return df.set_index("local-authority-code").sort_index()
+
+
+def test_area_results_are_shares_of_area(councils):
+    df = by_council(convert_parl_polling_to_la(POLLING, overlap_measure="area"))
+    # weighted by the area of each constituency in the council
+    assert df.loc["L2", "Q1"] == pytest.approx((30 * 0.2 + 20 * 0.6) / 50)
+    assert df.loc["C1", "Q1"] == pytest.approx((10 * 0.2 + 30 * 0.2 + 20 * 0.6) / 60)
+    assert df.loc["L3", "Q2"] == pytest.approx(0.3)
+    assert df[["Q1", "Q2"]].stack().between(0, 1).all()
+
+    pop = by_council(convert_parl_polling_to_la(POLLING, overlap_measure="population"))
+    assert pop.loc["C1", "Q1"] == pytest.approx(
+        (100 * 0.2 + 50 * 0.2 + 200 * 0.6) / 600
+    )
+
+
+def test_methods_match_single_conversions(councils):
+    long_df = convert_parl_polling_methods(POLLING)
+    assert set(long_df["method"]) == {"population", "area"}
+
+    for method in ["population", "area"]:
+        expected = convert_parl_polling_to_la(POLLING, overlap_measure=method)
+        block = long_df[long_df["method"] == method].pivot(
+            index="local-authority-code", columns="question", values="percentage"
+        )
+        expected = by_council(expected)
+        assert block.index.tolist() == expected.index.tolist()
+        assert np.allclose(block[["Q1", "Q2"]], expected[["Q1", "Q2"]])
+
+
+def test_interval_area_results_are_shares_of_area(councils):
+    polling = POLLING[["PCON2010", "Q1"]].assign(Q1_se=[0.1, 0.1, 0.1])
+    df = by_council(
+        convert_parl_intervals_to_la(polling, overlap_measure="area", seed=0)
+    )
+    expected = by_council(convert_parl_polling_to_la(POLLING, overlap_measure="area"))
+    assert np.allclose(df["Q1"], expected.loc[df.index, "Q1"])
+    assert df.loc["C1", "Q1"] == pytest.approx((10 * 0.2 + 30 * 0.2 + 20 * 0.6) / 60)
+    assert (df["Q1_se"] < 0.1 + 1e-9).all()
+
+
+def test_batch_matches_single_conversions(councils):
+    # P3 only, with a repeated row
+    other = pd.DataFrame({"PCON2010": ["P3", "P3"], "Q3": [0.4, 0.4]})
+    results = convert_parl_polling_batch(
+        {"first": POLLING, "other": other}, overlap_measures=("population", "area")
+    )
+
+    for method in ["population", "area"]:
+        for name, polling_df in [("first", POLLING), ("other", other.head(1))]:
+            df = results[name]
+            block = df[df["method"] == method].drop(columns="method")
+            pd.testing.assert_frame_equal(
+                block.reset_index(drop=True),
+                convert_parl_polling_to_la(polling_df, overlap_measure=method),
+                check_dtype=False,
+            )
+    # C1 and CA1 are not part of the other poll
+    assert results["other"]["local-authority-code"].tolist() == ["L3", "L3"]
+
+
+@dataclass
+class StaticSource(PollingSource):
+    df: pd.DataFrame | None = None
+
+    def read(self) -> pd.DataFrame:
+        if self.df is None:
+            raise ValueError("bad source")
+        return self.df
+
+
+def test_failing_source_still_writes_others(councils, monkeypatch):
+    sources = {
+        "Broken": StaticSource("Broken", Path("broken.xlsx")),
+        "Working": StaticSource("Working", Path("working.xlsx"), df=POLLING),
+    }
+    written = []
+    monkeypatch.setattr(convert_specific_polling, "SOURCES", sources)
+    monkeypatch.setattr(
+        convert_specific_polling,
+        "write_partition",
+        lambda df, root: written.append(df),
+    )
+
+    with pytest.raises(RuntimeError, match="Broken"):
+        convert_sources()
+    assert len(written) == 1
+    assert set(written[0]["source"]) == {"Working"}
+
+
+def test_convert_all_publishes_every_measure(councils, monkeypatch):
+    sources = {"Working": StaticSource("Working", Path("working.xlsx"), df=POLLING)}
+    written = []
+    monkeypatch.setattr(convert_specific_polling, "SOURCES", sources)
+    monkeypatch.setattr(
+        convert_specific_polling,
+        "write_partition",
+        lambda df, root: written.append(df),
+    )
+    monkeypatch.setattr(convert_specific_polling, "convert_onward_guide", lambda: None)
+    monkeypatch.setattr(convert_specific_polling, "join_files", lambda: None)
+
+    convert_all(overlap_measures=("population", "area"))
+    assert len(written) == 1
+    assert set(written[0]["method"]) == {"population", "area"}
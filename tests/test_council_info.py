@@ -0,0 +1,103 @@
+from datetime import date
+
+import pandas as pd
+
+from climate_mrp_polling.council_info import (
+    COUNCIL_DATA_VERSION_ENV,
+    CouncilInfoCache,
+    council_data_version,
+)
+
+
+def test_lookups_fetch_once_and_persist(tmp_path):
+    calls = []
+
+    def fetch(codes, as_of_date, include_historical):
+        calls.append(sorted(codes))
+        return pd.DataFrame(
+            {
+                "local-authority-code": codes,
+                "official-name": [f"{c} Council" for c in codes],
+                "pop-2020": [100.0] * len(codes),
+                "replaced-by": [None] * len(codes),
+                "county-la": ["CTY"] * len(codes),
+                "combined-authority": [None] * len(codes),
+            }
+        )
+
+    cache = CouncilInfoCache(date(2023, 4, 2), cache_dir=tmp_path, fetch=fetch)
+    info = cache.lookup(["B", "A", "B"], ["official-name", "pop-2020"])
+    assert info["official-name"].tolist() == ["B Council", "A Council", "B Council"]
+
+    cache.lookup(["A"], ["county-la"])
+    assert calls == [["A", "B"]]
+
+    cache.lookup(["A", "C"], ["official-name"])
+    assert calls == [["A", "B"], ["C"]]
+
+    # a new process reads what was saved
+    reloaded = CouncilInfoCache(date(2023, 4, 2), cache_dir=tmp_path, fetch=fetch)
+    assert reloaded.lookup(["C"], ["pop-2020"])["pop-2020"].tolist() == [100.0]
+    assert len(calls) == 2
+
+
+def test_unknown_codes_fetched_once_and_saves_merged(tmp_path):
+    calls = []
+
+    def fetch(codes, as_of_date, include_historical):
+        calls.append(sorted(codes))
+        known = [c for c in codes if c != "GONE"]
+        return pd.DataFrame(
+            {
+                "local-authority-code": known,
+                "official-name": [f"{c} Council" for c in known],
+                "pop-2020": [100.0] * len(known),
+                "replaced-by": [None] * len(known),
+                "county-la": [None] * len(known),
+                "combined-authority": [None] * len(known),
+            }
+        )
+
+    cache = CouncilInfoCache(date(2023, 4, 2), cache_dir=tmp_path, fetch=fetch)
+    # another process with the same cache file
+    other = CouncilInfoCache(date(2023, 4, 2), cache_dir=tmp_path, fetch=fetch)
+
+    info = cache.lookup(["A", "GONE"], ["official-name"])
+    assert info["official-name"].isna().tolist() == [False, True]
+    cache.lookup(["GONE"], ["official-name"])
+    assert calls == [["A", "GONE"]]
+
+    other.lookup(["B"], ["official-name"])
+    reloaded = CouncilInfoCache(date(2023, 4, 2), cache_dir=tmp_path, fetch=fetch)
+    assert {"A", "B", "GONE"} <= set(reloaded.table.index)
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_saved_tables_keyed_by_council_data_version(tmp_path, monkeypatch):
+    def fetch(codes, as_of_date, include_historical):
+        return pd.DataFrame(
+            {
+                "local-authority-code": codes,
+                "official-name": [f"{c} Council" for c in codes],
+                "pop-2020": [100.0] * len(codes),
+                "replaced-by": [None] * len(codes),
+                "county-la": [None] * len(codes),
+                "combined-authority": [None] * len(codes),
+            }
+        )
+
+    old = CouncilInfoCache(
+        date(2023, 4, 2), cache_dir=tmp_path, fetch=fetch, version="old"
+    )
+    old.lookup(["A"], ["official-name"])
+    new = CouncilInfoCache(
+        date(2023, 4, 2), cache_dir=tmp_path, fetch=fetch, version="new"
+    )
+    assert new.table.empty
+
+    council_data_version.cache_clear()
+    before = council_data_version()
+    monkeypatch.setenv(COUNCIL_DATA_VERSION_ENV, "register-2023-05")
+    council_data_version.cache_clear()
+    assert council_data_version() != before
+    council_data_version.cache_clear()
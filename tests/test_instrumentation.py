@@ -0,0 +1,88 @@
+from pathlib import Path
+
+import pytest
+
+from climate_mrp_polling.instrumentation import (
+    PROFILE_ENV,
+    PROFILE_STAGE_ENV,
+    note_rows,
+    read_records,
+    stage,
+    summary,
+)
+from climate_mrp_polling.tasks import Task, run_tasks
+
+
+@pytest.fixture
+def profile(monkeypatch, tmp_path):
+    path = tmp_path / "profile.jsonl"
+    monkeypatch.setenv(PROFILE_ENV, str(path))
+    return path
+
+
+def make_rows():
+    note_rows(rows_in=10, rows_out=5)
+
+
+def test_off_by_default(monkeypatch):
+    monkeypatch.delenv(PROFILE_ENV, raising=False)
+    with stage("quiet") as record:
+        note_rows(rows_in=1)
+    assert record is None
+
+
+def test_nested_stages(profile):
+    with stage("outer"):
+        note_rows(rows_in=3)
+        with stage("inner"):
+            make_rows()
+            make_rows()
+        data = b"x" * 10_000_000
+        del data
+
+    with pytest.raises(ValueError):
+        with stage("broken"):
+            raise ValueError
+
+    records = {r.stage: r for r in read_records(profile)}
+    assert (records["inner"].rows_in, records["inner"].rows_out) == (20, 10)
+    assert (records["outer"].rows_in, records["outer"].rows_out) == (3, None)
+    assert records["outer"].seconds >= records["inner"].seconds
+    assert records["outer"].peak_rss_bytes > 10_000_000
+    assert records["broken"].status == "failed"
+    assert "inner" in summary(list(records.values()))
+
+
+@pytest.mark.skipif(
+    not Path("/proc/self/clear_refs").exists(), reason="needs linux /proc"
+)
+def test_peak_rss_per_stage(profile):
+    with stage("heavy"):
+        data = b"x" * 200_000_000
+        del data
+    with stage("light"):
+        pass
+
+    records = {r.stage: r for r in read_records(profile)}
+    assert records["heavy"].peak_rss_bytes > 200_000_000
+    assert (
+        records["light"].peak_rss_bytes < records["heavy"].peak_rss_bytes - 100_000_000
+    )
+
+
+def test_tasks_in_workers(profile):
+    tasks = [Task("a", make_rows), Task("b", make_rows, depends_on=("a",))]
+    run_tasks(tasks, jobs=2)
+    records = read_records(profile)
+    assert [r.stage for r in records] == ["a", "b"]
+    assert all(r.rows_out == 5 for r in records)
+
+
+def test_profile_one_stage(profile, monkeypatch, capsys):
+    monkeypatch.setenv(PROFILE_STAGE_ENV, "slow")
+    with stage("slow"):
+        make_rows()
+    with stage("other"):
+        pass
+    assert (profile.parent / "slow.prof").exists()
+    assert not (profile.parent / "other.prof").exists()
@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+from climate_mrp_polling.name_matching import (
+    NameIndex,
+    UnmatchedNamesError,
+    normalise_names,
+    sort_name,
+)
+
+NAMES = [
+    "Na h-Eileanan An Iar (Western Isles)",
+    "Ynys Môn",
+    "Kingston upon Hull East",
+    "Richmond (Yorks)",
+    "St Albans",
+    "Isle of Wight",
+    "Bury St. Edmunds",
+    "Brighton, Kemptown",
+    "Ashton-under-Lyne",
+    "The Wrekin",
+    "Bermondsey & Old Southwark",
+]
+
+
+def test_vectorised_matches_sort_name():
+    assert normalise_names(pd.Series(NAMES)).tolist() == [sort_name(n) for n in NAMES]
+
+
+def test_resolve():
+    index = NameIndex.from_names(
+        pd.Series(["Kingston upon Hull East", "Ynys Mon", "Ashton under Lyne"]),
+        pd.Series(["E1", "W1", "E2"]),
+    )
+    names = pd.Series(["Hull East", "Ynys Môn", "Ashton-undr-Lyne"])
+    assert index.resolve(names).tolist() == ["E1", "W1", "E2"]
+
+    matches = index.match(names)
+    assert [(m.name, m.code) for m in matches.fuzzy] == [("Ashton-undr-Lyne", "E2")]
+
+    with pytest.raises(UnmatchedNamesError) as error:
+        index.resolve(pd.Series(["Nowhere", "Hull East", "Elsewhere"]))
+    assert error.value.names == ["Nowhere", "Elsewhere"]
+
+    # a code already matched exactly isn't given to a second name
+    with pytest.raises(UnmatchedNamesError) as error:
+        index.resolve(pd.Series(["Ashton-under-Lyne", "Ashton-undr-Lyne"]))
+    assert error.value.names == ["Ashton-undr-Lyne"]
+
+
+def test_fuzzy_matches_must_be_clear():
+    index = NameIndex.from_names(
+        pd.Series(["Bolton South East", "Birmingham, Erdington", "North Down"]),
+        pd.Series(["E1", "E2", "W1"]),
+    )
+    # close names for different places aren't typos
+    missing = ["Bolton North East", "Birmingham, Edgbaston", "North Devon"]
+    with pytest.raises(UnmatchedNamesError) as error:
+        index.resolve(pd.Series(missing))
+    assert error.value.names == missing
+
+    # one clear typo is fine, but two names can't both take the same code
+    assert index.resolve(pd.Series(["Bolton Suth East"])).tolist() == ["E1"]
+    with pytest.raises(UnmatchedNamesError) as error:
+        index.resolve(pd.Series(["Bolton Suth East", "Bolton South Eas"]))
+    assert error.value.names == ["Bolton Suth East", "Bolton South Eas"]
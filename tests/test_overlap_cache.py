@@ -0,0 +1,158 @@
+import io
+import time
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pytest
+
+from climate_mrp_polling.convert_polling import get_overlap_df
+from climate_mrp_polling.overlap_cache import OverlapCache, OverlapCacheMiss
+
+
+@pytest.fixture
+def fixture_file(tmp_path):
+    path = tmp_path / "fixture.parquet"
+    pd.DataFrame({"PARL10": ["C1"], "LAD23": ["LA"], "overlap_pop": [1.0]}).to_parquet(
+        path
+    )
+    return path
+
+
+def test_offline_miss(tmp_path):
+    cache = OverlapCache(tmp_path / "cache", offline=True)
+    with pytest.raises(OverlapCacheMiss):
+        get_overlap_df("PARL10", "LAD23", cache=cache)
+
+
+def test_filled_from_fixture(tmp_path, fixture_file):
+    cache = OverlapCache(tmp_path / "cache", offline=True)
+    cache.add_file(fixture_file, input_geography="PARL10", output_geography="LAD23")
+
+    df = get_overlap_df("PARL10", "LAD23", cache=cache)
+    assert df["LAD23"].tolist() == ["LA"]
+
+    # versions are cached separately
+    with pytest.raises(OverlapCacheMiss):
+        get_overlap_df("PARL10", "LAD23", version_name="0.1", cache=cache)
+
+
+def test_content_addressed(tmp_path, fixture_file):
+    cache = OverlapCache(tmp_path / "cache")
+    a = cache.add_file(fixture_file, input_geography="PARL10", output_geography="LAD23")
+    b = cache.add_file(
+        fixture_file,
+        input_geography="PARL10",
+        output_geography="LAD23",
+        version_name="0.1",
+    )
+    assert a == b
+    assert len(list((tmp_path / "cache" / "objects").iterdir())) == 1
+
+
+def test_eviction(tmp_path, fixture_file):
+    cache = OverlapCache(tmp_path / "cache")
+    a = cache.add_bytes(
+        b"a" * 100, input_geography="A", output_geography="B", version_name="1"
+    )
+    compiled = cache.compiled_path(a.stem, "overlap_pop")
+    compiled.mkdir(parents=True)
+    cache.add_bytes(
+        b"b" * 100, input_geography="C", output_geography="D", version_name="1"
+    )
+    cache.max_bytes = 150
+    cache.add_bytes(
+        b"c" * 100, input_geography="E", output_geography="F", version_name="1"
+    )
+
+    assert cache.get_path("A", "B", "1") is None
+    # compiled matrices go with the file they were built from
+    assert not compiled.exists()
+    assert cache.get_path("C", "D", "1") is None
+    assert cache.get_path("E", "F", "1") is not None
+
+
+@pytest.fixture
+def served(monkeypatch):
+    """
+    Stand in for the download, counting the requests
+    """
+    requests = []
+
+    class Response(io.BytesIO):
+        def __enter__(self):
+            return self
+
+    def urlopen(url):
+        requests.append(url)
+        return Response(f"content {len(requests)}".encode())
+
+    monkeypatch.setattr(urllib.request, "urlopen", urlopen)
+    return requests
+
+
+def fetch_latest(cache: OverlapCache, refresh: bool = False) -> bytes:
+    return cache.fetch(
+        "https://example.com/overlap.parquet",
+        input_geography="PARL10",
+        output_geography="LAD23",
+        version_name="latest",
+        refresh=refresh,
+    ).read_bytes()
+
+
+def test_latest_refetched_when_stale(tmp_path, served):
+    cache = OverlapCache(tmp_path / "cache", latest_max_age=60)
+    assert fetch_latest(cache) == b"content 1"
+    assert fetch_latest(cache) == b"content 1"
+    assert fetch_latest(cache, refresh=True) == b"content 2"
+
+    cache.latest_max_age = 0
+    assert fetch_latest(cache) == b"content 3"
+
+    # a stale file is still used offline
+    cache.offline = True
+    assert fetch_latest(cache) == b"content 3"
+    assert len(served) == 3
+
+
+def test_refresh_before(tmp_path, served):
+    cache = OverlapCache(tmp_path / "cache", latest_max_age=None)
+    fetch_latest(cache)
+    cache.refresh_before = time.time()
+    assert fetch_latest(cache) == b"content 2"
+    # only files from before the cut off are fetched again
+    assert fetch_latest(cache) == b"content 2"
+
+
+def test_local_files_not_refreshed(tmp_path, fixture_file, served):
+    cache = OverlapCache(tmp_path / "cache", latest_max_age=0)
+    cache.add_file(fixture_file, input_geography="PARL10", output_geography="LAD23")
+    assert fetch_latest(cache, refresh=True) == fixture_file.read_bytes()
+    assert served == []
+
+
+def test_reads_dont_write_index(tmp_path, fixture_file):
+    cache = OverlapCache(tmp_path / "cache", offline=True)
+    cache.add_file(fixture_file, input_geography="PARL10", output_geography="LAD23")
+    before = cache.index_path.stat().st_mtime_ns
+    time.sleep(0.01)
+    assert cache.get_path("PARL10", "LAD23", "latest") is not None
+    assert cache.index_path.stat().st_mtime_ns == before
+
+
+def add_pair(cache_dir, i: int):
+    OverlapCache(cache_dir).add_bytes(
+        f"content {i}".encode(),
+        input_geography=f"A{i}",
+        output_geography="B",
+        version_name="1",
+    )
+
+
+def test_parallel_adds_kept(tmp_path):
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        list(executor.map(add_pair, [tmp_path / "cache"] * 16, range(16)))
+
+    index = OverlapCache(tmp_path / "cache").read_index()
+    assert len(index) == 16
@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+from climate_mrp_polling.polling_sources import SOURCES, PollingSource, register
+
+
+class FrameSource(PollingSource):
+    sheet_df: pd.DataFrame
+
+    def read_sheet(self) -> pd.DataFrame:
+        return self.sheet_df.copy()
+
+
+def test_read_code_source():
+    source = FrameSource(
+        name="Test",
+        file=None,
+        code_col="Group",
+        drop_columns=["Name"],
+        scale=100,
+        question_key=lambda question: "Q" + question.split(")")[0],
+    )
+    source.sheet_df = pd.DataFrame(
+        {
+            "Group": ["E1", "E2"],
+            "Name": ["a", "b"],
+            "1) First": [50, 25],
+            "2) Second": [10, 100],
+        }
+    )
+    df = source.read()
+    assert df.columns.tolist() == ["PCON2010", "1) First", "2) Second"]
+    assert df["1) First"].tolist() == [0.5, 0.25]
+
+    lookup = source.question_lookup(df.columns[1:].tolist())
+    assert lookup.values.tolist() == [
+        ["Test", "1) First", "Q1"],
+        ["Test", "2) Second", "Q2"],
+    ]
+
+
+def test_include_column():
+    source = FrameSource(
+        name="Test",
+        file=None,
+        code_col="Code",
+        include_column=lambda c: not c.endswith("Winner"),
+    )
+    source.sheet_df = pd.DataFrame({"Code": ["E1"], "Q1": [0.1], "Q1_Winner": ["x"]})
+    assert source.read().columns.tolist() == ["PCON2010", "Q1"]
+    assert source.question_lookup(["Q1"]) is None
+
+
+def test_registry():
+    assert set(SOURCES) >= {"RenewableUK2022", "Onward2022"}
+    with pytest.raises(ValueError):
+        register(PollingSource(name="Onward2022", file=None))
@@ -0,0 +1,130 @@
+import duckdb
+import pandas as pd
+import pytest
+
+from climate_mrp_polling.convert_polling import GeographyConverter
+from climate_mrp_polling.overlap_cache import OverlapCache
+from climate_mrp_polling.population_overlap import (
+    cache_pop_overlaps,
+    create_pop_overlap,
+    create_pop_overlaps,
+    read_lsoa_pop,
+)
+
+
+@pytest.fixture
+def onspd(tmp_path):
+    path = tmp_path / "onspd.parquet"
+    pd.DataFrame(
+        {
+            "pcd": ["P1", "P2", "P3", "P4", "P5", "P6", "P7"],
+            "lsoa11": ["S1", "S1", "S1", "S2", "S2", "S3", None],
+            "pcon": ["C1", "C1", "C2", "C2", "C2", "C2", "C1"],
+            "oslaua": ["L1", "L2", "L2", "L2", "L3", "L3", "L1"],
+        }
+    ).to_parquet(path)
+    return path
+
+
+@pytest.fixture
+def lsoa_pop_file(tmp_path):
+    path = tmp_path / "pop.csv"
+    path.write_text('lsoa,pop\nS1,"1,200"\nS2,500\nS3,0\n')
+    return path
+
+
+def multi_view_overlap(onspd, lsoa_pop_file) -> pd.DataFrame:
+    """
+    The original view-by-view version of the query
+    """
+    con = duckdb.connect()
+    con.register("lsoa_pop", pd.read_csv(lsoa_pop_file, thousands=","))
+    con.execute(f"create view onspd as select * from read_parquet('{onspd}')")
+    con.execute(
+        "create view lsoa_count as SELECT lsoa11 as lsoa, count(distinct pcd) as count FROM onspd group by all"
+    )
+    con.execute(
+        """create view lsoa_count_pop as select lsoa, pop, count,
+        case when cast(pop as float)/cast(count as float) = 0 then 1 else cast(pop as float)/cast(count as float) end as average_pop_per_postcode
+        from lsoa_count join lsoa_pop using(lsoa)"""
+    )
+    con.execute(
+        """create view pcon_pop as select pcon, sum(average_pop_per_postcode) as pcon_pop
+        from onspd join lsoa_count_pop on (onspd.lsoa11 = lsoa_count_pop.lsoa) group by ALL"""
+    )
+    con.execute(
+        """create view pop_overlap as select pcon, oslaua, sum(average_pop_per_postcode) as pop_overlap
+        from onspd join lsoa_count_pop on (onspd.lsoa11 = lsoa_count_pop.lsoa) group by ALL"""
+    )
+    return con.execute(
+        """select pcon as PCON21CD, oslaua as LAD21CD, pop_overlap/pcon_pop as percentage_overlap
+        from pop_overlap join pcon_pop using (pcon) order by PCON21CD, LAD21CD"""
+    ).df()
+
+
+def test_single_pass_matches_views(tmp_path, onspd, lsoa_pop_file):
+    output = create_pop_overlap(
+        onspd, read_lsoa_pop(lsoa_pop_file), tmp_path / "out" / "overlap.parquet"
+    )
+    result = pd.read_parquet(output)
+    expected = multi_view_overlap(onspd, lsoa_pop_file)
+
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_batched_pairs(tmp_path, onspd, lsoa_pop_file):
+    paths = create_pop_overlaps(
+        onspd,
+        read_lsoa_pop(lsoa_pop_file),
+        [("pcon", "lad"), ("lad", "pcon"), ("lsoa", "pcon")],
+        tmp_path / "overlaps",
+        labels={"pcon": "PARL10", "lad": "LAD23", "lsoa": "LSOA11"},
+    )
+    assert set(paths) == {
+        ("PARL10", "LAD23"),
+        ("LAD23", "PARL10"),
+        ("LSOA11", "PARL10"),
+    }
+
+    pcon_lad = pd.read_parquet(paths[("PARL10", "LAD23")])
+    expected = multi_view_overlap(onspd, lsoa_pop_file)
+    assert pcon_lad["percentage_overlap_pop"].tolist() == pytest.approx(
+        expected["percentage_overlap"].tolist()
+    )
+
+    # both directions share the same fragments
+    lad_pcon = pd.read_parquet(paths[("LAD23", "PARL10")])
+    assert lad_pcon["overlap_pop"].sum() == pytest.approx(pcon_lad["overlap_pop"].sum())
+
+    # the generated files can stand in for the downloaded ones
+    cache = OverlapCache(tmp_path / "cache", offline=True)
+    cache_pop_overlaps(paths, cache)
+    converter = GeographyConverter("PARL10", "LAD23", cache=cache)
+    result = converter.convert(pd.DataFrame({"PARL10": ["C1", "C2"], "Q1": [1.0, 1.0]}))
+    assert result["Q1"].tolist() == pytest.approx([1.0, 1.0, 1.0])
+
+
+def test_missing_input_codes_dropped(tmp_path, onspd, lsoa_pop_file):
+    df = pd.read_parquet(onspd)
+    df.loc[df["pcd"] == "P3", "pcon"] = None
+    df.to_parquet(onspd)
+
+    paths = create_pop_overlaps(
+        onspd,
+        read_lsoa_pop(lsoa_pop_file),
+        [("pcon", "lad")],
+        tmp_path / "overlaps",
+        labels={"pcon": "PARL10", "lad": "LAD23"},
+    )
+    pcon_lad = pd.read_parquet(paths[("PARL10", "LAD23")])
+    assert pcon_lad["PARL10"].notna().all()
+
+    cache = OverlapCache(tmp_path / "cache", offline=True)
+    cache_pop_overlaps(paths, cache)
+    converter = GeographyConverter("PARL10", "LAD23", cache=cache)
+    result = converter.convert(pd.DataFrame({"PARL10": ["C1", "C2"], "Q1": [1.0, 1.0]}))
+    assert result["Q1"].tolist() == pytest.approx([1.0, 1.0, 1.0])
+
+    # there is no area in the generated files
+    with pytest.raises(ValueError, match="overlap_area"):
+        GeographyConverter("PARL10", "LAD23", "area", cache=cache)
@@ -0,0 +1,90 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pandas as pd
+import pytest
+
+from climate_mrp_polling.server import (
+    BadRequest,
+    PollingStore,
+    make_server,
+    parse_filters,
+)
+from climate_mrp_polling.storage import write_interim, write_partition
+
+
+@pytest.fixture
+def store(tmp_path) -> PollingStore:
+    results = tmp_path / "results"
+    for source, questions in [("A", ["Q1", "Q2"]), ("B", ["Q1"])]:
+        write_partition(
+            pd.DataFrame(
+                {
+                    "source": source,
+                    "method": "population",
+                    "local-authority-code": ["CTY", "D1"] * len(questions),
+                    "official-name": ["County", "District"] * len(questions),
+                    "question": [q for q in questions for _ in range(2)],
+                    "percentage": [0.5, float("nan")] * len(questions),
+                }
+            ),
+            results,
+        )
+    write_interim(
+        pd.DataFrame({"source": ["A"], "question": ["Long Q1"], "short": ["Q1"]}),
+        tmp_path / "lookups" / "A_lookup",
+    )
+
+    def tiers(codes):
+        return pd.DataFrame(
+            {
+                "local-authority-code": codes,
+                "tier": ["county" if c == "CTY" else "lower" for c in codes],
+            }
+        )
+
+    return PollingStore(results, tmp_path / "lookups", get_tiers=tiers)
+
+
+def test_parse_filters():
+    assert parse_filters("source=B,A&source=A&question=Q1", ["source", "question"]) == (
+        ("question", ("Q1",)),
+        ("source", ("A", "B")),
+    )
+    with pytest.raises(BadRequest):
+        parse_filters("nope=1", ["source"])
+
+
+def test_store_filters_and_caches(store):
+    body = store.polling((("source", ("A",)), ("tier", ("county",))))
+    rows = json.loads(body)["rows"]
+    assert [(r["local-authority-code"], r["question"]) for r in rows] == [
+        ("CTY", "Q1"),
+        ("CTY", "Q2"),
+    ]
+    assert store.polling((("source", ("A",)), ("tier", ("county",)))) is body
+
+    rows = json.loads(store.polling((("local-authority-code", ("D1",)),)))["rows"]
+    assert len(rows) == 3
+    assert rows[0]["percentage"] is None
+
+    assert json.loads(store.questions(()))["rows"] == [
+        {"source": "A", "question": "Long Q1", "short": "Q1"}
+    ]
+
+
+def test_http(store):
+    server = make_server(store, port=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}"
+    try:
+        with urllib.request.urlopen(f"{url}/polling?question=Q1&source=B") as r:
+            assert json.loads(r.read())["count"] == 2
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{url}/polling?council=CTY")
+        assert error.value.code == 400
+    finally:
+        server.shutdown()
+        server.server_close()
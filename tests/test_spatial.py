@@ -0,0 +1,46 @@
+import geopandas
+import pytest
+from shapely.geometry import box
+
+from climate_mrp_polling.spatial import area_overlap, read_repaired_file
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_area_overlap(processes):
+    constituencies = geopandas.GeoDataFrame(
+        {"PCON21CD": ["C1", "C2"]}, geometry=[box(0, 0, 2, 2), box(2, 0, 4, 2)]
+    )
+    councils = geopandas.GeoDataFrame(
+        {"LAD21CD": ["L1", "L2"]}, geometry=[box(0, 0, 3, 2), box(3, 0, 4, 2)]
+    )
+
+    df = area_overlap(
+        constituencies,
+        councils,
+        from_code="PCON21CD",
+        to_code="LAD21CD",
+        processes=processes,
+    )
+    result = {(r.PCON21CD, r.LAD21CD): r.percentage_overlap for r in df.itertuples()}
+
+    # C1 touches L2 at a point only
+    assert result[("C1", "L1")] == pytest.approx(1)
+    assert result.get(("C1", "L2"), 0) == pytest.approx(0)
+    assert result[("C2", "L1")] == pytest.approx(0.5)
+    assert result[("C2", "L2")] == pytest.approx(0.5)
+
+
+def test_repaired_file_cached(tmp_path):
+    source = tmp_path / "boundaries.gpkg"
+    geopandas.GeoDataFrame(
+        {"LAD21CD": ["L1"]}, geometry=[box(0, 0, 1, 1)], crs="EPSG:27700"
+    ).to_file(source)
+
+    first = read_repaired_file(source, cache_dir=tmp_path / "cache")
+    cached = list((tmp_path / "cache").glob("boundaries-*.parquet"))
+    assert len(cached) == 1
+
+    second = read_repaired_file(source, cache_dir=tmp_path / "cache")
+    assert second["LAD21CD"].tolist() == first["LAD21CD"].tolist()
+    assert second.crs == first.crs
+    assert second.geometry.area.tolist() == pytest.approx([1.0])
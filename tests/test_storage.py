@@ -0,0 +1,76 @@
+import pandas as pd
+
+from climate_mrp_polling.storage import (
+    concat_interim,
+    long_format,
+    read_dataset,
+    read_interim,
+    render_csv,
+    write_interim,
+    write_partition,
+)
+
+
+def test_concat_keeps_types(tmp_path):
+    a = pd.DataFrame(
+        {
+            "source": ["A"] * 3,
+            "question": ["Q1", "Q2", "Q3"],
+            "percentage": [0.1, 0.2, 0.3],
+        }
+    )
+    b = pd.DataFrame(
+        {"source": ["B"] * 2, "question": ["Q9", "Q1"], "percentage": [0.5, 1.0]}
+    )
+    paths = [write_interim(a, tmp_path / "a.csv"), write_interim(b, tmp_path / "b")]
+    assert all(p.suffix == ".parquet" for p in paths)
+
+    table = concat_interim(paths)
+    assert table.num_rows == 5
+    assert table.schema.field("percentage").type == "double"
+
+    render_csv(table, tmp_path / "joined.csv")
+    expected = pd.concat([a, b], ignore_index=True)
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "joined.csv"), expected)
+    pd.testing.assert_frame_equal(read_interim(paths[0]), a)
+
+
+def test_long_format_matches_melt():
+    wide = pd.DataFrame(
+        {
+            "local-authority-code": ["B", "A", "C"],
+            "official-name": ["b", "a", None],
+            "Q1": [0.1, 0.2, 0.3],
+            "Q2": [0.4, 0.5, 0.6],
+        }
+    )
+    long_df = long_format(
+        wide,
+        id_cols=["local-authority-code", "official-name"],
+        value_cols=["Q2", "Q1"],
+        var_name="question",
+        value_name="percentage",
+        constants={"source": "A"},
+    )
+    melted = wide.melt(
+        id_vars=["local-authority-code", "official-name"],
+        value_vars=["Q2", "Q1"],
+        var_name="question",
+        value_name="percentage",
+    )
+    melted.insert(0, "source", "A")
+    assert long_df["question"].cat.categories.tolist() == ["Q2", "Q1"]
+    pd.testing.assert_frame_equal(long_df.astype(object), melted.astype(object))
+
+
+def test_partitions_replaced(tmp_path):
+    root = tmp_path / "results"
+    a = pd.DataFrame({"source": ["B", "B"], "question": ["Q1", "Q2"], "value": [1, 2]})
+    write_partition(a, root)
+    write_partition(a.assign(source="A"), root)
+    write_partition(a.assign(value=[3, 4]), root)
+
+    df = read_dataset(root).to_pandas().astype({"source": object, "question": object})
+    assert df.columns.tolist() == ["source", "question", "value"]
+    assert df["source"].tolist() == ["A", "A", "B", "B"]
+    assert df["value"].tolist() == [1, 2, 3, 4]
@@ -0,0 +1,36 @@
+import pytest
+
+from climate_mrp_polling.tasks import Task, TaskFailed, report, run_tasks
+
+
+def succeed():
+    pass
+
+
+def fail():
+    raise ValueError("bad source")
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_failure_does_not_hide_other_results(jobs):
+    tasks = [
+        Task("a", succeed),
+        Task("b", fail),
+        Task("c", succeed, depends_on=("a",)),
+        Task("join", succeed, depends_on=("a", "b", "c")),
+    ]
+    results = run_tasks(tasks, jobs=jobs)
+
+    assert results["a"].status == "done"
+    assert results["c"].status == "done"
+    assert results["b"].status == "failed"
+    assert "bad source" in (results["b"].error or "")
+    assert results["join"].status == "skipped"
+
+    with pytest.raises(TaskFailed):
+        report(results)
+
+
+def test_circular_dependencies():
+    with pytest.raises(ValueError):
+        run_tasks([Task("a", succeed, ("b",)), Task("b", succeed, ("a",))])
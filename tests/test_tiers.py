@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+from climate_mrp_polling.tiers import HIGHER_LAYERS, TierMembership
+
+
+@pytest.fixture
+def council_df() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "local-authority-code": ["D1", "D2", "D3", "U1", "U2"],
+            "county-la": ["CTY", "CTY", "CTX", None, None],
+            "combined-authority": ["CA1", None, None, "CA1", None],
+        }
+    )
+
+
+def loop_roll_up(gdf: pd.DataFrame) -> pd.DataFrame:
+    """
+    The filter/groupby per layer this replaces
+    """
+    dfs = []
+    for layer in HIGHER_LAYERS:
+        df = gdf[gdf[layer].notna()]
+        df = (
+            df.groupby(["PCON21CD", layer])
+            .agg({"percentage_overlap": "sum"})
+            .reset_index()
+        )
+        dfs.append(df.rename(columns={layer: "local-authority-code"}))
+    return pd.concat(dfs, ignore_index=True)
+
+
+def test_roll_up_long_matches_groupby(council_df):
+    lower_tiers = pd.DataFrame(
+        {
+            "PCON21CD": ["P2", "P1", "P1", "P2", "P1", "P3"],
+            "local-authority-code": ["D1", "D1", "D2", "U1", "D3", "U2"],
+            "percentage_overlap": [0.5, 0.25, 0.0, 0.5, 0.75, 1.0],
+        }
+    )
+    membership = TierMembership.from_council_info(council_df)
+    result = membership.roll_up_long(
+        lower_tiers, key_col="PCON21CD", value_col="percentage_overlap"
+    )
+
+    expected = loop_roll_up(lower_tiers.merge(council_df, on="local-authority-code"))
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_roll_up_wide(council_df):
+    df = pd.DataFrame(
+        {
+            "local-authority-code": ["D1", "D2", "U1"],
+            "pop-2020": [100.0, 200.0, 300.0],
+            "Q1": [10.0, 20.0, 30.0],
+        }
+    )
+    membership = TierMembership.from_council_info(council_df)
+    result = membership.roll_up(df, ["pop-2020", "Q1"])
+
+    assert result["local-authority-code"].tolist() == ["CTY", "CA1"]
+    assert result["pop-2020"].tolist() == [300.0, 400.0]
+    assert result["Q1"].tolist() == [30.0, 40.0]
+
+
+def test_tiers(council_df):
+    membership = TierMembership.from_council_info(council_df)
+    codes = pd.Series(["D1", "CTY", "CA1", "U2", "CTX", "XXX"])
+    assert membership.tiers(codes).tolist() == [
+        "lower",
+        "county",
+        "combined-authority",
+        "lower",
+        "county",
+        "lower",
+    ]
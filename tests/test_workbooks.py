@@ -0,0 +1,66 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from climate_mrp_polling import workbooks
+from climate_mrp_polling.workbooks import open_workbook, read_sheet
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    book = Workbook()
+    sheet = book.active
+    sheet.title = "Results"
+    sheet.append(["A title row"])
+    sheet.append([])
+    sheet.append(["Code", "Count", "Share", "Flag", "When", None, "Note"])
+    sheet.append(["E1", 3, 0.25, True, datetime(2022, 1, 1), None, "x"])
+    sheet.append(["E2", 4.0, None, False, datetime(2022, 6, 30, 12), None])
+    sheet.append(["E3", None, 0.5])
+
+    guide = book.create_sheet("Guide")
+    guide.append(["Key", "Question"])
+    guide.append(["Q1", "First"])
+    guide.append([None, "Second"])
+
+    path = tmp_path / "book.xlsx"
+    book.save(path)
+    return path
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"header": 2},
+        {"skiprows": 2},
+        {"header": None},
+        {"sheet_name": "Guide"},
+        {"sheet_name": 1, "skiprows": 1, "header": None},
+    ],
+)
+def test_matches_read_excel(workbook, tmp_path, kwargs):
+    expected = pd.read_excel(workbook, **kwargs)
+    result = read_sheet(workbook, cache_dir=tmp_path / "cache", **kwargs)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_parsed_once(workbook, tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    read_sheet(workbook, "Results", cache_dir=cache_dir)
+    assert len(list(cache_dir.glob("book-*.parquet"))) == 1
+
+    def fail(path):
+        raise AssertionError("workbook parsed again")
+
+    monkeypatch.setattr(workbooks, "parse_workbook", fail)
+    workbooks.load_snapshot.cache_clear()
+    read_sheet(workbook, "Guide", skiprows=1, cache_dir=cache_dir)
+    assert open_workbook(workbook, cache_dir).sheet_names == ["Results", "Guide"]
+
+
+def test_missing_sheet(workbook, tmp_path):
+    with pytest.raises(ValueError):
+        read_sheet(workbook, "Nope", cache_dir=tmp_path / "cache")